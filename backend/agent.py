@@ -1,38 +1,68 @@
+import asyncio
 import contextvars
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import lru_cache
-from typing import Any, Dict, List, Literal
+from time import perf_counter
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Optional, Tuple
 
+import numpy as np
 from langchain_chroma import Chroma
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from langchain_core.tools import tool
+from langchain_chroma.vectorstores import maximal_marginal_relevance
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-
-try:
-    from langchain_community.embeddings import HuggingFaceEmbeddings
-except ImportError:  # pragma: no cover - optional dependency
-    HuggingFaceEmbeddings = None
-
-try:
-    from langchain_groq import ChatGroq
-except ImportError:  # pragma: no cover - optional dependency
-    ChatGroq = None
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, START, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode
 
 try:
+    from .cache import LRUCache, SemanticAnswerCache
+    from .conversation_store import SQLiteConversationStore
+    from .embedding_cache import with_embedding_cache
+    from .history import plan_summary, window_messages
+    from .http_clients import provider_client_kwargs
+    from .lexical import load_lexical_index, reciprocal_rank_fusion
+    from .llm_router import HedgedChatModel, RouterState
+    from .manifest import load_manifest
     from .settings import get_settings
+    from .speculation import Speculation, SpeculationStats
+    from .vector_index import DenseIndex, collection_rows, load_dense_index
 except ImportError:
+    from cache import LRUCache, SemanticAnswerCache
+    from conversation_store import SQLiteConversationStore
+    from embedding_cache import with_embedding_cache
+    from history import plan_summary, window_messages
+    from http_clients import provider_client_kwargs
+    from lexical import load_lexical_index, reciprocal_rank_fusion
+    from llm_router import HedgedChatModel, RouterState
+    from manifest import load_manifest
     from settings import get_settings
+    from speculation import Speculation, SpeculationStats
+    from vector_index import DenseIndex, collection_rows, load_dense_index
 
 logger = logging.getLogger(__name__)
 
 RETRIEVAL_K = 4
 RETRIEVAL_FETCH_K = 20
-_sources_var: contextvars.ContextVar[List[Dict[str, Any]]] = contextvars.ContextVar(
+RETRIEVAL_LAMBDA = 0.5
+# Hybrid retrieval fuses this many vector and BM25 candidates down to RETRIEVAL_K.
+HYBRID_CANDIDATES = 2 * RETRIEVAL_K
+# Holds a per-request list that is mutated in place, so tool calls running in copied
+# contexts (ToolNode worker threads or asyncio tasks) still report back to the caller.
+_sources_var: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar(
     "sources",
-    default=[],
+    default=None,
+)
+
+# The retrieval started on the user's message for this run, if any.
+_speculation_var: contextvars.ContextVar[Optional[Speculation]] = contextvars.ContextVar(
+    "speculation",
+    default=None,
 )
 
 
@@ -74,21 +104,55 @@ def _require_embeddings_key(provider: str) -> None:
         raise RuntimeError("OPENAI_API_KEY is required for embeddings")
 
 
-@lru_cache(maxsize=1)
-def get_llm() -> ChatOpenAI:
+def _provider_llm(provider: str) -> BaseChatModel:
     settings = get_settings()
-    provider = _select_llm_provider()
     _require_llm_key(provider)
 
     if provider == "groq":
-        if ChatGroq is None:
+        # Optional providers are imported here, not at module load, to keep startup fast.
+        try:
+            from langchain_groq import ChatGroq
+        except ImportError:  # pragma: no cover - optional dependency
             raise RuntimeError("langchain-groq is not installed")
-        return ChatGroq(model=settings.groq_model, temperature=0.5)
+        return ChatGroq(model=settings.groq_model, temperature=0.5, **provider_client_kwargs())
 
     if provider != "openai":
         raise RuntimeError(f"Unsupported LLM provider: {provider}")
 
-    return ChatOpenAI(model="gpt-4o-mini", temperature=0.5)
+    return ChatOpenAI(model="gpt-4o-mini", temperature=0.5, **provider_client_kwargs())
+
+
+def _fallback_llm_provider(primary: str) -> Optional[str]:
+    settings = get_settings()
+    keys = {"openai": settings.openai_api_key, "groq": settings.groq_api_key}
+    fallback = "groq" if primary == "openai" else "openai"
+    return fallback if keys.get(fallback) else None
+
+
+@lru_cache(maxsize=1)
+def get_llm() -> BaseChatModel:
+    """The selected provider's chat model, hedged with the other one when both have keys."""
+    settings = get_settings()
+    provider = _select_llm_provider()
+    primary = _provider_llm(provider)
+    fallback = _fallback_llm_provider(provider)
+    if not settings.llm_hedging or fallback is None:
+        return primary
+    try:
+        secondary = _provider_llm(fallback)
+    except RuntimeError as exc:
+        logger.warning("LLM hedging disabled: %s", exc)
+        return primary
+
+    names = [provider, fallback]
+    state = RouterState(
+        names,
+        default_deadline_seconds=settings.llm_hedge_default_seconds,
+        min_deadline_seconds=settings.llm_hedge_min_seconds,
+        breaker_failures=settings.llm_breaker_failures,
+        breaker_cooldown_seconds=settings.llm_breaker_cooldown_seconds,
+    )
+    return HedgedChatModel(providers=list(zip(names, (primary, secondary))), state=state)
 
 
 @lru_cache(maxsize=1)
@@ -98,14 +162,19 @@ def get_embeddings():
     _require_embeddings_key(provider)
 
     if provider == "local":
-        if HuggingFaceEmbeddings is None:
+        try:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+        except ImportError:  # pragma: no cover - optional dependency
             raise RuntimeError("sentence-transformers is not installed")
-        return HuggingFaceEmbeddings(model_name=settings.embeddings_model)
-
-    if provider != "openai":
+        model = settings.embeddings_model
+        embeddings = HuggingFaceEmbeddings(model_name=model)
+    elif provider == "openai":
+        model = "text-embedding-3-small"
+        embeddings = OpenAIEmbeddings(model=model, **provider_client_kwargs())
+    else:
         raise RuntimeError(f"Unsupported embeddings provider: {provider}")
 
-    return OpenAIEmbeddings(model="text-embedding-3-small")
+    return with_embedding_cache(embeddings, provider, model, settings.embeddings_cache_path())
 
 
 @lru_cache(maxsize=1)
@@ -118,26 +187,339 @@ def get_vectorstore() -> Chroma:
     )
 
 
+def load_index_manifest() -> Optional[Dict[str, Any]]:
+    """The catalog `build_index` writes next to the Chroma files, or None for older stores."""
+    return load_manifest(get_settings().chroma_db_path())
+
+
+def _index_version() -> str:
+    """Cheap fingerprint of the Chroma collection; it changes whenever the index is rebuilt."""
+    manifest = load_index_manifest()
+    if manifest is not None and manifest.get("version"):
+        return manifest["version"]
+    try:
+        stat = (get_settings().chroma_db_path() / "chroma.sqlite3").stat()
+    except OSError:
+        return "missing"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    settings = get_settings()
+    if not settings.answer_cache_enabled:
+        return None
+    return SemanticAnswerCache(
+        max_entries=settings.answer_cache_max_entries,
+        ttl_seconds=settings.answer_cache_ttl_seconds,
+        threshold=settings.answer_cache_threshold,
+    )
+
+
+@lru_cache(maxsize=1)
+def _query_embedding_cache() -> LRUCache:
+    return LRUCache(get_settings().retrieval_cache_size)
+
+
+@lru_cache(maxsize=1)
+def _retrieval_cache() -> LRUCache:
+    return LRUCache(get_settings().retrieval_cache_size)
+
+
+def _existing(factory: Callable[[], Any]) -> Optional[Any]:
+    """The singleton `factory` already built, or None; a metrics scrape must not build one."""
+    cache_info = getattr(factory, "cache_info", None)
+    if cache_info is not None and not cache_info().currsize:
+        return None
+    try:
+        return factory()
+    except RuntimeError:
+        return None
+
+
+def cache_stats() -> Dict[str, Any]:
+    answer_cache = _existing(get_answer_cache)
+    return {
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "query_embeddings": _query_embedding_cache().stats(),
+        "retrieval": _retrieval_cache().stats(),
+        "embedding_store": _embedding_store_stats(),
+        "conversations": _conversation_stats(),
+        "speculative_retrieval": _speculation_stats().stats(),
+        "llm_router": _llm_router_stats(),
+    }
+
+
+def _llm_router_stats() -> Optional[Dict[str, Any]]:
+    llm = _existing(get_llm)
+    return llm.stats() if isinstance(llm, HedgedChatModel) else None
+
+
+def _conversation_stats() -> Optional[Dict[str, Any]]:
+    store = _existing(get_checkpointer)
+    return store.stats() if isinstance(store, SQLiteConversationStore) else None
+
+
+def _embedding_store_stats() -> Optional[Dict[str, Any]]:
+    store = getattr(_existing(get_embeddings), "store", None)
+    return store.stats() if store is not None else None
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _embed_query(query: str, version: Optional[str] = None) -> List[float]:
+    key = (version or _index_version(), query)
+    vector = _query_embedding_cache().get(key)
+    if vector is None:
+        # float32 keeps each cached vector at a few KB instead of a list of Python floats.
+        vector = np.asarray(get_embeddings().embed_query(query), dtype=np.float32)
+        _query_embedding_cache().put(key, vector)
+    return vector.tolist()
+
+
 def _reset_sources() -> contextvars.Token:
     return _sources_var.set([])
 
 
 def _append_source(item: Dict[str, Any]) -> None:
-    sources = list(_sources_var.get())
-    sources.append(item)
-    _sources_var.set(sources)
+    sources = _sources_var.get()
+    if sources is not None:
+        sources.append(item)
 
 
 def _get_sources() -> List[Dict[str, Any]]:
-    return list(_sources_var.get())
+    return list(_sources_var.get() or [])
+
+
+@lru_cache(maxsize=1)
+def _agent_slots() -> asyncio.Semaphore:
+    return asyncio.Semaphore(max(1, get_settings().agent_max_concurrency))
+
+
+def _documents_by_id(vectorstore: Chroma, ids: Tuple[str, ...]) -> Optional[List[Document]]:
+    found = vectorstore.get(ids=list(ids), include=["documents", "metadatas"])
+    by_id = {
+        doc_id: Document(page_content=text or "", metadata=metadata or {}, id=doc_id)
+        for doc_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+    }
+    if len(by_id) != len(ids):
+        return None
+    return [by_id[doc_id] for doc_id in ids]
+
+
+def _lexical_index():
+    """The BM25 index `build_index` wrote, or None if hybrid search is off or missing."""
+    settings = get_settings()
+    if not settings.retrieval_hybrid:
+        return None
+    return load_lexical_index(settings.chroma_db_path())
+
+
+def _dense_index() -> Optional[DenseIndex]:
+    """The NumPy search matrix when `RETRIEVAL_BACKEND=numpy`, else None."""
+    settings = get_settings()
+    if settings.retrieval_backend != "numpy":
+        return None
+    index = load_dense_index(settings.chroma_db_path())
+    if index is None:
+        index = _dense_index_from_chroma(_index_version())
+    return index
+
+
+@lru_cache(maxsize=1)
+def _dense_index_from_chroma(version: str) -> DenseIndex:
+    # Stores built without the exported matrix: copy the vectors out of Chroma once.
+    return DenseIndex.from_rows(collection_rows(get_vectorstore()._collection))
+
+
+def _vector_mmr(vectorstore: Chroma, query_vector: List[float], k: int) -> List[Document]:
+    dense = _dense_index()
+    if dense is not None:
+        ids = dense.mmr(
+            [query_vector], k=k, fetch_k=RETRIEVAL_FETCH_K, lambda_mult=RETRIEVAL_LAMBDA
+        )[0]
+        documents = _documents_by_id(vectorstore, tuple(ids))
+        if documents is not None:
+            return documents
+    return _chroma_mmr(vectorstore, query_vector, k)
+
+
+def _chroma_mmr(vectorstore: Chroma, query_vector: List[float], k: int) -> List[Document]:
+    """Chroma's MMR search, keeping the chunk IDs that BM25 fusion and the cache key on.
+
+    `max_marginal_relevance_search_by_vector` in langchain-chroma 0.1.x returns
+    Documents without IDs, so this queries the collection and re-ranks the same way.
+    """
+    found = vectorstore._collection.query(
+        query_embeddings=[query_vector],
+        n_results=RETRIEVAL_FETCH_K,
+        include=["documents", "metadatas", "embeddings"],
+    )
+    ids = found["ids"][0]
+    if not len(ids):
+        return []
+    picked = maximal_marginal_relevance(
+        np.asarray(query_vector, dtype=np.float32),
+        found["embeddings"][0],
+        k=k,
+        lambda_mult=RETRIEVAL_LAMBDA,
+    )
+    return [
+        Document(
+            page_content=found["documents"][0][index] or "",
+            metadata=found["metadatas"][0][index] or {},
+            id=ids[index],
+        )
+        for index in picked
+    ]
+
+
+def _fuse_with_lexical(vectorstore: Chroma, documents: List[Document], lexical_ids: List[str]):
+    """Reciprocal rank fusion of the MMR results and BM25 hits, cut to RETRIEVAL_K."""
+    by_id = {doc.id: doc for doc in documents}
+    fused = reciprocal_rank_fusion([list(by_id), lexical_ids])[:RETRIEVAL_K]
+    missing = tuple(doc_id for doc_id in fused if doc_id not in by_id)
+    if missing:
+        for doc in _documents_by_id(vectorstore, missing) or []:
+            by_id[doc.id] = doc
+    return [by_id[doc_id] for doc_id in fused if doc_id in by_id]
 
 
 def _retrieve_documents(query: str):
-    retriever = get_vectorstore().as_retriever(
-        search_type="mmr",
-        search_kwargs={"k": RETRIEVAL_K, "fetch_k": RETRIEVAL_FETCH_K, "lambda_mult": 0.5},
+    """Hybrid MMR + BM25 search memoized on (index version, normalized query, settings).
+
+    A hit only re-reads the chunk rows by ID, skipping the query embedding and the
+    similarity search; a rebuilt index changes the version and so misses.
+    """
+    vectorstore = get_vectorstore()
+    version = _index_version()
+    lexical = _lexical_index()
+    key = (
+        version,
+        _normalize_query(query),
+        RETRIEVAL_K,
+        RETRIEVAL_FETCH_K,
+        RETRIEVAL_LAMBDA,
+        lexical is not None,
+        get_settings().retrieval_backend,
+    )
+
+    ids = _retrieval_cache().get(key)
+    if ids is not None:
+        documents = _documents_by_id(vectorstore, ids)
+        if documents is not None:
+            return documents
+
+    documents = _vector_mmr(
+        vectorstore,
+        _embed_query(query, version),
+        k=HYBRID_CANDIDATES if lexical is not None else RETRIEVAL_K,
+    )
+    if lexical is not None and all(doc.id for doc in documents):
+        hits = lexical.search(query, HYBRID_CANDIDATES)
+        documents = _fuse_with_lexical(vectorstore, documents, [doc_id for doc_id, _ in hits])
+    else:
+        # Without fusion the extra hybrid candidates would only pad the tool payload.
+        documents = documents[:RETRIEVAL_K]
+    ids = tuple(doc.id for doc in documents)
+    if all(ids):
+        _retrieval_cache().put(key, ids)
+    return documents
+
+
+@lru_cache(maxsize=1)
+def _speculation_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=max(1, get_settings().agent_max_concurrency),
+        thread_name_prefix="speculative-retrieval",
+    )
+
+
+@lru_cache(maxsize=1)
+def _speculation_stats() -> SpeculationStats:
+    return SpeculationStats()
+
+
+def _start_speculation(user_input: str) -> Optional[Speculation]:
+    """Search for the user's message while the first LLM call decides what to search for.
+
+    Most university questions make the LLM call `doc_retriever` with a paraphrase of
+    the message, so the search usually finishes before the tool call arrives.
+    """
+    if not get_settings().retrieval_speculative:
+        return None
+    speculation = Speculation(
+        user_input, _speculation_pool().submit(_retrieve_documents, user_input)
     )
-    return retriever.invoke(query)
+    _speculation_stats().record("started")
+    return speculation
+
+
+def _finish_speculation(speculation: Optional[Speculation]) -> None:
+    # An unused search still fills the retrieval cache, so it is left to complete.
+    if speculation is not None and not speculation.consulted:
+        _speculation_stats().record("unused")
+
+
+@contextmanager
+def _speculating(user_input: str) -> Iterator[None]:
+    speculation = _start_speculation(user_input)
+    token = _speculation_var.set(speculation)
+    try:
+        yield
+    finally:
+        _finish_speculation(speculation)
+        _speculation_var.reset(token)
+
+
+def _matches_speculation(query: str, speculation: Speculation) -> bool:
+    if _normalize_query(query) == _normalize_query(speculation.query):
+        return True
+    # The speculative run embedded its query first, so this is normally a cache hit.
+    expected = np.asarray(_embed_query(speculation.query), dtype=np.float32)
+    actual = np.asarray(_embed_query(query), dtype=np.float32)
+    norms = float(np.linalg.norm(expected) * np.linalg.norm(actual))
+    similarity = float(expected @ actual) / norms if norms else 0.0
+    return similarity >= get_settings().retrieval_speculative_threshold
+
+
+def _tool_documents(query: str):
+    """Documents for a tool call, reusing the speculative search when the query matches it."""
+    speculation = _speculation_var.get()
+    if speculation is None:
+        return _retrieve_documents(query)
+
+    speculation.consulted = True
+    stats = _speculation_stats()
+    try:
+        matches = _matches_speculation(query, speculation)
+        documents = speculation.future.result() if matches else None
+    except Exception as exc:
+        logger.warning("Speculative retrieval failed: %s", exc)
+        stats.record("failed")
+        return _retrieve_documents(query)
+    if not matches:
+        stats.record("misses")
+        return _retrieve_documents(query)
+    stats.record("hits")
+    return documents
+
+
+async def _aretrieve_documents(query: str):
+    # Chroma and the embedding clients are synchronous; run them off the event loop.
+    return await asyncio.to_thread(_tool_documents, query)
+
+
+def _source_from_doc(doc) -> Dict[str, Any]:
+    return {
+        "content": doc.page_content[:300],
+        "document": doc.metadata.get("document_name", "Unknown"),
+        "page": str(doc.metadata.get("page_no", "Unknown")),
+        "date": doc.metadata.get("date", ""),
+        "source": doc.metadata.get("source", ""),
+    }
 
 
 def _collect_sources(query: str, limit: int = 5) -> List[Dict[str, Any]]:
@@ -150,41 +532,16 @@ def _collect_sources(query: str, limit: int = 5) -> List[Dict[str, Any]]:
     if not response:
         return []
 
-    sources = [
-        {
-            "content": doc.page_content[:300],
-            "document": doc.metadata.get("document_name", "Unknown"),
-            "page": str(doc.metadata.get("page_no", "Unknown")),
-            "date": doc.metadata.get("date", ""),
-            "source": doc.metadata.get("source", ""),
-        }
-        for doc in response
-    ]
+    sources = [_source_from_doc(doc) for doc in response]
     return sources[:limit]
 
 
-@tool
-def doc_retriever(query: str) -> str:
-    """Search knowledge base for relevant documents."""
-    try:
-        response = _retrieve_documents(query)
-    except Exception as exc:
-        logger.exception("Document retrieval failed")
-        return f"Knowledge base unavailable: {exc}"
-
+def _format_retrieval(response) -> str:
     if not response:
         return "No relevant documents found."
 
     for doc in response:
-        _append_source(
-            {
-                "content": doc.page_content[:300],
-                "document": doc.metadata.get("document_name", "Unknown"),
-                "page": str(doc.metadata.get("page_no", "Unknown")),
-                "date": doc.metadata.get("date", ""),
-                "source": doc.metadata.get("source", ""),
-            }
-        )
+        _append_source(_source_from_doc(doc))
 
     formatted = "\n\n---\n\n".join(
         (
@@ -196,6 +553,34 @@ def doc_retriever(query: str) -> str:
     return formatted
 
 
+def _doc_retriever(query: str) -> str:
+    """Search knowledge base for relevant documents."""
+    try:
+        response = _tool_documents(query)
+    except Exception as exc:
+        logger.exception("Document retrieval failed")
+        return f"Knowledge base unavailable: {exc}"
+    return _format_retrieval(response)
+
+
+async def _adoc_retriever(query: str) -> str:
+    """Search knowledge base for relevant documents."""
+    try:
+        response = await _aretrieve_documents(query)
+    except Exception as exc:
+        logger.exception("Document retrieval failed")
+        return f"Knowledge base unavailable: {exc}"
+    return _format_retrieval(response)
+
+
+doc_retriever = StructuredTool.from_function(
+    func=_doc_retriever,
+    coroutine=_adoc_retriever,
+    name="doc_retriever",
+    description="Search knowledge base for relevant documents.",
+)
+
+
 sys_prompt = SystemMessage(
     content=(
         "You are a helpful and friendly assistant that provides information about "
@@ -225,82 +610,412 @@ sys_prompt = SystemMessage(
 )
 
 
-def assistant(state: MessagesState):
+class AgentState(MessagesState):
+    summary: str
+
+
+def _prompt(state: AgentState) -> List[Any]:
+    settings = get_settings()
+    history = window_messages(
+        state["messages"],
+        summary=state.get("summary", ""),
+        keep_turns=settings.history_keep_turns,
+        tool_chars=settings.history_tool_chars,
+    )
+    return [sys_prompt] + history
+
+
+def assistant(state: AgentState):
+    tools = [doc_retriever]
+    llm_with_tool = get_llm().bind_tools(tools)
+    response = llm_with_tool.invoke(_prompt(state))
+    return {"messages": [response]}
+
+
+async def aassistant(state: AgentState):
     tools = [doc_retriever]
     llm_with_tool = get_llm().bind_tools(tools)
-    msg = [sys_prompt] + state["messages"]
-    response = llm_with_tool.invoke(msg)
+    response = await llm_with_tool.ainvoke(_prompt(state))
     return {"messages": [response]}
 
 
-def should_continue(state: MessagesState) -> Literal["tools", "__end__"]:
+def _summary_plan(state: AgentState):
+    settings = get_settings()
+    return plan_summary(
+        state["messages"],
+        summary=state.get("summary", ""),
+        keep_turns=settings.history_keep_turns,
+        batch_turns=settings.history_summary_batch,
+    )
+
+
+def _fold(folded, summary) -> Dict[str, Any]:
+    return {
+        "summary": summary,
+        "messages": [RemoveMessage(id=message.id) for message in folded],
+    }
+
+
+def summarize_history(state: AgentState):
+    plan = _summary_plan(state)
+    if plan is None:
+        return {}
+    folded, prompt = plan
+    try:
+        summary = get_llm().invoke(prompt).content
+    except Exception as exc:
+        # The turns stay in the thread and are folded on a later turn.
+        logger.warning("History summary skipped: %s", exc)
+        return {}
+    return _fold(folded, summary)
+
+
+async def asummarize_history(state: AgentState):
+    plan = _summary_plan(state)
+    if plan is None:
+        return {}
+    folded, prompt = plan
+    try:
+        summary = (await get_llm().ainvoke(prompt)).content
+    except Exception as exc:
+        logger.warning("History summary skipped: %s", exc)
+        return {}
+    return _fold(folded, summary)
+
+
+def should_continue(state: AgentState) -> Literal["tools", "history"]:
     last_msg = state["messages"][-1]
     if last_msg.tool_calls:
         return "tools"
-    return "__end__"
+    return "history"
+
+
+@lru_cache(maxsize=1)
+def get_checkpointer():
+    """Conversation state store: SQLite when `CONVERSATION_DB` is set, else in memory."""
+    settings = get_settings()
+    path = settings.conversation_db_path()
+    if path is None:
+        return MemorySaver()
+    return SQLiteConversationStore(
+        path,
+        ttl_seconds=settings.conversation_ttl_seconds,
+        max_threads=settings.conversation_max_threads,
+        keep_checkpoints=settings.conversation_keep_checkpoints,
+    )
 
 
 @lru_cache(maxsize=1)
 def get_agent():
     tools = [doc_retriever]
-    builder = StateGraph(MessagesState)
-    builder.add_node("assistant", assistant)
+    builder = StateGraph(AgentState)
+    builder.add_node("assistant", RunnableLambda(assistant, afunc=aassistant, name="assistant"))
     builder.add_node("tools", ToolNode(tools))
+    builder.add_node(
+        "history",
+        RunnableLambda(summarize_history, afunc=asummarize_history, name="history"),
+    )
 
     builder.add_edge(START, "assistant")
     builder.add_conditional_edges(
         "assistant",
         should_continue,
-        {"tools": "tools", "__end__": END},
+        {"tools": "tools", "history": "history"},
     )
     builder.add_edge("tools", "assistant")
+    builder.add_edge("history", END)
 
-    memory = MemorySaver()
-    return builder.compile(checkpointer=memory)
+    return builder.compile(checkpointer=get_checkpointer())
 
 
-def query_agent(user_input: str, thread_id: str = "default_session") -> Dict[str, Any]:
-    token = _reset_sources()
+def _read_result(result: Dict[str, Any]) -> Tuple[Optional[str], bool]:
+    used_retriever = False
+    final_answer = None
+
+    for message in result["messages"]:
+        if isinstance(message, AIMessage) and message.tool_calls:
+            used_retriever = True
+        elif isinstance(message, AIMessage) and not message.tool_calls and message.content:
+            final_answer = message.content
+
+    return final_answer, used_retriever
+
+
+def _build_response(
+    final_answer: Optional[str],
+    used_retriever: bool,
+    thread_id: str,
+    sources: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    return {
+        "answer": final_answer or "No response generated",
+        "used_retriever": used_retriever,
+        "thread_id": thread_id,
+        "sources": sources[:5] if used_retriever else [],
+    }
+
+
+def _thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def is_first_turn(thread_id: str) -> bool:
+    """True when the thread has no checkpointed messages yet."""
+    return not get_agent().get_state(_thread_config(thread_id)).values.get("messages")
+
+
+def _answer_cache_probe(
+    user_input: str, thread_id: str, first_turn: Optional[bool] = None
+) -> Optional[Tuple[List[float], str]]:
+    """Return (question embedding, index version) when this turn may use the answer cache.
+
+    Only turns that start a thread qualify; later turns depend on the conversation so far.
+    Callers that already know whether the thread is new pass `first_turn` so the
+    checkpoint is not read twice.
+    """
+    if get_answer_cache() is None:
+        return None
+    if first_turn is None:
+        first_turn = is_first_turn(thread_id)
+    if not first_turn:
+        return None
+    version = _index_version()
     try:
-        result = get_agent().invoke(
-            {"messages": [HumanMessage(content=user_input)]},
-            config={"configurable": {"thread_id": thread_id}},
-        )
+        vector = _embed_query(user_input, version)
+    except Exception as exc:
+        logger.warning("Answer cache lookup skipped: %s", exc)
+        return None
+    return vector, version
+
+
+def record_exchange(thread_id: str, user_input: str, answer: str) -> None:
+    """Append a question and an answer produced elsewhere to a thread, without running the graph."""
+    get_agent().update_state(
+        _thread_config(thread_id),
+        {"messages": [HumanMessage(content=user_input), AIMessage(content=answer)]},
+        as_node="history",
+    )
+
+
+def _cached_response(
+    user_input: str,
+    thread_id: str,
+    first_turn: Optional[bool] = None,
+) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[List[float], str]]]:
+    probe = _answer_cache_probe(user_input, thread_id, first_turn)
+    if probe is None:
+        return None, None
+
+    cached = get_answer_cache().lookup(*probe)
+    if cached is None:
+        return None, probe
+
+    # Record the exchange so follow-up questions in this thread still have context.
+    record_exchange(thread_id, user_input, cached["answer"])
+    response = _build_response(
+        cached["answer"], cached["used_retriever"], thread_id, cached["sources"]
+    )
+    return response, None
+
+
+def _remember_answer(probe: Optional[Tuple[List[float], str]], response: Dict[str, Any]) -> None:
+    cache = get_answer_cache()
+    if probe is None or cache is None or response["answer"] == "No response generated":
+        return
+    vector, version = probe
+    cache.store(
+        vector,
+        {
+            "answer": response["answer"],
+            "used_retriever": response["used_retriever"],
+            "sources": response["sources"],
+        },
+        version,
+    )
 
-        used_retriever = False
-        final_answer = None
 
-        for message in result["messages"]:
-            if isinstance(message, AIMessage) and message.tool_calls:
-                used_retriever = True
-            elif isinstance(message, AIMessage) and not message.tool_calls and message.content:
-                final_answer = message.content
+def query_agent(user_input: str, thread_id: str = "default_session") -> Dict[str, Any]:
+    cached, probe = _cached_response(user_input, thread_id)
+    if cached is not None:
+        return cached
 
+    token = _reset_sources()
+    try:
+        with _speculating(user_input):
+            result = get_agent().invoke(
+                {"messages": [HumanMessage(content=user_input)]},
+                config=_thread_config(thread_id),
+            )
+
+        final_answer, used_retriever = _read_result(result)
         sources = _get_sources() if used_retriever else []
         if used_retriever and not sources:
             sources = _collect_sources(user_input)
-        sources = sources[:5] if used_retriever else []
 
-        return {
-            "answer": final_answer or "No response generated",
-            "used_retriever": used_retriever,
-            "thread_id": thread_id,
-            "sources": sources,
-        }
+        response = _build_response(final_answer, used_retriever, thread_id, sources)
+        _remember_answer(probe, response)
+        return response
     finally:
         _sources_var.reset(token)
 
 
-def get_available_documents() -> List[str]:
+async def aquery_agent(
+    user_input: str,
+    thread_id: str = "default_session",
+    first_turn: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """Async counterpart of `query_agent` that never blocks the event loop.
+
+    At most `AGENT_MAX_CONCURRENCY` graph runs execute at once per process; further
+    callers wait for a free slot instead of piling more requests onto the LLM provider.
+    `first_turn`, when the caller has already checked it, skips re-reading the thread.
+    """
+    cached, probe = await asyncio.to_thread(_cached_response, user_input, thread_id, first_turn)
+    if cached is not None:
+        return cached
+
+    token = _reset_sources()
     try:
-        embedding = get_embeddings()
-        vectorstore = Chroma(
-            collection_name="UI_Policies",
-            persist_directory=_persist_dir(),
-            embedding_function=embedding,
+        async with _agent_slots():
+            with _speculating(user_input):
+                result = await get_agent().ainvoke(
+                    {"messages": [HumanMessage(content=user_input)]},
+                    config=_thread_config(thread_id),
+                )
+
+        final_answer, used_retriever = _read_result(result)
+        sources = _get_sources() if used_retriever else []
+        if used_retriever and not sources:
+            sources = await asyncio.to_thread(_collect_sources, user_input)
+
+        response = _build_response(final_answer, used_retriever, thread_id, sources)
+        _remember_answer(probe, response)
+        return response
+    finally:
+        _sources_var.reset(token)
+
+
+async def astream_agent(
+    user_input: str,
+    thread_id: str = "default_session",
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run the agent and yield progress events as they happen.
+
+    Yields `tool_start` and `retrieval` events around each knowledge-base search,
+    `token` events carrying answer text as the LLM generates it, and a closing `final`
+    event in the same shape `query_agent` returns. Answer-cache hits skip straight to
+    a single `token` event followed by `final`.
+    """
+    cached, probe = await asyncio.to_thread(_cached_response, user_input, thread_id)
+    if cached is not None:
+        yield {"event": "token", "data": {"text": cached["answer"]}}
+        yield {"event": "final", "data": cached}
+        return
+
+    # Streaming responses iterate in their own request task, so the sources list set
+    # here is private to this run; resetting it from a generator finalizer is unsafe.
+    sources: List[Dict[str, Any]] = []
+    _sources_var.set(sources)
+    config = _thread_config(thread_id)
+    streamed = False
+    sources_seen: Dict[str, int] = {}
+
+    async with _agent_slots():
+        agent = get_agent()
+        speculation = _start_speculation(user_input)
+        _speculation_var.set(speculation)
+        events = agent.astream_events(
+            {"messages": [HumanMessage(content=user_input)]},
+            config=config,
+            version="v2",
         )
+        try:
+            async for event in events:
+                kind = event["event"]
+                if kind == "on_tool_start" and event["name"] == "doc_retriever":
+                    sources_seen[event["run_id"]] = len(sources)
+                    tool_input = event["data"].get("input") or {}
+                    yield {
+                        "event": "tool_start",
+                        "data": {"tool": event["name"], "query": tool_input.get("query", "")},
+                    }
+                elif kind == "on_tool_end" and event["name"] == "doc_retriever":
+                    seen = sources_seen.pop(event["run_id"], 0)
+                    yield {"event": "retrieval", "data": {"sources": sources[seen:]}}
+                elif kind == "on_chat_model_stream":
+                    if event.get("metadata", {}).get("langgraph_node") == "history":
+                        continue  # summarizer output is not part of the answer
+                    chunk = event["data"]["chunk"]
+                    if (
+                        chunk.content
+                        and isinstance(chunk.content, str)
+                        and not chunk.tool_call_chunks
+                    ):
+                        streamed = True
+                        yield {"event": "token", "data": {"text": chunk.content}}
+        finally:
+            _finish_speculation(speculation)
+
+        state = await agent.aget_state(config)
+
+    final_answer, used_retriever = _read_result(state.values)
+    if final_answer and not streamed:
+        # Providers without token streaming still deliver the answer as one chunk.
+        yield {"event": "token", "data": {"text": final_answer}}
+    if used_retriever and not sources:
+        sources = await asyncio.to_thread(_collect_sources, user_input)
+
+    response = _build_response(final_answer, used_retriever, thread_id, list(sources))
+    _remember_answer(probe, response)
+    yield {"event": "final", "data": response}
+
+
+WARM_UP_QUERY = "University of Ibadan admission requirements"
+
+
+def warm_up() -> Dict[str, Any]:
+    """Build the lazy singletons and run one embedding and one search.
+
+    Otherwise the first chat after a deploy pays for loading the embeddings model,
+    opening Chroma, mapping the search indexes and compiling the graph. A failing
+    step is logged and reported, and the remaining steps still run.
+    """
+    steps = (
+        ("embeddings", get_embeddings),
+        ("vector_store", get_vectorstore),
+        ("llm", get_llm),
+        ("agent", get_agent),
+        ("embed_query", lambda: get_embeddings().embed_query(WARM_UP_QUERY)),
+        ("search", lambda: _retrieve_documents(WARM_UP_QUERY)),
+    )
+    seconds: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    started = perf_counter()
+    for name, step in steps:
+        step_started = perf_counter()
+        try:
+            step()
+        except Exception as exc:
+            logger.warning("Warm-up step %s failed: %s", name, exc)
+            errors[name] = str(exc)
+        seconds[name] = round(perf_counter() - step_started, 3)
+    report = {
+        "seconds": seconds,
+        "total_seconds": round(perf_counter() - started, 3),
+        "errors": errors,
+    }
+    logger.info("Warm-up finished in %.2fs: %s", report["total_seconds"], seconds)
+    return report
 
-        all_docs = vectorstore.get()
+
+def get_available_documents() -> List[str]:
+    manifest = load_index_manifest()
+    if manifest is not None:
+        return list(manifest["documents"])
+
+    # Stores built before the manifest existed: scan chunk metadata only, not the text.
+    try:
+        all_docs = get_vectorstore().get(include=["metadatas"])
         if not all_docs or "metadatas" not in all_docs:
             return []
 
@@ -318,19 +1033,20 @@ def get_available_documents() -> List[str]:
 def test_vector_store() -> Dict[str, Any]:
     try:
         documents = get_available_documents()
-        embedding = get_embeddings()
-        vectorstore = Chroma(
-            collection_name="UI_Policies",
-            persist_directory=_persist_dir(),
-            embedding_function=embedding,
-        )
-
         sample_query = "University of Ibadan"
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 2})
-        results = retriever.invoke(sample_query)
+        # The cached query embedding keeps repeated probes from paying for new embeddings.
+        query_vector = _embed_query(sample_query)
+        # Loading the NumPy matrix here means the readiness check pays for it, not a chat.
+        dense = _dense_index()
+        if dense is not None:
+            # Probing Chroma would page its HNSW index into every worker's memory.
+            results = dense.search([query_vector], k=2)[0]
+        else:
+            results = get_vectorstore().similarity_search_by_vector(query_vector, k=2)
 
         return {
             "status": "connected",
+            "retrieval_backend": "numpy" if dense is not None else "chroma",
             "documents_count": len(documents),
             "sample_documents": documents[:5],
             "sample_query_results": len(results) if results else 0,
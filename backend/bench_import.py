@@ -0,0 +1,62 @@
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+# Stacks that must not load when the API module is imported; they arrive on first use.
+HEAVY_PACKAGES = ("langchain_openai", "langchain_chroma", "langgraph", "chromadb", "openai")
+
+
+def import_profile(module: str = "main") -> List[Tuple[str, int, int]]:
+    """Import `module` in a fresh interpreter under `-X importtime`.
+
+    Returns `(package, self_us, cumulative_us)` for every module imported, in the
+    order Python reports them.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def run_benchmark(module: str = "main", top: int = 15, budget_ms: float = 0.0) -> int:
+    rows = import_profile(module)
+    total = next((cumulative for name, _, cumulative in rows if name == module), 0)
+    loaded = {name.split(".")[0] for name, _, _ in rows}
+    heavy = sorted(loaded.intersection(HEAVY_PACKAGES))
+
+    print("\n" + "=" * 70)
+    print(f"Cold import of `{module}`: {total / 1000:.1f}ms ({len(rows)} modules)")
+    print("=" * 70)
+    for name, _, cumulative in sorted(rows, key=lambda row: -row[2])[:top]:
+        print(f"  {cumulative / 1000:8.1f}ms  {name}")
+    print(f"\nHeavy packages loaded at import: {', '.join(heavy) or 'none'}")
+    print("=" * 70 + "\n")
+
+    if heavy or (budget_ms and total / 1000 > budget_ms):
+        print("ERROR: import time regressed.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold import time of a module.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument(
+        "--budget-ms", type=float, default=0.0, help="fail above this import time (0 = off)"
+    )
+    args = parser.parse_args()
+    sys.exit(run_benchmark(args.module, args.top, args.budget_ms))
@@ -0,0 +1,154 @@
+import argparse
+from time import perf_counter
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_chroma.vectorstores import maximal_marginal_relevance
+
+try:
+    from .settings import get_settings
+    from .vector_index import (
+        DENSE_DTYPES,
+        RESCORE_DTYPE,
+        DenseIndex,
+        collection_rows,
+        load_dense_index,
+    )
+except ImportError:
+    from settings import get_settings
+    from vector_index import (
+        DENSE_DTYPES,
+        RESCORE_DTYPE,
+        DenseIndex,
+        collection_rows,
+        load_dense_index,
+    )
+
+
+def _percentiles(samples):
+    values = np.asarray(samples) * 1000
+    return f"p50={np.percentile(values, 50):.2f}ms p95={np.percentile(values, 95):.2f}ms"
+
+
+def _sample_queries(index: DenseIndex, count: int, seed: int) -> np.ndarray:
+    # Perturbed chunk embeddings stand in for questions, so no embeddings API is called.
+    rng = np.random.default_rng(seed)
+    rows = index.rows(rng.integers(0, len(index), size=count))
+    return rows + rng.normal(scale=0.02, size=rows.shape).astype(np.float32)
+
+
+def _recall(found, expected) -> float:
+    return float(np.mean([len(set(a) & set(b)) / max(1, len(b)) for a, b in zip(found, expected)]))
+
+
+def quantization_report(index: DenseIndex, queries: np.ndarray, k: int, fetch_k: int):
+    """Recall@k of each dtype against exact float32 search, as `build_index` exports it.
+
+    int8 is rescored from a float16 copy of the rows; float16 is not rescored, so
+    its two recall columns match. Returns one row per dtype: (dtype, MB searched,
+    recall, rescored recall, MMR overlap, ms/query rescored).
+    """
+    exact = index if index.dtype == "float32" else index.quantize("float32")
+    expected = [[i for i, _ in hits] for hits in exact.search(queries, k)]
+    expected_mmr = exact.mmr(queries, k=k, fetch_k=fetch_k)
+    report = []
+    for dtype in DENSE_DTYPES:
+        quantized = exact.quantize(dtype)
+        approximate = DenseIndex(quantized.ids, quantized.vectors, quantized.scales)
+        if dtype != "float32":
+            rescore_rows = exact.full.astype(RESCORE_DTYPE) if dtype == "int8" else None
+            quantized = DenseIndex(
+                quantized.ids, quantized.vectors, quantized.scales, full=rescore_rows
+            )
+        start = perf_counter()
+        rescored = quantized.search(queries, k)
+        elapsed = perf_counter() - start
+        report.append(
+            (
+                dtype,
+                quantized.nbytes / (1024 * 1024),
+                _recall(
+                    [[i for i, _ in hits] for hits in approximate.search(queries, k)], expected
+                ),
+                _recall([[i for i, _ in hits] for hits in rescored], expected),
+                _recall(quantized.mmr(queries, k=k, fetch_k=fetch_k), expected_mmr),
+                elapsed * 1000 / len(queries),
+            )
+        )
+    return report
+
+
+def run_benchmark(queries: int = 200, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5):
+    """Time Chroma MMR against the NumPy backend on the local vector store."""
+    persist_dir = get_settings().chroma_db_path()
+    vectorstore = Chroma(collection_name="UI_Policies", persist_directory=str(persist_dir))
+
+    start = perf_counter()
+    index = load_dense_index(persist_dir)
+    source = "exported matrix (memory-mapped)"
+    if index is None:
+        index = DenseIndex.from_rows(collection_rows(vectorstore._collection))
+        source = "copied from Chroma"
+    load_seconds = perf_counter() - start
+    if not len(index):
+        print("ERROR: the vector store is empty. Run `python build_index.py` first.")
+        return
+
+    samples = _sample_queries(index, queries, seed=7)
+    print("\n" + "=" * 70)
+    print(f"Retrieval benchmark: {len(index)} chunks x {index.vectors.shape[1]} dims")
+    print("=" * 70)
+    print(f"NumPy index: {source} ({index.dtype}), loaded in {load_seconds * 1000:.1f}ms")
+
+    chroma_times, chroma_ids = [], []
+    for query in samples:
+        start = perf_counter()
+        # What the agent runs on the Chroma backend; the collection query keeps the IDs.
+        found = vectorstore._collection.query(
+            query_embeddings=[query.tolist()], n_results=fetch_k, include=["embeddings"]
+        )
+        picked = maximal_marginal_relevance(
+            query, found["embeddings"][0], k=k, lambda_mult=lambda_mult
+        )
+        chroma_times.append(perf_counter() - start)
+        chroma_ids.append({found["ids"][0][index] for index in picked})
+
+    numpy_times, numpy_ids = [], []
+    for query in samples:
+        start = perf_counter()
+        ids = index.mmr([query], k=k, fetch_k=fetch_k, lambda_mult=lambda_mult)[0]
+        numpy_times.append(perf_counter() - start)
+        numpy_ids.append(set(ids))
+
+    start = perf_counter()
+    index.mmr(samples, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult)
+    batch_seconds = perf_counter() - start
+
+    overlap = np.mean([len(a & b) / max(1, len(a)) for a, b in zip(chroma_ids, numpy_ids)])
+    print(f"Chroma MMR:        {_percentiles(chroma_times)}")
+    print(f"NumPy MMR:         {_percentiles(numpy_times)}")
+    print(
+        f"NumPy MMR batched: {batch_seconds * 1000 / queries:.3f}ms/query"
+        f" ({queries / batch_seconds:.0f} queries/s)"
+    )
+    print(f"Result overlap with Chroma: {overlap:.0%} (HNSW is approximate; NumPy is exact)")
+
+    print(f"\nQuantized search vs float32 (recall@{k}; INDEX_DENSE_DTYPE):")
+    for dtype, megabytes, recall, rescored, mmr_overlap, ms in quantization_report(
+        index, samples, k, fetch_k
+    ):
+        print(
+            f"  {dtype:<8} {megabytes:8.1f} MB  recall={recall:.1%}"
+            f"  rescored={rescored:.1%}  mmr_overlap={mmr_overlap:.1%}  {ms:.3f}ms/query"
+        )
+    print("=" * 70 + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs NumPy retrieval.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    args = parser.parse_args()
+    run_benchmark(args.queries, args.k, args.fetch_k, args.lambda_mult)
@@ -1,5 +1,14 @@
+import argparse
 import hashlib
+import json
+import multiprocessing
 import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
 from time import perf_counter
 
 import fitz
@@ -13,11 +22,6 @@ except ImportError:  # pragma: no cover - optional in some deploy environments
 
 
 from langchain_chroma import Chroma
-
-try:
-    from langchain_community.embeddings import HuggingFaceEmbeddings
-except ImportError:  # pragma: no cover - optional dependency
-    HuggingFaceEmbeddings = None
 from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -33,12 +37,33 @@ except ImportError:  # pragma: no cover - optional dependency
     Image = None
 
 try:
+    from .checkpoint import BuildCheckpoint
+    from .embedding_cache import with_embedding_cache
+    from .http_clients import provider_client_kwargs
+    from .ingest import EmbeddingIngestor
+    from .lexical import write_lexical_index
+    from .manifest import file_sha256, load_manifest, write_manifest
     from .settings import get_settings
+    from .vector_index import (
+        DENSE_DTYPES,
+        collection_rows,
+        remove_dense_index,
+        write_dense_index,
+    )
 except ImportError:
+    from checkpoint import BuildCheckpoint
+    from embedding_cache import with_embedding_cache
+    from http_clients import provider_client_kwargs
+    from ingest import EmbeddingIngestor
+    from lexical import write_lexical_index
+    from manifest import file_sha256, load_manifest, write_manifest
     from settings import get_settings
+    from vector_index import DENSE_DTYPES, collection_rows, remove_dense_index, write_dense_index
 
 load_dotenv()
 
+BASE_DIR = Path(__file__).resolve().parent
+
 
 def _as_bool(value: str) -> bool:
     return str(value).strip().lower() in {"1", "true", "yes", "on"}
@@ -52,53 +77,163 @@ MIN_CHARS = int(os.getenv("INDEX_MIN_CHARS", "20"))
 OCR_ENABLED = _as_bool(os.getenv("INDEX_OCR_ENABLED", "false"))
 OCR_LANG = os.getenv("INDEX_OCR_LANG", "eng")
 OCR_DPI = int(os.getenv("INDEX_OCR_DPI", "180"))
+OCR_WORKERS = int(os.getenv("INDEX_OCR_WORKERS", "2"))
+OCR_CACHE_DIR = os.getenv("INDEX_OCR_CACHE_DIR", "./.ocr_cache").strip()
+if OCR_CACHE_DIR:
+    OCR_CACHE_DIR = str((BASE_DIR / OCR_CACHE_DIR).resolve())
+INCREMENTAL = _as_bool(os.getenv("INDEX_INCREMENTAL", "false"))
+WORKERS = int(os.getenv("INDEX_WORKERS", "0")) or os.cpu_count() or 1
+PAGES_PER_TASK = int(os.getenv("INDEX_PAGES_PER_TASK", "64"))
+QUEUE_SIZE = int(os.getenv("INDEX_QUEUE_SIZE", "2"))
+EMBED_CONCURRENCY = int(os.getenv("INDEX_EMBED_CONCURRENCY", "4"))
+EMBED_BATCH_TOKENS = int(os.getenv("INDEX_EMBED_BATCH_TOKENS", "40000"))
+EMBED_MAX_RETRIES = int(os.getenv("INDEX_EMBED_MAX_RETRIES", "6"))
+ENCODE_THREADS = max(1, int(os.getenv("INDEX_ENCODE_THREADS", "1")))
+ENCODE_PROCESSES = int(os.getenv("INDEX_ENCODE_PROCESSES", "0")) or max(
+    1, (os.cpu_count() or 1) // ENCODE_THREADS
+)
+ENCODE_BATCH_SIZE = int(os.getenv("INDEX_ENCODE_BATCH_SIZE", "32"))
+# Only the numpy backend reads the exported matrix; other builds would ship an unused copy.
+DENSE_EXPORT = _as_bool(
+    os.getenv(
+        "INDEX_DENSE_EXPORT",
+        str(os.getenv("RETRIEVAL_BACKEND", "chroma").strip().lower() == "numpy"),
+    )
+)
+DENSE_DTYPE = os.getenv("INDEX_DENSE_DTYPE", "float32").strip().lower()
 
 
 def _persist_dir() -> str:
     return str(get_settings().chroma_db_path())
 
 
-def _extract_text_with_optional_ocr(page):
-    text = page.get_text("text").strip()
-    if text:
-        return text, False
+def _ocr_available() -> bool:
+    return OCR_ENABLED and pytesseract is not None and Image is not None
 
-    if not OCR_ENABLED:
-        return "", False
 
-    if pytesseract is None or Image is None:
-        return "", False
+def _ocr_cache_key(width: int, height: int, samples: bytes) -> str:
+    digest = hashlib.sha256(samples)
+    digest.update(f"|{width}x{height}|{OCR_LANG}|{OCR_DPI}".encode("utf-8"))
+    return digest.hexdigest()
 
-    pix = page.get_pixmap(dpi=OCR_DPI, alpha=False)
-    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
-    ocr_text = pytesseract.image_to_string(image, lang=OCR_LANG).strip()
-    return ocr_text, bool(ocr_text)
 
+def _ocr_cache_file(key: str) -> Path:
+    return Path(OCR_CACHE_DIR) / key[:2] / f"{key}.json"
 
-def load_pdf_with_metadata(
-    file_path: str,
-    document_name: str,
-    institution: str = "University of Ibadan",
-):
-    """Load PDF pages and apply OCR fallback for empty text pages."""
-    documents = []
-    stats = {
+
+def _read_ocr_cache(key: str):
+    if not OCR_CACHE_DIR:
+        return None
+    try:
+        return json.loads(_ocr_cache_file(key).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_ocr_cache(key: str, text: str, seconds: float) -> None:
+    if not OCR_CACHE_DIR:
+        return
+    path = _ocr_cache_file(key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps({"text": text, "seconds": seconds}), encoding="utf-8")
+        os.replace(temp_path, path)
+    except OSError as exc:
+        print(f"   WARN: could not write OCR cache entry: {exc}")
+
+
+def _ocr_image(key: str, width: int, height: int, samples: bytes):
+    started = perf_counter()
+    image = Image.frombytes("RGB", (width, height), samples)
+    text = pytesseract.image_to_string(image, lang=OCR_LANG).strip()
+    seconds = perf_counter() - started
+    _write_ocr_cache(key, text, seconds)
+    return text, seconds
+
+
+def _empty_stats():
+    return {
         "pages_total": 0,
         "pages_text": 0,
         "pages_ocr": 0,
         "pages_empty": 0,
         "pages_short": 0,
+        "ocr_cache_hits": 0,
+        "ocr_cache_misses": 0,
+        "ocr_seconds": 0.0,
+        "ocr_seconds_saved": 0.0,
     }
 
+
+def _merge_stats(totals, stats):
+    for key in totals:
+        totals[key] += stats[key]
+    return totals
+
+
+def load_pdf_with_metadata(
+    file_path: str,
+    document_name: str,
+    institution: str = "University of Ibadan",
+    page_range=None,
+):
+    """Load PDF pages and apply OCR fallback for empty text pages.
+
+    `page_range` is an optional `(start, stop)` pair of zero-based page indexes; the
+    whole file is read when it is omitted.
+    """
+    documents = []
+    stats = _empty_stats()
+
     doc = fitz.open(file_path)
     pdf_meta = doc.metadata or {}
     total_pages = doc.page_count
-
-    for page_index in range(total_pages):
-        page = doc.load_page(page_index)
-        stats["pages_total"] += 1
-
-        text, from_ocr = _extract_text_with_optional_ocr(page)
+    start, stop = page_range or (0, total_pages)
+
+    ocr_enabled = _ocr_available()
+    page_texts = []
+    in_flight = deque()
+
+    # Pages without a text layer are rendered here and OCRed on a small thread pool
+    # (Tesseract runs as a subprocess, so threads are enough). Renders are only kept
+    # for a bounded number of in-flight pages; cached results skip OCR entirely.
+    ocr_workers = max(1, OCR_WORKERS)
+    pool_context = ThreadPoolExecutor(max_workers=ocr_workers) if ocr_enabled else nullcontext()
+    with pool_context as ocr_pool:
+        for page_index in range(start, min(stop, total_pages)):
+            page = doc.load_page(page_index)
+            stats["pages_total"] += 1
+
+            text = page.get_text("text").strip()
+            if text or not ocr_enabled:
+                page_texts.append((page_index, text, False))
+                continue
+
+            pix = page.get_pixmap(dpi=OCR_DPI, alpha=False)
+            samples = pix.samples
+            key = _ocr_cache_key(pix.width, pix.height, samples)
+            cached = _read_ocr_cache(key)
+            if cached is not None:
+                stats["ocr_cache_hits"] += 1
+                stats["ocr_seconds_saved"] += cached.get("seconds", 0.0)
+                page_texts.append((page_index, cached.get("text", ""), True))
+                continue
+
+            stats["ocr_cache_misses"] += 1
+            future = ocr_pool.submit(_ocr_image, key, pix.width, pix.height, samples)
+            page_texts.append((page_index, future, True))
+            in_flight.append(future)
+            while len(in_flight) >= 2 * ocr_workers:
+                in_flight.popleft().result()
+
+        for index, (page_index, text, from_ocr) in enumerate(page_texts):
+            if isinstance(text, Future):
+                text, seconds = text.result()
+                stats["ocr_seconds"] += seconds
+            page_texts[index] = (page_index, text, from_ocr and bool(text))
+
+    for page_index, text, from_ocr in page_texts:
         if not text:
             stats["pages_empty"] += 1
             continue
@@ -139,6 +274,168 @@ def load_pdf_with_metadata(
     return documents, stats
 
 
+def _extract_task(task):
+    file_path, document_name, page_range = task
+    started = perf_counter()
+    pages, stats = load_pdf_with_metadata(file_path, document_name, page_range=page_range)
+    return pages, stats, perf_counter() - started
+
+
+def _page_ranges(file_path: str):
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+    step = max(1, PAGES_PER_TASK)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+def _planned_tasks(pdfs):
+    """Yield `(task, is_last_part, error)` for every page range of every PDF, in order."""
+    for pdf in pdfs:
+        try:
+            ranges = _page_ranges(str(pdf)) or [(0, 0)]
+        except Exception as exc:
+            yield None, True, exc
+            continue
+        for index, page_range in enumerate(ranges):
+            yield (str(pdf), pdf.name, page_range), index == len(ranges) - 1, None
+
+
+def extract_pdfs(pdfs, workers: int = WORKERS):
+    """Extract pages from `pdfs`, yielding `(pages, stats, seconds, error)` per file.
+
+    Large files are split into `PAGES_PER_TASK` page ranges and the ranges are spread
+    over a process pool. Only about two tasks per worker are in flight at a time, so
+    memory stays bounded however many files there are. Results are reassembled in
+    file and page order, so the output matches a sequential run exactly and chunk IDs
+    stay stable.
+    """
+    if workers <= 1:
+        for pdf in pdfs:
+            try:
+                pages, stats, seconds = _extract_task((str(pdf), pdf.name, None))
+                yield pages, stats, seconds, None
+            except Exception as exc:
+                yield [], _empty_stats(), 0.0, exc
+        return
+
+    # This runs on the prefetch thread while ingest threads are busy; forking a
+    # multi-threaded process can copy a held lock into the child, so spawn instead.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        planned = _planned_tasks(pdfs)
+        in_flight = deque()
+
+        def submit_next() -> bool:
+            item = next(planned, None)
+            if item is None:
+                return False
+            task, is_last, error = item
+            future = pool.submit(_extract_task, task) if error is None else None
+            in_flight.append((future, is_last, error))
+            return True
+
+        while len(in_flight) < 2 * workers and submit_next():
+            pass
+
+        pages, stats, seconds, failure = [], _empty_stats(), 0.0, None
+        while in_flight:
+            future, is_last, error = in_flight.popleft()
+            submit_next()
+            if future is not None and failure is None:
+                try:
+                    part_pages, part_stats, part_seconds = future.result()
+                    pages.extend(part_pages)
+                    _merge_stats(stats, part_stats)
+                    seconds += part_seconds
+                except Exception as exc:
+                    failure = exc
+            failure = failure or error
+
+            if is_last:
+                if failure is not None:
+                    yield [], _empty_stats(), 0.0, failure
+                else:
+                    yield pages, stats, seconds, None
+                pages, stats, seconds, failure = [], _empty_stats(), 0.0, None
+
+
+def _resumable_extraction(jobs, checkpoint: BuildCheckpoint, workers: int = WORKERS):
+    """`extract_pdfs` over `jobs`, reusing and saving extraction outputs in `checkpoint`."""
+    saved = {content_hash for _, content_hash in jobs if checkpoint.has_extraction(content_hash)}
+    pending = [pdf for pdf, content_hash in jobs if content_hash not in saved]
+    # Skip the process pool entirely when every file comes from the checkpoint.
+    fresh = extract_pdfs(pending, workers=workers) if pending else iter(())
+    for pdf, content_hash in jobs:
+        if content_hash in saved:
+            loaded = checkpoint.load_extraction(content_hash)
+            if loaded is not None:
+                yield (*loaded, None)
+                continue
+            # Unreadable checkpoint entry: extract this file again on its own.
+            pages, stats, seconds, error = next(extract_pdfs([pdf], workers=1))
+        else:
+            pages, stats, seconds, error = next(fresh)
+        if error is None:
+            checkpoint.save_extraction(content_hash, pages, stats, seconds)
+        yield pages, stats, seconds, error
+
+
+def _collection_chunks(vectorstore, page_size: int = 5000):
+    """Yield `(id, text)` for every chunk in the collection, a page at a time."""
+    collection = vectorstore._collection
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield from zip(page["ids"], page["documents"])
+        offset += len(page["ids"])
+
+
+def _prefetch(items, maxsize: int):
+    """Iterate `items` on a background thread, buffering at most `maxsize` results.
+
+    The producer blocks while the buffer is full, which is what keeps memory flat: the
+    next file is extracted while the current one is embedded, but never further ahead.
+    """
+    buffer = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((None, item)):
+                    return
+        except BaseException as exc:
+            put((exc, None))
+        finally:
+            put((None, done))
+
+    producer = threading.Thread(target=produce, name="index-extract", daemon=True)
+    producer.start()
+    try:
+        while True:
+            error, item = buffer.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
 def chunking(documents):
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
@@ -157,6 +454,12 @@ def add_chunk_id(chunk):
     return hashlib.sha1(key.encode("utf-8")).hexdigest()
 
 
+def _embeddings_model_name(provider: str) -> str:
+    if provider == "openai":
+        return "text-embedding-3-small"
+    return get_settings().embeddings_model
+
+
 def _init_embeddings():
     settings = get_settings()
     provider = (settings.embeddings_provider or "auto").lower()
@@ -166,17 +469,65 @@ def _init_embeddings():
     if provider == "openai":
         if not settings.openai_api_key:
             raise RuntimeError("OPENAI_API_KEY is required for openai embeddings")
-        return OpenAIEmbeddings(model="text-embedding-3-small"), provider
+        # The SDK would retry 429s out of sight; the ingestor must see them to back off
+        # and halve its concurrency.
+        embeddings = OpenAIEmbeddings(
+            model="text-embedding-3-small", max_retries=0, **provider_client_kwargs()
+        )
+        return embeddings, provider
 
     if provider == "local":
-        if HuggingFaceEmbeddings is None:
+        # Imported here so OpenAI builds never load sentence-transformers and torch.
+        try:
+            from .local_encoder import LocalEncoderEmbeddings, SentenceTransformer
+        except ImportError:
+            from local_encoder import LocalEncoderEmbeddings, SentenceTransformer
+
+        if SentenceTransformer is None:
             raise RuntimeError("sentence-transformers is not installed")
-        return HuggingFaceEmbeddings(model_name=settings.embeddings_model), provider
+        encoder = LocalEncoderEmbeddings(
+            settings.embeddings_model,
+            processes=ENCODE_PROCESSES,
+            threads_per_process=ENCODE_THREADS,
+            batch_size=ENCODE_BATCH_SIZE,
+        )
+        return encoder, provider
 
     raise RuntimeError(f"Unsupported embeddings provider: {provider}")
 
 
-def build_vector_store():
+def _index_config(provider: str) -> dict:
+    return {
+        "collection": "UI_Policies",
+        "embeddings_provider": provider,
+        "embeddings_model": _embeddings_model_name(provider),
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "min_chars": MIN_CHARS,
+        "ocr_enabled": OCR_ENABLED,
+    }
+
+
+def _previous_catalog(config: dict, incremental: bool) -> dict:
+    """Documents from the last build that an incremental run may keep as they are."""
+    if not incremental:
+        return {}
+
+    previous = load_manifest(get_settings().chroma_db_path())
+    if previous is None:
+        print("Incremental: no previous manifest found, indexing every PDF.")
+        return {}
+    if previous.get("config") != config:
+        print("Incremental: index config changed since the last build, indexing every PDF.")
+        return {}
+    return {
+        name: entry
+        for name, entry in previous["documents"].items()
+        if isinstance(entry.get("chunk_ids"), list)
+    }
+
+
+def build_vector_store(incremental: bool = INCREMENTAL, resume: bool = False):
     print("\n" + "=" * 70)
     print("UI Guide - Building Vector Store")
     print("=" * 70 + "\n")
@@ -196,110 +547,254 @@ def build_vector_store():
     print(
         "Index config:"
         f" chunk={CHUNK_SIZE}/{CHUNK_OVERLAP}, batch={BATCH_SIZE}, min_chars={MIN_CHARS},"
-        f" ocr_enabled={OCR_ENABLED}"
+        f" ocr_enabled={OCR_ENABLED}, incremental={incremental}, resume={resume},"
+        f" workers={WORKERS},"
+        f" pages_per_task={PAGES_PER_TASK}, queue={QUEUE_SIZE},"
+        f" embed_concurrency={EMBED_CONCURRENCY}, embed_batch_tokens={EMBED_BATCH_TOKENS},"
+        f" encode_processes={ENCODE_PROCESSES}x{ENCODE_THREADS},"
+        f" dense={DENSE_DTYPE if DENSE_EXPORT else 'off'}"
     )
+    if DENSE_EXPORT and DENSE_DTYPE not in DENSE_DTYPES:
+        print(f"ERROR: INDEX_DENSE_DTYPE must be one of {', '.join(DENSE_DTYPES)}.")
+        return
     if OCR_ENABLED:
-        print(f"OCR config: lang={OCR_LANG}, dpi={OCR_DPI}")
+        print(
+            f"OCR config: lang={OCR_LANG}, dpi={OCR_DPI}, workers={OCR_WORKERS},"
+            f" cache={OCR_CACHE_DIR or 'disabled'}"
+        )
     print("")
 
-    documents = []
-    skipped = []
-    totals = {
-        "pages_total": 0,
-        "pages_text": 0,
-        "pages_ocr": 0,
-        "pages_empty": 0,
-        "pages_short": 0,
-    }
+    encoder, provider = _init_embeddings()
+    embed = with_embedding_cache(
+        encoder, provider, _embeddings_model_name(provider), settings.embeddings_cache_path()
+    )
+    print(f"Embeddings provider: {provider}")
+    config = _index_config(provider)
+    previous = _previous_catalog(config, incremental)
+    checkpoint = BuildCheckpoint(settings.chroma_db_path(), config)
+    if not resume:
+        checkpoint.start()
+    elif checkpoint.resume():
+        print(f"Resuming: {len(checkpoint.committed)} chunks already committed.")
+    else:
+        print("Resume: no checkpoint for this config, starting from the first PDF.")
+    resumed_ids = set(checkpoint.committed)
+    vectorstore = Chroma(
+        collection_name="UI_Policies",
+        embedding_function=embed,
+        persist_directory=_persist_dir(),
+    )
 
-    extract_start = perf_counter()
+    catalog = {}
+    unchanged = []
+    skipped = []
+    totals = _empty_stats()
 
+    jobs = []
     for index, pdf in enumerate(pdfs, 1):
         size_mb = pdf.stat().st_size / (1024 * 1024)
-        print(f"[{index}/{len(pdfs)}] Loading: {pdf.name} ({size_mb:.1f} MB)...", flush=True)
+        print(f"[{index}/{len(pdfs)}] Checking: {pdf.name} ({size_mb:.1f} MB)...", flush=True)
 
         if size_mb > MAX_MB:
             skipped.append((pdf.name, f"Too large ({size_mb:.1f} MB)"))
             print("   SKIP (too large)")
             continue
 
-        doc_start = perf_counter()
-        try:
-            pages, stats = load_pdf_with_metadata(str(pdf), pdf.name)
-            documents.extend(pages)
-            for key in totals:
-                totals[key] += stats[key]
-            elapsed = perf_counter() - doc_start
-            print(
-                "   Loaded:"
-                f" kept={len(pages)}, text={stats['pages_text']}, ocr={stats['pages_ocr']},"
-                f" empty={stats['pages_empty']}, short={stats['pages_short']},"
-                f" time={elapsed:.1f}s"
-            )
-        except Exception as exc:
-            skipped.append((pdf.name, str(exc)))
-            print(f"   SKIP: {exc}")
+        content_hash = file_sha256(pdf)
+        if previous.get(pdf.name, {}).get("content_hash") == content_hash:
+            catalog[pdf.name] = previous[pdf.name]
+            unchanged.append(pdf.name)
+            print("   Unchanged since last build")
+            continue
+
+        jobs.append((pdf, content_hash))
+
+    # Chunks already stored for the files being re-indexed; only new ones get embedded.
+    reindexed = {pdf.name for pdf, _ in jobs}
+    previous_ids = {
+        chunk_id
+        for name, entry in previous.items()
+        if name in reindexed
+        for chunk_id in entry["chunk_ids"]
+    }
+
+    # Extraction runs ahead on a background thread (and process pool) while this
+    # thread chunks and embeds; the bounded queue between them caps memory use.
+    print(f"\nIndexing {len(jobs)} PDF(s) with {WORKERS} extraction worker(s)...")
+    pipeline_start = perf_counter()
+    extract_seconds = 0.0
+    chunk_seconds = 0.0
+    pages_kept = 0
+    chunks_created = 0
+    # Remote providers get several requests in flight. The local encoder already
+    # spreads each batch over its process pool; a second batch in flight keeps the
+    # pool busy while the previous one is written.
+    local = provider == "local"
+    ingestor = EmbeddingIngestor(
+        vectorstore,
+        embed,
+        concurrency=EMBED_CONCURRENCY if provider == "openai" else 2 if local else 1,
+        max_tokens=EMBED_BATCH_TOKENS,
+        max_items=max(BATCH_SIZE, ENCODE_BATCH_SIZE * ENCODE_PROCESSES) if local else BATCH_SIZE,
+        max_retries=EMBED_MAX_RETRIES,
+        on_write=checkpoint.record_batch,
+    )
+    chunks_resumed = 0
+
+    results = _prefetch(_resumable_extraction(jobs, checkpoint, workers=WORKERS), QUEUE_SIZE)
+    for (pdf, content_hash), (pages, stats, elapsed, error) in zip(jobs, results):
+        if error is not None:
+            skipped.append((pdf.name, str(error)))
+            print(f"   SKIP {pdf.name}: {error}")
+            if pdf.name in previous:
+                # Keep the chunks indexed from the last good copy of this file.
+                catalog[pdf.name] = previous[pdf.name]
+            continue
 
-    if not documents:
+        extract_seconds += elapsed
+        pages_kept += len(pages)
+        _merge_stats(totals, stats)
+
+        chunk_start = perf_counter()
+        chunks = chunking(pages)
+        ids = [add_chunk_id(chunk) for chunk in chunks]
+        chunk_seconds += perf_counter() - chunk_start
+        chunks_created += len(chunks)
+
+        catalog[pdf.name] = {
+            "content_hash": content_hash,
+            "size_bytes": pdf.stat().st_size,
+            "pages_kept": len(pages),
+            **stats,
+            "chunks": len(chunks),
+            "chunk_ids": ids,
+        }
+        print(
+            f"   Loaded {pdf.name}:"
+            f" kept={len(pages)}, text={stats['pages_text']}, ocr={stats['pages_ocr']},"
+            f" empty={stats['pages_empty']}, short={stats['pages_short']},"
+            f" chunks={len(chunks)}, time={elapsed:.1f}s"
+        )
+
+        for chunk, chunk_id in zip(chunks, ids):
+            if chunk_id in resumed_ids:
+                chunks_resumed += 1
+            elif chunk_id not in previous_ids:
+                ingestor.add(chunk, chunk_id)
+
+    ingestor.close()
+    if local:
+        encoder.close()
+    pipeline_elapsed = perf_counter() - pipeline_start
+
+    if not pages_kept and not unchanged:
+        checkpoint.close()
         print("\nERROR: No pages with usable text were loaded.")
         return
 
-    extract_elapsed = perf_counter() - extract_start
     print("")
     print("Extraction summary:")
     print(f"  pages_total={totals['pages_total']}")
-    print(f"  pages_kept={len(documents)}")
+    print(f"  pages_kept={pages_kept}")
     print(f"  pages_text={totals['pages_text']}")
     print(f"  pages_ocr={totals['pages_ocr']}")
     print(f"  pages_empty={totals['pages_empty']}")
     print(f"  pages_short={totals['pages_short']}")
-    print(f"  extraction_time={extract_elapsed:.1f}s")
+    if OCR_ENABLED:
+        ocr_lookups = totals["ocr_cache_hits"] + totals["ocr_cache_misses"]
+        hit_rate = totals["ocr_cache_hits"] / ocr_lookups if ocr_lookups else 0.0
+        print(f"  ocr_cache_hits={totals['ocr_cache_hits']} ({hit_rate:.0%})")
+        print(f"  ocr_time={totals['ocr_seconds']:.1f}s")
+        print(f"  ocr_time_saved={totals['ocr_seconds_saved']:.1f}s")
+    print(f"  files_unchanged={len(unchanged)}")
+    print(f"  chunks_created={chunks_created}")
+    print(f"  extraction_time={extract_seconds:.1f}s (summed over workers)")
+    print(f"  chunking_time={chunk_seconds:.1f}s")
 
     if skipped:
         print("\nSkipped files:")
         for name, reason in skipped:
             print(f"  - {name}: {reason}")
 
-    print("\nChunking documents...")
-    chunk_start = perf_counter()
-    chunks = chunking(documents)
-    chunk_elapsed = perf_counter() - chunk_start
-    print(f"Created {len(chunks)} chunks in {chunk_elapsed:.1f}s")
-
-    print("\nGenerating chunk IDs...")
-    ids = [add_chunk_id(chunk) for chunk in chunks]
-    print(f"Generated {len(ids)} IDs")
-
-    print("\nCreating embeddings and vector store...")
-    print("This can take a few minutes for large collections.")
-
-    embed, provider = _init_embeddings()
-    print(f"Embeddings provider: {provider}")
-    vectorstore = Chroma(
-        collection_name="UI_Policies",
-        embedding_function=embed,
-        persist_directory=_persist_dir(),
+    # Chunks of modified or removed files that the new extraction did not reproduce.
+    # They are removed only after the new chunks are in, so queries never see a gap.
+    current_ids = {chunk_id for entry in catalog.values() for chunk_id in entry["chunk_ids"]}
+    stale_ids = sorted(
+        {
+            chunk_id
+            for name, entry in previous.items()
+            if catalog.get(name) is not entry
+            for chunk_id in entry["chunk_ids"]
+        }
+        - current_ids
     )
-
-    ingest_start = perf_counter()
-    for start in range(0, len(chunks), BATCH_SIZE):
-        batch_chunks = chunks[start : start + BATCH_SIZE]
-        batch_ids = ids[start : start + BATCH_SIZE]
-        vectorstore.add_documents(documents=batch_chunks, ids=batch_ids)
-        done = min(start + BATCH_SIZE, len(chunks))
-        print(f"  Processed {done}/{len(chunks)} chunks...")
-    ingest_elapsed = perf_counter() - ingest_start
+    if stale_ids:
+        print(f"\nRemoving {len(stale_ids)} stale chunks...")
+        for start in range(0, len(stale_ids), BATCH_SIZE):
+            vectorstore.delete(ids=stale_ids[start : start + BATCH_SIZE])
+
+    # BM25 postings cover the whole collection, including chunks kept from earlier builds.
+    lexical_start = perf_counter()
+    lexical = write_lexical_index(settings.chroma_db_path(), _collection_chunks(vectorstore))
+    lexical_elapsed = perf_counter() - lexical_start
+    dense = None
+    if DENSE_EXPORT:
+        # Unit-length rows that RETRIEVAL_BACKEND=numpy memory-maps.
+        dense = write_dense_index(
+            settings.chroma_db_path(), collection_rows(vectorstore._collection), DENSE_DTYPE
+        )
+    else:
+        # A matrix from an earlier build would no longer match the collection.
+        remove_dense_index(settings.chroma_db_path())
 
     vec_count = vectorstore._collection.count()
+    manifest = write_manifest(settings.chroma_db_path(), catalog, config=config)
+    checkpoint.clear()
     print("\nSUCCESS")
-    print(f"  chunks_added={len(chunks)}")
+    print(f"  chunks_added={ingestor.written}")
+    print(f"  chunks_removed={len(stale_ids)}")
+    if resume:
+        print(f"  chunks_resumed={chunks_resumed}")
     print(f"  vectors_in_collection={vec_count}")
     print(f"  vector_store={_persist_dir()}")
-    print(f"  ingest_time={ingest_elapsed:.1f}s")
+    print(f"  manifest_version={manifest['version']}")
+    print(
+        f"  lexical_index={lexical['terms']} terms, {lexical['postings']} postings"
+        f" ({lexical_elapsed:.1f}s)"
+    )
+    if dense is not None:
+        print(
+            f"  dense_index={dense['count']}x{dense['dim']} {dense['dtype']}"
+            f" ({dense['bytes'] / (1024 * 1024):.1f} MB searched per query)"
+        )
+    print(f"  rate_limited_retries={ingestor.throttled}")
+    if local:
+        print(
+            f"  local_encode_rate={encoder.chunks_per_second:.1f} chunks/s"
+            f" ({encoder.processes} process(es) x {encoder.threads_per_process} thread(s))"
+        )
+    if hasattr(embed, "store"):
+        cache = embed.store.stats()
+        print(f"  embedding_cache_hits={cache['hits']} ({cache['hit_rate']:.0%})")
+    print(f"  write_time={ingestor.write_seconds:.1f}s")
+    print(f"  pipeline_time={pipeline_elapsed:.1f}s")
     print("\n" + "=" * 70)
     print("Index build complete.")
     print("=" * 70 + "\n")
 
 
 if __name__ == "__main__":
-    build_vector_store()
+    parser = argparse.ArgumentParser(description="Build the UI Guide vector store.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=INCREMENTAL,
+        help="only re-index PDFs whose content changed since the last build",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted build from its last committed batch",
+    )
+    args = parser.parse_args()
+    build_vector_store(incremental=args.incremental, resume=args.resume)
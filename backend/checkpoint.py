@@ -0,0 +1,121 @@
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+CHECKPOINT_DIR = ".build_checkpoint"
+CHECKPOINT_FORMAT = 1
+
+
+class BuildCheckpoint:
+    """Progress of an index build, kept next to the Chroma files until it succeeds.
+
+    Every chunk ID written to Chroma is appended to `committed_ids.txt` as soon as
+    its batch is stored, and each file's extracted pages are saved under
+    `extracted/<content hash>.json`. A resumed build reuses both, so it neither
+    re-extracts finished files nor re-embeds committed batches. The checkpoint only
+    applies to builds with the same index config.
+    """
+
+    def __init__(self, persist_dir: Path, config: Dict[str, Any]):
+        self.directory = Path(persist_dir) / CHECKPOINT_DIR
+        self.config = config
+        self.committed: set = set()
+        self._ids_file = None
+
+    @property
+    def _state_path(self) -> Path:
+        return self.directory / "checkpoint.json"
+
+    @property
+    def _ids_path(self) -> Path:
+        return self.directory / "committed_ids.txt"
+
+    def _extraction_path(self, content_hash: str) -> Path:
+        return self.directory / "extracted" / f"{content_hash}.json"
+
+    def resume(self) -> bool:
+        """Load an earlier checkpoint; returns False (and starts fresh) if none applies."""
+        try:
+            state = json.loads(self._state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = None
+        if (
+            not isinstance(state, dict)
+            or state.get("format") != CHECKPOINT_FORMAT
+            or state.get("config") != self.config
+        ):
+            self.start()
+            return False
+
+        try:
+            lines = self._ids_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            lines = []
+        # A crash mid-append can leave a partial last line; it never matches an ID.
+        self.committed = {line for line in lines if line}
+        self._open_ids()
+        return True
+
+    def start(self) -> None:
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        (self.directory / "extracted").mkdir(parents=True, exist_ok=True)
+        state = {
+            "format": CHECKPOINT_FORMAT,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "config": self.config,
+        }
+        self._state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        self.committed = set()
+        self._open_ids()
+
+    def _open_ids(self) -> None:
+        self._ids_file = open(self._ids_path, "a", encoding="utf-8")
+
+    def record_batch(self, ids: Iterable[str]) -> None:
+        ids = list(ids)
+        self._ids_file.write("".join(f"{chunk_id}\n" for chunk_id in ids))
+        self._ids_file.flush()
+        os.fsync(self._ids_file.fileno())
+        self.committed.update(ids)
+
+    def has_extraction(self, content_hash: str) -> bool:
+        return self._extraction_path(content_hash).exists()
+
+    def save_extraction(
+        self, content_hash: str, pages: List[Document], stats: Dict[str, Any], seconds: float
+    ) -> None:
+        path = self._extraction_path(content_hash)
+        payload = {
+            "pages": [{"text": page.page_content, "metadata": page.metadata} for page in pages],
+            "stats": stats,
+            "seconds": seconds,
+        }
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(temp_path, path)
+
+    def load_extraction(
+        self, content_hash: str
+    ) -> Optional[Tuple[List[Document], Dict[str, Any], float]]:
+        try:
+            payload = json.loads(self._extraction_path(content_hash).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        pages = [Document(page_content=p["text"], metadata=p["metadata"]) for p in payload["pages"]]
+        return pages, payload["stats"], payload["seconds"]
+
+    def close(self) -> None:
+        if self._ids_file is not None:
+            self._ids_file.close()
+            self._ids_file = None
+
+    def clear(self) -> None:
+        """Drop the checkpoint once the build has finished and the manifest is written."""
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
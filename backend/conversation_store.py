@@ -0,0 +1,384 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at);
+"""
+
+
+class SQLiteConversationStore(BaseCheckpointSaver):
+    """LangGraph checkpointer backed by one SQLite file in WAL mode.
+
+    Several uvicorn workers can point at the same file and see the same threads.
+    Only the newest `keep_checkpoints` checkpoints of a thread are kept, since each
+    checkpoint holds the full conversation. Every `sweep_interval_seconds`, threads
+    idle for longer than `ttl_seconds` are deleted, and then the least recently
+    used threads beyond `max_threads` are deleted too. Async methods run the same
+    queries on a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_threads: int = 10000,
+        keep_checkpoints: int = 2,
+        sweep_interval_seconds: float = 60,
+        clock=time.time,
+    ):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max(1, max_threads)
+        self.keep_checkpoints = max(1, keep_checkpoints)
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._clock = clock
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self.evicted_threads = 0
+
+    # -- reads -----------------------------------------------------------------
+
+    def _pending_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> List[Tuple[str, str, Any]]:
+        rows = self._db.execute(
+            "SELECT task_id, channel, type, value FROM writes"
+            " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+            " ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [
+            (task_id, channel, self.serde.loads_typed((kind, value)))
+            for task_id, channel, kind, value in rows
+        ]
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row: Sequence[Any]) -> CheckpointTuple:
+        checkpoint_id, parent_id, kind, checkpoint, metadata_kind, metadata = row
+        parent_config = None
+        if parent_id:
+            parent_config = {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_id,
+                }
+            }
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((kind, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_kind, metadata)),
+            parent_config=parent_config,
+            pending_writes=self._pending_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type,"
+            " metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: Tuple[Any, ...] = (thread_id, checkpoint_ns)
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+            return self._to_tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type,"
+            " checkpoint, metadata_type, metadata FROM checkpoints WHERE 1 = 1"
+        )
+        params: Tuple[Any, ...] = ()
+        if config is not None:
+            configurable = config["configurable"]
+            query += " AND thread_id = ?"
+            params += (configurable["thread_id"],)
+            if configurable.get("checkpoint_ns") is not None:
+                query += " AND checkpoint_ns = ?"
+                params += (configurable["checkpoint_ns"],)
+            if get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params += (get_checkpoint_id(config),)
+        if before is not None and get_checkpoint_id(before):
+            query += " AND checkpoint_id < ?"
+            params += (get_checkpoint_id(before),)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+            found = []
+            for row in rows:
+                item = self._to_tuple(row[0], row[1], row[2:])
+                if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                    continue
+                found.append(item)
+                if limit is not None and len(found) >= limit:
+                    break
+        yield from found
+
+    # -- writes ----------------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        kind, payload = self.serde.dumps_typed(checkpoint)
+        metadata_kind, metadata_payload = self.serde.dumps_typed(dict(metadata))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        configurable.get("checkpoint_id"),
+                        kind,
+                        payload,
+                        metadata_kind,
+                        metadata_payload,
+                    ),
+                )
+                self._compact(thread_id, checkpoint_ns)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, self._clock())
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if self._clock() - self._last_sweep >= self.sweep_interval_seconds:
+                self._sweep()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        # Special writes (errors, interrupts) replace earlier ones; others keep the first.
+        verb = "REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            kind, payload = self.serde.dumps_typed(value)
+            rows.append(
+                (
+                    configurable["thread_id"],
+                    configurable.get("checkpoint_ns", ""),
+                    configurable["checkpoint_id"],
+                    task_id,
+                    task_path,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    kind,
+                    payload,
+                )
+            )
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    f"INSERT OR {verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete_threads([thread_id])
+
+    # -- eviction --------------------------------------------------------------
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> None:
+        stale = [
+            row[0]
+            for row in self._db.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                " ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.keep_checkpoints),
+            )
+        ]
+        for table in ("checkpoints", "writes"):
+            self._db.executemany(
+                f"DELETE FROM {table}"
+                " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in stale],
+            )
+
+    def _delete_threads(self, thread_ids: Sequence[str]) -> None:
+        if not thread_ids:
+            return
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("checkpoints", "writes", "threads"):
+                self._db.executemany(
+                    f"DELETE FROM {table} WHERE thread_id = ?", [(t,) for t in thread_ids]
+                )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self.evicted_threads += len(thread_ids)
+
+    def _sweep(self) -> None:
+        self._last_sweep = self._clock()
+        expired = [
+            row[0]
+            for row in self._db.execute(
+                "SELECT thread_id FROM threads WHERE updated_at < ?",
+                (self._last_sweep - self.ttl_seconds,),
+            )
+        ]
+        self._delete_threads(expired)
+        overflow = [
+            row[0]
+            for row in self._db.execute(
+                "SELECT thread_id FROM threads ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                (self.max_threads,),
+            )
+        ]
+        self._delete_threads(overflow)
+
+    def sweep(self) -> None:
+        """Evict idle and excess threads now instead of on the next due `put`."""
+        with self._lock:
+            self._sweep()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            threads = self._db.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+            checkpoints = self._db.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        return {
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "max_threads": self.max_threads,
+            "evicted_threads": self.evicted_threads,
+        }
+
+    # -- async -----------------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
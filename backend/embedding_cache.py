@@ -0,0 +1,159 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Persistent vectors for one (provider, model) pair.
+
+    Vectors are appended to a raw float32 file that is read through a memory map; a
+    small SQLite table maps content hash to row number. Appends happen inside an
+    immediate SQLite transaction, which serializes writers across processes, so an
+    index build and the API can share one directory.
+    """
+
+    def __init__(self, directory: Path, provider: str, model: str):
+        namespace = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{provider}-{model}")
+        self.directory = Path(directory) / namespace
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.f32"
+        self._vectors_path.touch(exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.directory / "index.sqlite3",
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+        )
+        self._dim: Optional[int] = self._read_dim()
+        self._matrix: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _read_dim(self) -> Optional[int]:
+        found = self._db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        return int(found[0]) if found else None
+
+    def _rows(self, minimum: int) -> np.ndarray:
+        if self._matrix is None or len(self._matrix) < minimum:
+            # Size the map from committed rows, not the file: another process may be
+            # mid-append, and a crash can leave a partial row at the end.
+            committed = self._db.execute("SELECT MAX(row) + 1 FROM entries").fetchone()[0]
+            rows = max(minimum, committed or 0)
+            self._matrix = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim)
+            )
+        return self._matrix
+
+    def get_many(self, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        if not hashes:
+            return {}
+        with self._lock:
+            self._dim = self._dim or self._read_dim()
+            found = {}
+            unique = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique), 500):
+                part = unique[start : start + 500]
+                marks = ",".join("?" * len(part))
+                found.update(
+                    self._db.execute(
+                        f"SELECT hash, row FROM entries WHERE hash IN ({marks})", part
+                    ).fetchall()
+                )
+            if found:
+                matrix = self._rows(max(found.values()) + 1)
+                found = {key: np.array(matrix[row]) for key, row in found.items()}
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+            return found
+
+    def put_many(self, vectors: Dict[str, Sequence[float]]) -> None:
+        if not vectors:
+            return
+        keys = list(vectors)
+        matrix = np.asarray([vectors[key] for key in keys], dtype=np.float32)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self._read_dim()
+                if dim is None:
+                    dim = matrix.shape[1]
+                    self._db.execute("INSERT INTO meta VALUES ('dim', ?)", (str(dim),))
+                if matrix.shape[1] != dim:
+                    raise ValueError(f"Embedding size {matrix.shape[1]} does not match {dim}")
+                self._dim = dim
+                with open(self._vectors_path, "r+b") as handle:
+                    handle.seek(0, 2)
+                    first_row = handle.tell() // (4 * dim)
+                    handle.seek(first_row * 4 * dim)
+                    handle.write(matrix.tobytes())
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?)",
+                    [(key, first_row + offset) for offset, key in enumerate(keys)],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "path": str(self.directory),
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that consults an `EmbeddingStore` before embedding documents."""
+
+    def __init__(self, inner: Embeddings, store: EmbeddingStore):
+        self.inner = inner
+        self.store = store
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [content_hash(text) for text in texts]
+        found = self.store.get_many(hashes)
+        missing = {key: text for key, text in zip(hashes, texts) if key not in found}
+        if missing:
+            computed = self.inner.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing, computed))
+            self.store.put_many(fresh)
+            found.update(
+                {key: np.asarray(vector, dtype=np.float32) for key, vector in fresh.items()}
+            )
+        return [found[key].tolist() for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Every distinct question would grow the store forever; the agent keeps query
+        # vectors in its bounded in-process LRU instead.
+        return self.inner.embed_query(text)
+
+
+def with_embedding_cache(
+    embeddings: Embeddings, provider: str, model: str, directory: Optional[Path]
+) -> Embeddings:
+    """Wrap `embeddings` with the on-disk cache; `directory=None` disables it."""
+    if directory is None:
+        return embeddings
+    return CachedEmbeddings(embeddings, EmbeddingStore(directory, provider, model))
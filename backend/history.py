@@ -0,0 +1,108 @@
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a student and UI GUIDE, "
+    "an assistant for University of Ibadan policies. Merge the new turns into the "
+    "existing summary. Keep the student's goals, any facts, figures, and document or "
+    "page citations the assistant gave, and open questions. Drop greetings and small "
+    "talk. Write plain prose under 200 words."
+)
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a human message."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _brief(turn: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """The question and final answer of a turn, without tool calls or tool results."""
+    return [
+        message
+        for message in turn
+        if isinstance(message, HumanMessage)
+        or (isinstance(message, AIMessage) and not message.tool_calls and message.content)
+    ]
+
+
+def _shorten_tool_results(turn: Sequence[BaseMessage], max_chars: int) -> List[BaseMessage]:
+    shortened = []
+    for message in turn:
+        if isinstance(message, ToolMessage) and len(str(message.content)) > max_chars:
+            content = str(message.content)[:max_chars].rstrip() + " [...]"
+            message = message.model_copy(update={"content": content})
+        shortened.append(message)
+    return shortened
+
+
+def window_messages(
+    messages: Sequence[BaseMessage],
+    summary: str = "",
+    keep_turns: int = 4,
+    tool_chars: int = 600,
+) -> List[BaseMessage]:
+    """The conversation as the LLM should see it this turn.
+
+    The running summary comes first. Turns older than the last `keep_turns` that are
+    not summarized yet keep only their question and answer. Recent turns stay
+    verbatim, but their tool results are cut to `tool_chars`. The current turn is
+    sent unchanged.
+    """
+    turns = split_turns(messages)
+    keep_turns = max(1, keep_turns)
+    older, recent = turns[:-keep_turns], turns[-keep_turns:]
+
+    window: List[BaseMessage] = []
+    if summary:
+        window.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+    for turn in older:
+        window.extend(_brief(turn))
+    for turn in recent[:-1]:
+        window.extend(_shorten_tool_results(turn, tool_chars))
+    if recent:
+        window.extend(recent[-1])
+    return window
+
+
+def plan_summary(
+    messages: Sequence[BaseMessage],
+    summary: str = "",
+    keep_turns: int = 4,
+    batch_turns: int = 4,
+) -> Optional[Tuple[List[BaseMessage], List[BaseMessage]]]:
+    """Return (messages to fold, summarizer prompt) once `batch_turns` old turns piled up.
+
+    Folding in batches keeps the summarizer call off most turns, while the prompt
+    stays bounded by the summary, at most `batch_turns` briefed turns and the
+    `keep_turns` recent ones.
+    """
+    turns = split_turns(messages)
+    older = turns[: -max(1, keep_turns)]
+    if len(older) < max(1, batch_turns):
+        return None
+
+    lines = []
+    for turn in older:
+        for message in _brief(turn):
+            speaker = "Student" if isinstance(message, HumanMessage) else "Assistant"
+            lines.append(f"{speaker}: {message.content}")
+    prompt = [
+        SystemMessage(content=SUMMARY_INSTRUCTIONS),
+        HumanMessage(
+            content=(f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n" + "\n".join(lines))
+        ),
+    ]
+    folded = [message for turn in older for message in turn]
+    return folded, prompt
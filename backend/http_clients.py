@@ -0,0 +1,79 @@
+import importlib.util
+import logging
+from functools import lru_cache
+from typing import Any, Dict
+
+import httpx
+
+try:
+    from .settings import get_settings
+except ImportError:
+    from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def http_timeout() -> httpx.Timeout:
+    """Default per-request timeout; connecting and waiting for a pooled connection fail fast."""
+    settings = get_settings()
+    return httpx.Timeout(
+        settings.http_timeout_seconds,
+        connect=settings.http_connect_timeout_seconds,
+        pool=settings.http_connect_timeout_seconds,
+    )
+
+
+def _client_options() -> Dict[str, Any]:
+    settings = get_settings()
+    http2 = settings.http_http2 and http2_available()
+    if settings.http_http2 and not http2:
+        logger.info("HTTP/2 needs the `h2` package (httpx[http2]); using HTTP/1.1.")
+    return {
+        "http2": http2,
+        "timeout": http_timeout(),
+        "limits": httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_seconds,
+        ),
+    }
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """The process-wide sync connection pool shared by every provider SDK client.
+
+    OpenAI and Groq SDKs send absolute URLs, so one pool serves both hosts; kept-alive
+    connections spare each request a new TLS handshake, and `HTTP_MAX_CONNECTIONS`
+    bounds the sockets a worker opens under load.
+    """
+    return httpx.Client(**_client_options())
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of `get_http_client`, for the API's event loop."""
+    return httpx.AsyncClient(**_client_options())
+
+
+def provider_client_kwargs() -> Dict[str, Any]:
+    """Keyword arguments that point a LangChain provider model at the shared pools."""
+    return {
+        "http_client": get_http_client(),
+        "http_async_client": get_async_http_client(),
+        "timeout": http_timeout(),
+    }
+
+
+async def aclose_http_clients() -> None:
+    """Close the pools that were created; called when the API shuts down."""
+    if get_async_http_client.cache_info().currsize:
+        await get_async_http_client().aclose()
+        get_async_http_client.cache_clear()
+    if get_http_client.cache_info().currsize:
+        get_http_client().close()
+        get_http_client.cache_clear()
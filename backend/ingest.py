@@ -0,0 +1,203 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+
+_encoding = None
+
+
+def _get_encoding():
+    """The tiktoken encoding, or None when tiktoken or its data files are unavailable."""
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                pass
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """Token count for batching; falls back to ~4 characters per token without tiktoken."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def _is_rate_limited(exc: Exception) -> bool:
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimit:
+    """Concurrency limit that halves on rate limiting and grows back after successes."""
+
+    def __init__(self, maximum: int):
+        self.maximum = max(1, maximum)
+        self.limit = self.maximum
+        self.throttled = 0
+        self._active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self, throttled: bool = False) -> None:
+        with self._condition:
+            self._active -= 1
+            if throttled:
+                self.throttled += 1
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self.limit < self.maximum and self._successes >= self.limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+def embed_with_backoff(
+    embeddings,
+    texts: List[str],
+    limit: AdaptiveLimit,
+    max_retries: int = 6,
+    base_delay: float = 1.0,
+) -> List[List[float]]:
+    delay = base_delay
+    for attempt in range(max_retries + 1):
+        limit.acquire()
+        throttled = False
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as exc:
+            if not _is_rate_limited(exc) or attempt == max_retries:
+                raise
+            throttled = True
+            wait = _retry_after(exc) or delay * (1 + random.random())
+            delay = min(delay * 2, 60.0)
+        finally:
+            limit.release(throttled)
+        time.sleep(wait)
+    raise RuntimeError("unreachable")  # pragma: no cover
+
+
+class EmbeddingIngestor:
+    """Embeds chunk batches concurrently and writes them to Chroma from one thread.
+
+    Batches close at `max_tokens` or `max_items`, whichever comes first. Up to
+    `concurrency` embedding requests run at once. The limit halves on HTTP 429 and
+    recovers as requests succeed. Finished batches are written by the thread that
+    calls `add`/`close`, in submission order, so Chroma only ever sees one writer.
+    """
+
+    def __init__(
+        self,
+        vectorstore,
+        embeddings,
+        concurrency: int = 4,
+        max_tokens: int = 40000,
+        max_items: int = 120,
+        max_retries: int = 6,
+        on_write: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self._collection = vectorstore._collection
+        self._embeddings = embeddings
+        self._limit = AdaptiveLimit(concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self._in_flight = deque()
+        self._batch = []
+        self._batch_tokens = 0
+        self._seen = set()
+        self.max_tokens = max_tokens
+        self.max_items = max(1, max_items)
+        self.max_retries = max_retries
+        self.on_write = on_write
+        self.written = 0
+        self.write_seconds = 0.0
+        self._started = perf_counter()
+
+    @property
+    def throttled(self) -> int:
+        return self._limit.throttled
+
+    def add(self, chunk, chunk_id: str) -> None:
+        if chunk_id in self._seen:
+            return
+        self._seen.add(chunk_id)
+        tokens = count_tokens(chunk.page_content)
+        if self._batch and (
+            self._batch_tokens + tokens > self.max_tokens or len(self._batch) >= self.max_items
+        ):
+            self._submit()
+        self._batch.append((chunk, chunk_id))
+        self._batch_tokens += tokens
+
+    def _submit(self) -> None:
+        batch, self._batch, self._batch_tokens = self._batch, [], 0
+        texts = [chunk.page_content for chunk, _ in batch]
+        future = self._pool.submit(
+            embed_with_backoff, self._embeddings, texts, self._limit, self.max_retries
+        )
+        self._in_flight.append((batch, future))
+        # At most two batches per worker are queued or in flight, bounding memory.
+        while len(self._in_flight) > 2 * self._limit.maximum:
+            self._write_oldest()
+
+    def _write_oldest(self) -> None:
+        batch, future = self._in_flight.popleft()
+        vectors = future.result()
+        write_start = perf_counter()
+        ids = [chunk_id for _, chunk_id in batch]
+        self._collection.upsert(
+            ids=ids,
+            embeddings=vectors,
+            metadatas=[chunk.metadata for chunk, _ in batch],
+            documents=[chunk.page_content for chunk, _ in batch],
+        )
+        self.write_seconds += perf_counter() - write_start
+        self.written += len(batch)
+        if self.on_write is not None:
+            self.on_write(ids)
+        elapsed = perf_counter() - self._started
+        print(
+            f"  Embedded {self.written} chunks"
+            f" ({self.written / elapsed if elapsed else 0.0:.1f} chunks/s,"
+            f" concurrency={self._limit.limit})...",
+            flush=True,
+        )
+
+    def close(self) -> None:
+        try:
+            if self._batch:
+                self._submit()
+            while self._in_flight:
+                self._write_oldest()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,264 @@
+import heapq
+import json
+import math
+import os
+import re
+import shutil
+import uuid
+from collections import Counter, defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LEXICAL_POINTER = "lexical_index.json"
+LEXICAL_FORMAT = 1
+MAX_TERM_BYTES = 40
+# Postings held in memory before a sorted run is spilled to disk (about 46 MB).
+SPILL_POSTINGS = 1_000_000
+# Rows read from a run or copied into a final array at a time.
+MERGE_BLOCK = 65536
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_POSTING = np.dtype([("term", f"S{MAX_TERM_BYTES}"), ("doc", np.int32), ("freq", np.uint16)])
+_TOKEN = re.compile(r"[^\W_]+(?:\.[^\W_]+)*")
+_ALPHA_DIGIT = re.compile(r"[^\W\d_]+|\d+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its me my "
+    "of on or our so than that the their there these this to was we were what when "
+    "where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, keeping codes like `4.2.1` whole.
+
+    Mixed tokens such as `GES101` also yield their parts (`ges`, `101`), so a
+    question typed as "GES 101" still matches.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if "." not in token:
+            parts = _ALPHA_DIGIT.findall(token)
+            if len(parts) > 1:
+                tokens.extend(parts)
+    return tokens
+
+
+def _term_key(term: str) -> bytes:
+    return term.encode("utf-8")[:MAX_TERM_BYTES]
+
+
+def _spill(records: np.ndarray, spill_dir: Path, runs: List[Path]) -> None:
+    # Records arrive in document order, so a stable sort on the term keeps each
+    # term's postings sorted by document.
+    path = spill_dir / f"run-{len(runs)}.npy"
+    np.save(path, records[np.argsort(records["term"], kind="stable")])
+    runs.append(path)
+
+
+def _run_groups(path: Path, run_index: int):
+    """Yield `(term, run_index, docs, freqs)` per term of a sorted run, a block at a time."""
+    run = np.load(path, mmap_mode="r")
+    for start in range(0, len(run), MERGE_BLOCK):
+        block = np.asarray(run[start : start + MERGE_BLOCK])
+        terms = block["term"]
+        edges = [0, *(np.flatnonzero(terms[1:] != terms[:-1]) + 1).tolist(), len(block)]
+        for low, high in zip(edges, edges[1:]):
+            yield bytes(terms[low]), run_index, block["doc"][low:high], block["freq"][low:high]
+
+
+def _raw_to_npy(raw: Path, target: Path, dtype) -> int:
+    """Copy a file of raw `dtype` items into a `.npy` file a block at a time."""
+    count = raw.stat().st_size // np.dtype(dtype).itemsize
+    output = np.lib.format.open_memmap(target, mode="w+", dtype=dtype, shape=(count,))
+    if count:
+        source = np.memmap(raw, dtype=dtype, mode="r", shape=(count,))
+        for start in range(0, count, MERGE_BLOCK):
+            output[start : start + MERGE_BLOCK] = source[start : start + MERGE_BLOCK]
+        del source
+    output.flush()
+    del output
+    raw.unlink()
+    return count
+
+
+def write_lexical_index(persist_dir: Path, chunks: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+    """Build the BM25 postings for `(chunk_id, text)` pairs next to the Chroma files.
+
+    Postings are buffered up to `SPILL_POSTINGS` at a time, spilled to disk as
+    sorted runs and merged term by term into the final arrays, so build memory
+    stays flat however large the corpus is. Arrays are saved as `.npy` files in a
+    fresh directory, and the pointer file is swapped last, so a running API keeps
+    reading the previous index until then.
+    """
+    persist_dir = Path(persist_dir)
+    name = f"lexical-{uuid.uuid4().hex[:12]}"
+    directory = persist_dir / name
+    spill_dir = directory / "spill"
+    spill_dir.mkdir(parents=True)
+
+    buffer = np.empty(SPILL_POSTINGS, dtype=_POSTING)
+    filled = 0
+    runs: List[Path] = []
+    documents = 0
+    total_length = 0
+    with open(spill_dir / "ids", "wb") as ids_file, open(spill_dir / "lengths", "wb") as lengths:
+        for doc_index, (chunk_id, text) in enumerate(chunks):
+            counts = Counter(_term_key(term) for term in tokenize(text or ""))
+            length = sum(counts.values())
+            documents += 1
+            total_length += length
+            ids_file.write(np.asarray([chunk_id], dtype="S64").tobytes())
+            lengths.write(np.float32(length).tobytes())
+            if filled + len(counts) > len(buffer):
+                _spill(buffer[:filled], spill_dir, runs)
+                filled = 0
+            records = np.array(
+                [(term, doc_index, min(freq, 65535)) for term, freq in counts.items()],
+                dtype=_POSTING,
+            )
+            if len(records) > len(buffer):
+                _spill(records, spill_dir, runs)
+                continue
+            buffer[filled : filled + len(records)] = records
+            filled += len(records)
+    if filled:
+        _spill(buffer[:filled], spill_dir, runs)
+    del buffer
+
+    total = sum(np.load(run, mmap_mode="r").shape[0] for run in runs)
+    docs = np.lib.format.open_memmap(
+        directory / "docs.npy", mode="w+", dtype=np.int32, shape=(total,)
+    )
+    freqs = np.lib.format.open_memmap(
+        directory / "freqs.npy", mode="w+", dtype=np.uint16, shape=(total,)
+    )
+    position = 0
+    term_count = 0
+    current = None
+    term_dtype = f"S{MAX_TERM_BYTES}"
+    with open(spill_dir / "terms", "wb") as terms, open(spill_dir / "offsets", "wb") as offsets:
+        groups = (_run_groups(run, run_index) for run_index, run in enumerate(runs))
+        for term, _, term_docs, term_freqs in heapq.merge(*groups, key=lambda g: (g[0], g[1])):
+            if term != current:
+                terms.write(np.asarray([term], dtype=term_dtype).tobytes())
+                offsets.write(np.int64(position).tobytes())
+                current = term
+                term_count += 1
+            docs[position : position + len(term_docs)] = term_docs
+            freqs[position : position + len(term_docs)] = term_freqs
+            position += len(term_docs)
+        offsets.write(np.int64(position).tobytes())
+        if not term_count:
+            terms.write(np.asarray([b""], dtype=term_dtype).tobytes())
+    docs.flush()
+    freqs.flush()
+    del docs, freqs
+
+    _raw_to_npy(spill_dir / "terms", directory / "terms.npy", term_dtype)
+    _raw_to_npy(spill_dir / "offsets", directory / "offsets.npy", np.int64)
+    _raw_to_npy(spill_dir / "lengths", directory / "lengths.npy", np.float32)
+    if not documents:
+        with open(spill_dir / "ids", "wb") as ids_file:
+            ids_file.write(np.asarray([""], dtype="S64").tobytes())
+    _raw_to_npy(spill_dir / "ids", directory / "ids.npy", "S64")
+    shutil.rmtree(spill_dir, ignore_errors=True)
+
+    meta = {
+        "format": LEXICAL_FORMAT,
+        "directory": name,
+        "documents": documents,
+        "terms": term_count,
+        "avg_length": total_length / documents if documents else 0.0,
+    }
+    pointer = persist_dir / LEXICAL_POINTER
+    temp_path = pointer.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(temp_path, pointer)
+
+    # Older indexes are no longer referenced; open memory maps survive the unlink.
+    for old in persist_dir.glob("lexical-*"):
+        if old.name != name:
+            shutil.rmtree(old, ignore_errors=True)
+    return {"documents": documents, "terms": term_count, "postings": total}
+
+
+class LexicalIndex:
+    """BM25 scorer over memory-mapped postings written by `write_lexical_index`."""
+
+    def __init__(self, directory: Path, meta: Dict):
+        def load(name: str) -> np.ndarray:
+            return np.load(directory / f"{name}.npy", mmap_mode="r")
+
+        self.documents = int(meta["documents"])
+        self.term_count = int(meta["terms"])
+        self.avg_length = float(meta["avg_length"]) or 1.0
+        self._terms = load("terms")
+        self._offsets = load("offsets")
+        self._docs = load("docs")
+        self._freqs = load("freqs")
+        self._lengths = load("lengths")
+        self._ids = load("ids")
+
+    def _postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        key = _term_key(term)
+        position = int(np.searchsorted(self._terms, key))
+        if position >= self.term_count or self._terms[position] != key:
+            return None
+        start, end = self._offsets[position], self._offsets[position + 1]
+        return self._docs[start:end], self._freqs[start:end]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top `k` (chunk_id, BM25 score) pairs with a positive score."""
+        if not self.documents:
+            return []
+        scores = np.zeros(self.documents, dtype=np.float32)
+        for term in set(tokenize(query)):
+            found = self._postings(term)
+            if found is None:
+                continue
+            docs, freqs = found
+            idf = math.log(1 + (self.documents - len(docs) + 0.5) / (len(docs) + 0.5))
+            freqs = freqs.astype(np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[docs] / self.avg_length)
+            scores[docs] += idf * freqs * (BM25_K1 + 1) / (freqs + norm)
+
+        k = min(k, self.documents)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._ids[i].decode("utf-8"), float(scores[i])) for i in top if scores[i] > 0]
+
+
+@lru_cache(maxsize=2)
+def _open_index(persist_dir: str, _stamp: Tuple[int, int]) -> Optional[LexicalIndex]:
+    try:
+        meta = json.loads((Path(persist_dir) / LEXICAL_POINTER).read_text(encoding="utf-8"))
+        if meta.get("format") != LEXICAL_FORMAT:
+            return None
+        return LexicalIndex(Path(persist_dir) / meta["directory"], meta)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_lexical_index(persist_dir: Path) -> Optional[LexicalIndex]:
+    """The current BM25 index, reopened only when a rebuild swaps the pointer file."""
+    try:
+        stat = (Path(persist_dir) / LEXICAL_POINTER).stat()
+    except OSError:
+        return None
+    return _open_index(str(persist_dir), (stat.st_mtime_ns, stat.st_size))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Merge ranked ID lists; an ID scores sum(1 / (k + rank)) over the lists it is in."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
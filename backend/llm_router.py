@@ -0,0 +1,366 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from time import perf_counter
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Inner provider calls must not report to the caller's callbacks: with a hedge in
+# flight, both providers would otherwise stream tokens into the same answer.
+_SILENT = {"callbacks": []}
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive errors and stays open for `cooldown_seconds`.
+
+    After the cooldown the breaker is half-open: calls go through again, the first
+    success closes it and a failure reopens it for another cooldown.
+    """
+
+    def __init__(
+        self,
+        failures: int = 5,
+        cooldown_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failures = max(1, failures)
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at >= self.cooldown_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self._opened_at is not None:
+                self._opened_at = self._clock()
+            elif self._consecutive >= self.failures:
+                self._opened_at = self._clock()
+                self.trips += 1
+
+
+class ProviderHealth:
+    """Recent latencies per call kind, error counts and the breaker for one provider."""
+
+    def __init__(self, window: int, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self._window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {}
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, kind: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self._latencies.setdefault(kind, deque(maxlen=self._window)).append(seconds)
+            else:
+                self.errors += 1
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def percentile(self, kind: str, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = list(self._latencies.get(kind, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return float(np.percentile(samples, q))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = {kind: list(samples) for kind, samples in self._latencies.items()}
+            calls, errors = self.calls, self.errors
+        latency = {
+            kind: {
+                "samples": len(samples),
+                **{
+                    f"p{q}_seconds": round(float(np.percentile(samples, q)), 3)
+                    for q in (50, 95, 99)
+                },
+            }
+            for kind, samples in kinds.items()
+            if samples
+        }
+        return {
+            "calls": calls,
+            "errors": errors,
+            "error_rate": round(errors / calls, 4) if calls else 0.0,
+            "latency": latency,
+            "breaker": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+        }
+
+
+class RouterState:
+    """Health and hedging counters shared by a router and its `bind_tools` copies.
+
+    The hedge deadline for a provider is its p95 latency for that call kind, never
+    below `min_deadline_seconds`; until `min_samples` calls have finished it is
+    `default_deadline_seconds`.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        default_deadline_seconds: float = 4.0,
+        min_deadline_seconds: float = 0.5,
+        min_samples: int = 20,
+        window: int = 200,
+        breaker_failures: int = 5,
+        breaker_cooldown_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.default_deadline_seconds = default_deadline_seconds
+        self.min_deadline_seconds = min_deadline_seconds
+        self.min_samples = min_samples
+        self.providers = {
+            name: ProviderHealth(
+                window, CircuitBreaker(breaker_failures, breaker_cooldown_seconds, clock)
+            )
+            for name in names
+        }
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def deadline(self, name: str, kind: str) -> float:
+        p95 = self.providers[name].percentile(kind, 95, self.min_samples)
+        if p95 is None:
+            return self.default_deadline_seconds
+        return max(self.min_deadline_seconds, p95)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hedges, hedge_wins, failovers = self.hedges, self.hedge_wins, self.failovers
+        return {
+            "hedges": hedges,
+            "hedge_wins": hedge_wins,
+            "failovers": failovers,
+            "providers": {name: health.stats() for name, health in self.providers.items()},
+        }
+
+
+@lru_cache(maxsize=1)
+def _hedge_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class HedgedChatModel(BaseChatModel):
+    """Chat model that routes each call across providers by health and latency.
+
+    Calls go to the first provider whose breaker is closed. If it has not answered
+    by its p95-based deadline, the next provider gets the same request and the first
+    answer wins; an error fails over at once. Streams hedge on the first chunk, so
+    only one provider's tokens ever reach the caller.
+    """
+
+    providers: List[Tuple[str, Any]]
+    state: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-router"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "HedgedChatModel":
+        bound = [(name, model.bind_tools(tools, **kwargs)) for name, model in self.providers]
+        return self.model_copy(update={"providers": bound})
+
+    def stats(self) -> Dict[str, Any]:
+        return self.state.stats()
+
+    def _candidates(self) -> List[Tuple[str, Any]]:
+        allowed = [item for item in self.providers if self.state.providers[item[0]].breaker.allow()]
+        # With every breaker open, trying the preferred provider beats failing outright.
+        return allowed or list(self.providers[:1])
+
+    def _record(self, name: str, kind: str, started: float, ok: bool) -> None:
+        self.state.providers[name].record(kind, perf_counter() - started, ok)
+
+    def _race(self, call: Callable[[Any], Any], kind: str) -> Any:
+        candidates = self._candidates()
+        primary = candidates[0][0]
+        futures: Dict[Any, str] = {}
+
+        def timed(name: str, model: Any) -> Any:
+            started = perf_counter()
+            try:
+                result = call(model)
+            except Exception:
+                self._record(name, kind, started, ok=False)
+                raise
+            self._record(name, kind, started, ok=True)
+            return result
+
+        def launch(name: str, model: Any) -> None:
+            futures[_hedge_pool().submit(timed, name, model)] = name
+
+        launch(*candidates[0])
+        waiting = candidates[1:]
+        deadline: Optional[float] = self.state.deadline(primary, kind)
+        pending = set(futures)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(
+                pending, timeout=deadline if waiting else None, return_when=FIRST_COMPLETED
+            )
+            deadline = None
+            if not done:
+                self.state.count("hedges")
+                launch(*waiting.pop(0))
+                pending = {future for future in futures if not future.done()}
+                continue
+            for future in done:
+                if future.exception() is None:
+                    if futures[future] != primary:
+                        self.state.count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+            if waiting and not pending:
+                self.state.count("failovers")
+                launch(*waiting.pop(0))
+                pending = {future for future in futures if not future.done()}
+        raise error
+
+    async def _arace(self, call: Callable[[Any], Any], kind: str) -> Any:
+        candidates = self._candidates()
+        primary = candidates[0][0]
+        tasks: Dict[asyncio.Task, str] = {}
+
+        async def timed(name: str, model: Any) -> Any:
+            started = perf_counter()
+            try:
+                result = await call(model)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._record(name, kind, started, ok=False)
+                raise
+            self._record(name, kind, started, ok=True)
+            return result
+
+        def launch(name: str, model: Any) -> None:
+            tasks[asyncio.ensure_future(timed(name, model))] = name
+
+        launch(*candidates[0])
+        waiting = candidates[1:]
+        deadline: Optional[float] = self.state.deadline(primary, kind)
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=deadline if waiting else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                deadline = None
+                if not done:
+                    self.state.count("hedges")
+                    launch(*waiting.pop(0))
+                    pending = {task for task in tasks if not task.done()}
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] != primary:
+                            self.state.count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+                if waiting and not pending:
+                    self.state.count("failovers")
+                    launch(*waiting.pop(0))
+                    pending = {task for task in tasks if not task.done()}
+            raise error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            # Let cancelled calls unwind before their streams or connections are reused.
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._race(
+            lambda model: model.invoke(messages, _SILENT, stop=stop, **kwargs), "invoke"
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = await self._arace(
+            lambda model: model.ainvoke(messages, _SILENT, stop=stop, **kwargs), "invoke"
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        opened: List[Any] = []
+
+        async def first_chunk(model: Any):
+            stream = model.astream(messages, _SILENT, stop=stop, **kwargs)
+            opened.append(stream)
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+
+        try:
+            stream, chunk = await self._arace(first_chunk, "stream")
+            while chunk is not None:
+                # BaseChatModel reports each yielded chunk to the callbacks itself.
+                yield ChatGenerationChunk(message=chunk)
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    chunk = None
+        finally:
+            for other in opened:
+                await other.aclose()
@@ -0,0 +1,136 @@
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Callable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # pragma: no cover - optional dependency
+    SentenceTransformer = None
+
+_worker_model = None
+
+
+def load_sentence_transformer(model_name: str):
+    if SentenceTransformer is None:
+        raise RuntimeError("sentence-transformers is not installed")
+    return SentenceTransformer(model_name, device="cpu")
+
+
+def _limit_threads(threads: int) -> None:
+    # Each process gets a fixed share of the cores instead of every process
+    # starting a thread per core and fighting over them.
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:  # pragma: no cover - optional dependency
+        pass
+
+
+def _init_worker(model_name: str, threads: int, loader: Callable) -> None:
+    global _worker_model
+    _limit_threads(threads)
+    _worker_model = loader(model_name)
+
+
+def _encode_with(model, texts: List[str], batch_size: int) -> np.ndarray:
+    vectors = model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _encode(texts: List[str], batch_size: int) -> np.ndarray:
+    return _encode_with(_worker_model, texts, batch_size)
+
+
+class LocalEncoderEmbeddings(Embeddings):
+    """Sentence-transformers encoder spread over a pool of CPU processes.
+
+    Texts are sorted by length before they are cut into per-process slices, so each
+    model batch holds texts of similar length and little time goes into padding.
+    Vectors come back in the caller's order. `processes=1` encodes in this process.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        processes: int = 1,
+        threads_per_process: int = 1,
+        batch_size: int = 32,
+        loader: Callable = load_sentence_transformer,
+    ):
+        self.model_name = model_name
+        self.processes = max(1, processes)
+        self.threads_per_process = max(1, threads_per_process)
+        self.batch_size = max(1, batch_size)
+        self._loader = loader
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._model = None
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # torch and its thread pools are already loaded here, and the ingestor
+                # calls in from its own threads; a forked child could inherit a held
+                # lock, so workers start from a fresh interpreter.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.threads_per_process, self._loader),
+                )
+            return self._pool
+
+    def _encode_sorted(self, texts: List[str]) -> np.ndarray:
+        if self.processes == 1:
+            if self._model is None:
+                _limit_threads(self.threads_per_process)
+                self._model = self._loader(self.model_name)
+            return _encode_with(self._model, texts, self.batch_size)
+
+        slices = min(self.processes, math.ceil(len(texts) / self.batch_size))
+        size = math.ceil(len(texts) / slices)
+        pool = self._executor()
+        futures = [
+            pool.submit(_encode, texts[start : start + size], self.batch_size)
+            for start in range(0, len(texts), size)
+        ]
+        return np.concatenate([future.result() for future in futures])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        started = perf_counter()
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        vectors = self._encode_sorted([texts[index] for index in order])
+        result = np.empty_like(vectors)
+        result[order] = vectors
+        with self._lock:
+            self.encoded += len(texts)
+            self.encode_seconds += perf_counter() - started
+        return result.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.encoded / self.encode_seconds if self.encode_seconds else 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
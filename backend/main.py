@@ -1,18 +1,26 @@
+import importlib
+import json
 import logging
 import os
+import threading
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Literal, Optional
+from typing import Any, Callable, Dict, List, Literal, Optional
 
 from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
 try:
+    from .coalesce import SingleFlight
+    from .readiness import ReadinessProbe
     from .settings import get_settings
 except ImportError:
+    from coalesce import SingleFlight
+    from readiness import ReadinessProbe
     from settings import get_settings
 
 
@@ -29,27 +37,84 @@ def _missing_dependency_error(exc: Exception):
     return _handler
 
 
-try:
-    try:
-        from .agent import get_available_documents, query_agent, test_vector_store
-    except ImportError:
-        from agent import get_available_documents, query_agent, test_vector_store
-except Exception as exc:
-    logger.warning("Agent dependencies failed to load: %s", exc)
-    get_available_documents = _missing_dependency_error(exc)
-    query_agent = _missing_dependency_error(exc)
-    test_vector_store = _missing_dependency_error(exc)
+def _import_backend(name: str):
+    if __package__:
+        return importlib.import_module(f"{__package__}.{name}")
+    return importlib.import_module(name)
 
-try:
-    try:
-        from .speech import server_speech_available, synthesize_speech, transcribe_audio
-    except ImportError:
-        from speech import server_speech_available, synthesize_speech, transcribe_audio
-except Exception as exc:
-    logger.warning("Speech dependencies failed to load: %s", exc)
-    server_speech_available = _missing_dependency_error(exc)
-    synthesize_speech = _missing_dependency_error(exc)
-    transcribe_audio = _missing_dependency_error(exc)
+
+# Imported backend modules, or the exception their import raised.
+_backends: Dict[str, Any] = {}
+_backends_lock = threading.Lock()
+
+
+def _resolve(module: str, name: str) -> Callable:
+    """`module.name`, importing the module once; a failed import is remembered too."""
+    with _backends_lock:
+        if module not in _backends:
+            try:
+                _backends[module] = _import_backend(module)
+            except Exception as exc:
+                logger.warning("%s dependencies failed to load: %s", module.capitalize(), exc)
+                _backends[module] = exc
+    backend = _backends[module]
+    if isinstance(backend, Exception):
+        return _missing_dependency_error(backend)
+    return getattr(backend, name)
+
+
+async def _aresolve(module: str, name: str) -> Callable:
+    # The import itself, or waiting for the warm-up thread to finish it, runs off the
+    # event loop so other requests keep being served meanwhile.
+    if module in _backends:
+        return _resolve(module, name)
+    return await run_in_threadpool(_resolve, module, name)
+
+
+def _lazy(module: str, name: str, kind: str = "sync"):
+    """Call `module.name`, importing the module on first use.
+
+    `agent` pulls in langchain, langgraph and Chroma, and `speech` the OpenAI client.
+    Loading them here instead of at import keeps `/health`, `/live` and static files
+    fast on a cold start; the warm-up task imports them in the background. The
+    returned functions are plain module attributes, so tests can still replace them.
+
+    `kind` is "sync" for functions async handlers call through `run_in_threadpool`,
+    "async" for coroutine functions and "stream" for async generators; the latter
+    two import in a worker thread before the first call.
+    """
+    if kind == "async":
+
+        async def call(*args, **kwargs):
+            return await (await _aresolve(module, name))(*args, **kwargs)
+
+    elif kind == "stream":
+
+        async def call(*args, **kwargs):
+            async for item in (await _aresolve(module, name))(*args, **kwargs):
+                yield item
+
+    else:
+
+        def call(*args, **kwargs):
+            return _resolve(module, name)(*args, **kwargs)
+
+    call.__name__ = name
+    return call
+
+
+aquery_agent = _lazy("agent", "aquery_agent", "async")
+astream_agent = _lazy("agent", "astream_agent", "stream")
+cache_stats = _lazy("agent", "cache_stats")
+get_available_documents = _lazy("agent", "get_available_documents")
+is_first_turn = _lazy("agent", "is_first_turn")
+record_exchange = _lazy("agent", "record_exchange")
+test_vector_store = _lazy("agent", "test_vector_store")
+warm_up = _lazy("agent", "warm_up")
+aclose_http_clients = _lazy("http_clients", "aclose_http_clients", "async")
+server_speech_available = _lazy("speech", "server_speech_available")
+synthesize_speech = _lazy("speech", "synthesize_speech")
+transcribe_audio = _lazy("speech", "transcribe_audio")
 
 
 def _frontend_dist_dir() -> Optional[Path]:
@@ -76,10 +141,29 @@ persist_dir = settings.chroma_db_path()
 if not persist_dir.exists():
     logger.warning("Vector store not found at %s. Run `python build_index.py` first.", persist_dir)
 
+# Looked up at call time so tests can swap `test_vector_store` and `warm_up`.
+readiness = ReadinessProbe(
+    lambda: test_vector_store(),
+    interval_seconds=settings.readiness_interval_seconds,
+    warm_up=(lambda: warm_up()) if settings.warm_up_enabled else None,
+)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    readiness.start()
+    try:
+        yield
+    finally:
+        await readiness.stop()
+        await aclose_http_clients()
+
+
 app = FastAPI(
     title="UI Guide API",
     description="Your intelligent guide to University of Ibadan policies and information",
     version="2.1.0",
+    lifespan=lifespan,
 )
 
 origins = settings.origins()
@@ -187,21 +271,58 @@ async def root():
     if frontend_dist is not None:
         return FileResponse(frontend_dist / "index.html")
 
-    vector_status = test_vector_store()
     return {
         "status": "healthy",
         "message": "UI Guide API is running",
         "version": "2.1.0",
         "backend": "FastAPI + LangGraph",
-        "vector_store": vector_status,
+        "vector_store": readiness.snapshot()["vector_store"],
     }
 
 
+chat_flights = SingleFlight()
+
+
+def _coalescing_key(request: QueryRequest):
+    return (" ".join(request.message.lower().split()), request.mode, request.verbosity)
+
+
+async def _coalesced_query(request: QueryRequest, thread_id: str) -> dict:
+    """Answer a chat, sharing one agent run among identical concurrent first turns.
+
+    Only turns that start a thread qualify: with no history, the same message gets
+    the same answer. The leader's run writes to its own thread; the shared exchange
+    is recorded once in every other thread that waited on it, so follow-up questions
+    have context and no conversation is shared between users.
+    """
+    first_turn = request.thread_id is None or await run_in_threadpool(is_first_turn, thread_id)
+    if not first_turn:
+        return await aquery_agent(request.message, thread_id, first_turn=False)
+
+    async def lead():
+        answer = await aquery_agent(request.message, thread_id, first_turn=True)
+        return answer, {thread_id}
+
+    (result, recorded), shared = await chat_flights.run(_coalescing_key(request), lead)
+    if not shared:
+        return result
+    if thread_id not in recorded:
+        recorded.add(thread_id)
+        try:
+            await run_in_threadpool(record_exchange, thread_id, request.message, result["answer"])
+        except Exception as exc:
+            logger.warning("Could not record a coalesced chat in its thread: %s", exc)
+    return {**result, "thread_id": thread_id}
+
+
 @app.post("/chat", response_model=QueryResponse)
 async def chat(request: QueryRequest):
     try:
         thread_id = request.thread_id or str(uuid.uuid4())
-        result = query_agent(request.message, thread_id)
+        if settings.chat_coalescing:
+            result = await _coalesced_query(request, thread_id)
+        else:
+            result = await aquery_agent(request.message, thread_id)
         return QueryResponse(
             answer=result["answer"],
             used_retriever=result["used_retriever"],
@@ -212,16 +333,73 @@ async def chat(request: QueryRequest):
         raise HTTPException(status_code=503, detail={"message": str(exc)})
 
 
+def _sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _chat_events(message: str, thread_id: str):
+    try:
+        async for item in astream_agent(message, thread_id):
+            data = item["data"]
+            if item["event"] == "final":
+                data = QueryResponse(**data).model_dump()
+            yield _sse_message(item["event"], data)
+    except RuntimeError as exc:
+        yield _sse_message("error", {"message": str(exc)})
+    except Exception as exc:
+        trace_id = str(uuid.uuid4())
+        logger.exception("Unhandled streaming error %s", trace_id)
+        error = {
+            "message": "Failed to process your request. Please try again.",
+            "trace_id": trace_id,
+        }
+        if settings.debug:
+            error["details"] = str(exc)
+        yield _sse_message("error", error)
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: QueryRequest):
+    thread_id = request.thread_id or str(uuid.uuid4())
+    return StreamingResponse(
+        _chat_events(request.message, thread_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
 
+@app.get("/live")
+async def live():
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+async def ready():
+    snapshot = readiness.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
+
+@app.get("/metrics")
+async def metrics():
+    try:
+        return {
+            "caches": await run_in_threadpool(cache_stats),
+            "coalescing": chat_flights.stats(),
+        }
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail={"message": str(exc)})
+
+
 @app.get("/capabilities", response_model=CapabilitiesResponse)
 async def capabilities():
     speech_enabled = False
     try:
-        speech_enabled = bool(server_speech_available())
+        speech_enabled = bool(await run_in_threadpool(server_speech_available))
     except Exception:
         speech_enabled = False
 
@@ -273,7 +451,7 @@ async def speech_synthesize(request: SpeechSynthesisRequest):
 @app.get("/documents", response_model=DocumentsResponse)
 async def documents():
     try:
-        docs = get_available_documents()
+        docs = await run_in_threadpool(get_available_documents)
         status = "success" if docs else "empty"
         return {
             "count": len(docs),
@@ -287,7 +465,7 @@ async def documents():
 @app.get("/test-vector")
 async def test_vector():
     try:
-        return test_vector_store()
+        return await run_in_threadpool(test_vector_store)
     except Exception as exc:
         raise HTTPException(status_code=500, detail={"message": str(exc)})
 
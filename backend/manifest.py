@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+MANIFEST_NAME = "index_manifest.json"
+MANIFEST_FORMAT = 1
+
+
+def manifest_path(persist_dir: Path) -> Path:
+    return Path(persist_dir) / MANIFEST_NAME
+
+
+def file_sha256(path: Path, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _index_fingerprint(documents: Dict[str, Dict[str, Any]], config: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8"))
+    for name in sorted(documents):
+        digest.update(f"{name}|{documents[name].get('content_hash', '')}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def write_manifest(
+    persist_dir: Path,
+    documents: Dict[str, Dict[str, Any]],
+    config: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Write the document catalog next to the Chroma files.
+
+    `documents` maps document name to its build stats (content hash, page and chunk
+    counts); `config` holds the settings that shape the index, such as chunk size and
+    embeddings model. Both feed the manifest `version`.
+    """
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "version": _index_fingerprint(documents, config),
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": config,
+        "documents": {name: documents[name] for name in sorted(documents)},
+    }
+    path = manifest_path(persist_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(temp_path, path)
+    return manifest
+
+
+@lru_cache(maxsize=4)
+def _read_manifest(path: str, _stamp: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+    try:
+        manifest = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("documents"), dict):
+        return None
+    return manifest
+
+
+def load_manifest(persist_dir: Path) -> Optional[Dict[str, Any]]:
+    """Return the parsed manifest, re-reading the file only when it changes on disk."""
+    path = manifest_path(persist_dir)
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return _read_manifest(str(path), (stat.st_mtime_ns, stat.st_size))
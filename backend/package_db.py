@@ -1,16 +1,52 @@
+import json
 import tarfile
 from pathlib import Path
 
 try:
+    from .checkpoint import CHECKPOINT_DIR
     from .settings import get_settings
+    from .vector_index import DENSE_POINTER
 except ImportError:
+    from checkpoint import CHECKPOINT_DIR
     from settings import get_settings
+    from vector_index import DENSE_POINTER
 
 
 BASE_DIR = Path(__file__).resolve().parent
 ARCHIVE_NAME = "chroma_db.tar.gz"
 
 
+def _archive_filter(chroma_dir: Path):
+    """Leave out files the API never reads.
+
+    An interrupted build's checkpoint (extracted text and batch state) stays
+    local. Only the dense export named by the dense pointer is shipped. A quantized export
+    searches `search.npy`, so a float32 `vectors.npy` left there by an older build
+    would only add to the download.
+    """
+    try:
+        meta = json.loads((chroma_dir / DENSE_POINTER).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        meta = {}
+    current = meta.get("directory")
+    quantized = meta.get("dtype", "float32") != "float32"
+
+    def keep(member: tarfile.TarInfo):
+        parts = Path(member.name).parts[1:]
+        if parts and parts[0] == CHECKPOINT_DIR:
+            return None
+        if parts and parts[0].startswith("dense-"):
+            if parts[0] != current:
+                return None
+            if quantized and parts[1:] == ("vectors.npy",):
+                return None
+        if member.name.endswith(".tmp"):
+            return None
+        return member
+
+    return keep
+
+
 def package_chroma_db() -> None:
     """Package the Chroma database folder into a compressed archive."""
 
@@ -29,7 +65,7 @@ def package_chroma_db() -> None:
     print(f"Compressing {chroma_dir} to {output_file}...")
 
     with tarfile.open(output_file, "w:gz") as tar:
-        tar.add(chroma_dir, arcname=chroma_dir.name)
+        tar.add(chroma_dir, arcname=chroma_dir.name, filter=_archive_filter(chroma_dir))
 
     size_mb = output_file.stat().st_size / (1024 * 1024)
 
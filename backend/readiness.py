@@ -0,0 +1,91 @@
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ReadinessProbe:
+    """Runs a status check in the background and keeps the latest result.
+
+    Request handlers read `snapshot()` instead of running the check themselves, so
+    health traffic costs nothing no matter how often load balancers poll.
+    """
+
+    def __init__(
+        self,
+        check: Callable[[], Dict[str, Any]],
+        interval_seconds: float = 300,
+        warm_up: Optional[Callable[[], Dict[str, Any]]] = None,
+    ):
+        self._check = check
+        self._warm_up = warm_up
+        self.interval_seconds = max(1.0, interval_seconds)
+        self._task: Optional[asyncio.Task] = None
+        self.warm_up_report: Optional[Dict[str, Any]] = None
+        self._snapshot: Dict[str, Any] = {
+            "ready": False,
+            "status": "starting",
+            "checked_at": None,
+            "check_seconds": None,
+            "vector_store": None,
+            "warm_up": None,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self._snapshot)
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._snapshot["ready"])
+
+    async def refresh(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(self._check)
+        except Exception as exc:
+            logger.warning("Readiness check failed: %s", exc)
+            result = {"status": "error", "message": str(exc)}
+
+        ready = result.get("status") == "connected"
+        self._snapshot = {
+            "ready": ready,
+            "status": "ready" if ready else "not_ready",
+            "checked_at": time.time(),
+            "check_seconds": round(time.perf_counter() - started, 3),
+            "vector_store": result,
+            "warm_up": self.warm_up_report,
+        }
+        return self.snapshot()
+
+    async def warm_up(self) -> Optional[Dict[str, Any]]:
+        """Run the warm-up callable once; the first check only runs after it returns."""
+        if self._warm_up is None:
+            return None
+        self._snapshot = {**self._snapshot, "status": "warming_up"}
+        try:
+            self.warm_up_report = await asyncio.to_thread(self._warm_up)
+        except Exception as exc:
+            logger.warning("Warm-up failed: %s", exc)
+            self.warm_up_report = {"errors": {"warm_up": str(exc)}}
+        return self.warm_up_report
+
+    async def _run(self) -> None:
+        await self.warm_up()
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
@@ -1,7 +1,7 @@
 import os
 from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 try:
     from dotenv import load_dotenv
@@ -31,6 +31,11 @@ class Settings(BaseModel):
     groq_api_key: str = ""
     groq_model: str = "llama-3.3-70b-versatile"
     llm_provider: str = "auto"
+    llm_hedging: bool = True
+    llm_hedge_default_seconds: float = 4.0
+    llm_hedge_min_seconds: float = 0.5
+    llm_breaker_failures: int = 5
+    llm_breaker_cooldown_seconds: float = 30.0
     embeddings_provider: str = "auto"
     embeddings_model: str = "sentence-transformers/all-MiniLM-L6-v2"
     speech_to_text_model: str = "whisper-1"
@@ -38,7 +43,34 @@ class Settings(BaseModel):
     speech_voice: str = "alloy"
     docs_dir: str = "./docs"
     chroma_db_dir: str = "./chroma_db"
+    embeddings_cache_dir: str = "./embeddings_cache"
+    conversation_db: str = "./conversations.sqlite3"
+    conversation_ttl_seconds: int = 7 * 24 * 3600
+    conversation_max_threads: int = 10000
+    conversation_keep_checkpoints: int = 2
     allowed_origins: str = "http://localhost:5173"
+    agent_max_concurrency: int = 16
+    chat_coalescing: bool = True
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_max_entries: int = 512
+    retrieval_cache_size: int = 1024
+    retrieval_hybrid: bool = True
+    retrieval_backend: str = "chroma"
+    retrieval_speculative: bool = True
+    retrieval_speculative_threshold: float = 0.85
+    history_keep_turns: int = 4
+    history_tool_chars: int = 600
+    history_summary_batch: int = 4
+    readiness_interval_seconds: int = 300
+    warm_up_enabled: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive: int = 20
+    http_keepalive_seconds: float = 60.0
+    http_http2: bool = True
+    http_connect_timeout_seconds: float = 5.0
+    http_timeout_seconds: float = 60.0
     debug: bool = False
 
     def origins(self) -> List[str]:
@@ -55,6 +87,16 @@ class Settings(BaseModel):
     def chroma_db_path(self) -> Path:
         return _resolve_backend_path(self.chroma_db_dir, "./chroma_db")
 
+    def embeddings_cache_path(self) -> Optional[Path]:
+        if not self.embeddings_cache_dir.strip():
+            return None
+        return _resolve_backend_path(self.embeddings_cache_dir, "./embeddings_cache")
+
+    def conversation_db_path(self) -> Optional[Path]:
+        if not self.conversation_db.strip():
+            return None
+        return _resolve_backend_path(self.conversation_db, "./conversations.sqlite3")
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
@@ -63,6 +105,11 @@ def get_settings() -> Settings:
         groq_api_key=os.getenv("GROQ_API_KEY", ""),
         groq_model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
         llm_provider=os.getenv("LLM_PROVIDER", "auto").lower(),
+        llm_hedging=os.getenv("LLM_HEDGING", "true").lower() in {"1", "true", "yes"},
+        llm_hedge_default_seconds=float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "4")),
+        llm_hedge_min_seconds=float(os.getenv("LLM_HEDGE_MIN_SECONDS", "0.5")),
+        llm_breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        llm_breaker_cooldown_seconds=float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30")),
         embeddings_provider=os.getenv("EMBEDDINGS_PROVIDER", "auto").lower(),
         embeddings_model=os.getenv("EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
         speech_to_text_model=os.getenv("SPEECH_TO_TEXT_MODEL", "whisper-1"),
@@ -70,6 +117,35 @@ def get_settings() -> Settings:
         speech_voice=os.getenv("SPEECH_VOICE", "alloy"),
         docs_dir=os.getenv("DOCS_DIR", "./docs"),
         chroma_db_dir=os.getenv("CHROMA_DB_DIR", "./chroma_db"),
+        embeddings_cache_dir=os.getenv("EMBEDDINGS_CACHE_DIR", "./embeddings_cache"),
+        conversation_db=os.getenv("CONVERSATION_DB", "./conversations.sqlite3"),
+        conversation_ttl_seconds=int(os.getenv("CONVERSATION_TTL_SECONDS", str(7 * 24 * 3600))),
+        conversation_max_threads=int(os.getenv("CONVERSATION_MAX_THREADS", "10000")),
+        conversation_keep_checkpoints=int(os.getenv("CONVERSATION_KEEP_CHECKPOINTS", "2")),
         allowed_origins=os.getenv("ALLOWED_ORIGINS", "http://localhost:5173"),
+        agent_max_concurrency=int(os.getenv("AGENT_MAX_CONCURRENCY", "16")),
+        chat_coalescing=os.getenv("CHAT_COALESCING", "true").lower() in {"1", "true", "yes"},
+        answer_cache_enabled=os.getenv("ANSWER_CACHE_ENABLED", "true").lower()
+        in {"1", "true", "yes"},
+        answer_cache_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        answer_cache_ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+        answer_cache_max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512")),
+        retrieval_cache_size=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+        retrieval_hybrid=os.getenv("RETRIEVAL_HYBRID", "true").lower() in {"1", "true", "yes"},
+        retrieval_backend=os.getenv("RETRIEVAL_BACKEND", "chroma").lower(),
+        retrieval_speculative=os.getenv("RETRIEVAL_SPECULATIVE", "true").lower()
+        in {"1", "true", "yes"},
+        retrieval_speculative_threshold=float(os.getenv("RETRIEVAL_SPECULATIVE_THRESHOLD", "0.85")),
+        history_keep_turns=int(os.getenv("HISTORY_KEEP_TURNS", "4")),
+        history_tool_chars=int(os.getenv("HISTORY_TOOL_CHARS", "600")),
+        history_summary_batch=int(os.getenv("HISTORY_SUMMARY_BATCH", "4")),
+        readiness_interval_seconds=int(os.getenv("READINESS_INTERVAL_SECONDS", "300")),
+        warm_up_enabled=os.getenv("WARM_UP_ENABLED", "true").lower() in {"1", "true", "yes"},
+        http_max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        http_max_keepalive=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+        http_keepalive_seconds=float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60")),
+        http_http2=os.getenv("HTTP_HTTP2", "true").lower() in {"1", "true", "yes"},
+        http_connect_timeout_seconds=float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5")),
+        http_timeout_seconds=float(os.getenv("HTTP_TIMEOUT_SECONDS", "60")),
         debug=os.getenv("DEBUG", "false").lower() in {"1", "true", "yes"},
     )
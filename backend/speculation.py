@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict
+
+
+class Speculation:
+    """A retrieval for the user's message, started before the LLM asked for one."""
+
+    def __init__(self, query: str, future: Future):
+        self.query = query
+        self.future = future
+        # Set once a tool call compared its query, so unused runs can be counted.
+        self.consulted = False
+
+
+class SpeculationStats:
+    """Thread-safe counts of how speculative retrievals were used.
+
+    A speculation is a hit when a tool call reused its result, a miss when the tool
+    query was not similar enough, and unused when the agent never searched.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.unused = 0
+        self.failed = 0
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "unused": self.unused,
+                "failed": self.failed,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "wasted_rate": (round(self.unused / self.started, 4) if self.started else 0.0),
+            }
@@ -11,8 +11,10 @@ else:
     _openai_import_error = None
 
 try:
+    from .http_clients import get_http_client, http_timeout
     from .settings import get_settings
 except ImportError:
+    from http_clients import get_http_client, http_timeout
     from settings import get_settings
 
 
@@ -31,7 +33,11 @@ def _require_openai_audio() -> None:
 @lru_cache(maxsize=1)
 def get_audio_client():
     _require_openai_audio()
-    return OpenAI(api_key=get_settings().openai_api_key)
+    return OpenAI(
+        api_key=get_settings().openai_api_key,
+        http_client=get_http_client(),
+        timeout=http_timeout(),
+    )
 
 
 def transcribe_audio(
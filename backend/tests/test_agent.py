@@ -0,0 +1,471 @@
+import asyncio
+import sys
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import List
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import agent  # noqa: E402
+from cache import LRUCache, SemanticAnswerCache  # noqa: E402
+from conversation_store import SQLiteConversationStore  # noqa: E402
+from settings import Settings  # noqa: E402
+from speculation import SpeculationStats  # noqa: E402
+from vector_index import DenseIndex  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_answer_cache(monkeypatch):
+    monkeypatch.setattr(agent, "get_answer_cache", lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def conversation_store(monkeypatch, tmp_path):
+    store = SQLiteConversationStore(tmp_path / "conversations.sqlite3")
+    monkeypatch.setattr(agent, "get_checkpointer", lambda: store)
+    get_agent = agent.get_agent
+    get_agent.cache_clear()
+    yield store
+    get_agent.cache_clear()
+
+
+class FakeToolChatModel(BaseChatModel):
+    """Replays canned AI messages; every LLM call pops the next one."""
+
+    responses: List[BaseMessage]
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-tool-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        message = self.responses.pop(0)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _tool_call(query: str) -> AIMessage:
+    return AIMessage(
+        content="",
+        tool_calls=[{"name": "doc_retriever", "args": {"query": query}, "id": "call-1"}],
+    )
+
+
+def _fake_docs(query: str):
+    return [
+        Document(
+            page_content=f"Hostel rules for {query}",
+            metadata={"document_name": "Student Handbook.pdf", "page_no": 12},
+        )
+    ]
+
+
+def _use_fakes(monkeypatch, responses):
+    model = FakeToolChatModel(responses=responses)
+    monkeypatch.setattr(agent, "get_llm", lambda: model)
+    monkeypatch.setattr(agent, "_retrieve_documents", _fake_docs)
+    monkeypatch.setattr(agent, "get_embeddings", lambda: FakeEmbeddings())
+    return model
+
+
+def test_query_agent_reports_tool_sources(monkeypatch):
+    _use_fakes(monkeypatch, [_tool_call("hostel"), AIMessage(content="Quiet hours start at 10pm.")])
+
+    result = agent.query_agent("What are the hostel rules?", f"sync-{uuid.uuid4()}")
+
+    assert result["answer"] == "Quiet hours start at 10pm."
+    assert result["used_retriever"] is True
+    assert result["sources"][0]["document"] == "Student Handbook.pdf"
+    assert result["sources"][0]["page"] == "12"
+
+
+def test_aquery_agent_runs_graph_asynchronously(monkeypatch):
+    _use_fakes(monkeypatch, [_tool_call("hostel"), AIMessage(content="Quiet hours start at 10pm.")])
+    thread_id = f"async-{uuid.uuid4()}"
+
+    result = asyncio.run(agent.aquery_agent("What are the hostel rules?", thread_id))
+
+    assert result["answer"] == "Quiet hours start at 10pm."
+    assert result["thread_id"] == thread_id
+    # The tool query embeds like the question, so the speculative search is reused.
+    assert result["sources"][0]["content"] == "Hostel rules for What are the hostel rules?"
+
+
+def test_aquery_agent_caps_concurrent_runs(monkeypatch):
+    running = 0
+    peak = 0
+
+    class SlowGraph:
+        async def ainvoke(self, *_args, **_kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"messages": [AIMessage(content="Hi there!")]}
+
+    async def run_many():
+        return await asyncio.gather(*(agent.aquery_agent("Hello", str(i)) for i in range(6)))
+
+    slots = asyncio.Semaphore(2)
+    monkeypatch.setattr(agent, "_agent_slots", lambda: slots)
+    monkeypatch.setattr(agent, "get_agent", lambda: SlowGraph())
+    results = asyncio.run(run_many())
+
+    assert peak == 2
+    assert [item["answer"] for item in results] == ["Hi there!"] * 6
+
+
+def test_astream_agent_emits_tool_token_and_final_events(monkeypatch):
+    _use_fakes(monkeypatch, [_tool_call("fees"), AIMessage(content="Fees are on page 2.")])
+    thread_id = f"stream-{uuid.uuid4()}"
+
+    async def collect():
+        return [event async for event in agent.astream_agent("School fees?", thread_id)]
+
+    events = asyncio.run(collect())
+
+    assert [event["event"] for event in events] == ["tool_start", "retrieval", "token", "final"]
+    assert events[0]["data"] == {"tool": "doc_retriever", "query": "fees"}
+    assert events[1]["data"]["sources"][0]["document"] == "Student Handbook.pdf"
+    assert events[2]["data"] == {"text": "Fees are on page 2."}
+    assert events[3]["data"]["thread_id"] == thread_id
+    assert events[3]["data"]["used_retriever"] is True
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [1.0, 0.0] if "fee" in text.lower() else [0.0, 1.0]
+
+
+def test_answer_cache_serves_repeat_first_turn_questions(monkeypatch):
+    model = _use_fakes(
+        monkeypatch,
+        [_tool_call("fees"), AIMessage(content="Fees are on page 2."), AIMessage(content="Yes.")],
+    )
+    answer_cache = SemanticAnswerCache()
+    monkeypatch.setattr(agent, "get_answer_cache", lambda: answer_cache)
+    monkeypatch.setattr(agent, "get_embeddings", lambda: FakeEmbeddings())
+
+    first = agent.query_agent("What are the school fees?", f"first-{uuid.uuid4()}")
+    repeat_thread = f"repeat-{uuid.uuid4()}"
+    repeat = asyncio.run(agent.aquery_agent("School fees?", repeat_thread))
+
+    assert model.calls == 2
+    assert repeat["answer"] == first["answer"] == "Fees are on page 2."
+    assert repeat["sources"] == first["sources"]
+    assert repeat["thread_id"] == repeat_thread
+
+    follow_up = agent.query_agent("Can I pay in instalments?", repeat_thread)
+    history = agent.get_agent().get_state(agent._thread_config(repeat_thread)).values
+    assert follow_up["answer"] == "Yes."
+    assert [message.content for message in history["messages"]][:2] == [
+        "School fees?",
+        "Fees are on page 2.",
+    ]
+
+    # A caller that already checked the thread is new does not make it read again.
+    monkeypatch.setattr(agent, "is_first_turn", lambda thread_id: pytest.fail("re-read"))
+    told = asyncio.run(agent.aquery_agent("School fees?", f"told-{uuid.uuid4()}", first_turn=True))
+    assert told["answer"] == "Fees are on page 2."
+    assert model.calls == 3
+
+
+class FakeCollection:
+    def __init__(self, store):
+        self.store = store
+
+    def query(self, query_embeddings, n_results, include):
+        self.store.searches += 1
+        ids = list(self.store.vectors)[:n_results]
+        return {
+            "ids": [ids],
+            "documents": [[self.store.rows[doc_id][0] for doc_id in ids]],
+            "metadatas": [[self.store.rows[doc_id][1] for doc_id in ids]],
+            "embeddings": [[self.store.vectors[doc_id] for doc_id in ids]],
+        }
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.searches = 0
+        self.rows = {
+            "id-1": ("Admission needs five credits.", {"document_name": "Admissions.pdf"}),
+            "id-2": ("Post-UTME screening is required.", {"document_name": "Admissions.pdf"}),
+        }
+        self.vectors = {"id-1": [1.0, 2.0], "id-2": [1.0, 0.0]}
+        self._collection = FakeCollection(self)
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k, fetch_k, lambda_mult):
+        # Like the pinned langchain-chroma 0.1.4: the Documents carry no IDs.
+        return [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in list(self.rows.values())[:k]
+        ]
+
+    def get(self, ids, include):
+        found = [doc_id for doc_id in reversed(ids) if doc_id in self.rows]
+        return {
+            "ids": found,
+            "documents": [self.rows[doc_id][0] for doc_id in found],
+            "metadatas": [self.rows[doc_id][1] for doc_id in found],
+        }
+
+
+def _count_retrievals(monkeypatch):
+    searched = []
+
+    def counting_docs(query):
+        searched.append(query)
+        return _fake_docs(query)
+
+    monkeypatch.setattr(agent, "_retrieve_documents", counting_docs)
+    monkeypatch.setattr(agent, "_query_embedding_cache", lambda cache=LRUCache(8): cache)
+    monkeypatch.setattr(agent, "_speculation_stats", lambda stats=SpeculationStats(): stats)
+    return searched
+
+
+def test_tool_call_reuses_speculative_retrieval(monkeypatch):
+    _use_fakes(monkeypatch, [_tool_call("fee schedule"), AIMessage(content="Fees are due.")])
+    searched = _count_retrievals(monkeypatch)
+
+    result = agent.query_agent("When are school fees due?", f"spec-{uuid.uuid4()}")
+
+    assert searched == ["When are school fees due?"]
+    assert result["sources"][0]["content"] == "Hostel rules for When are school fees due?"
+    stats = agent.cache_stats()["speculative_retrieval"]
+    assert (stats["started"], stats["hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_dissimilar_tool_query_searches_again(monkeypatch):
+    _use_fakes(monkeypatch, [_tool_call("hostel rules"), AIMessage(content="Quiet at 10pm.")])
+    searched = _count_retrievals(monkeypatch)
+
+    result = asyncio.run(agent.aquery_agent("And the fees?", f"spec-{uuid.uuid4()}"))
+
+    assert sorted(searched) == ["And the fees?", "hostel rules"]
+    assert result["sources"][0]["content"] == "Hostel rules for hostel rules"
+    stats = agent.cache_stats()["speculative_retrieval"]
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (0, 1, 0.0)
+
+
+def test_unused_speculation_is_counted(monkeypatch):
+    _use_fakes(monkeypatch, [AIMessage(content="Hello!"), AIMessage(content="Hello again!")])
+    _count_retrievals(monkeypatch)
+    monkeypatch.setattr(agent, "get_settings", lambda: Settings(retrieval_speculative=True))
+
+    agent.query_agent("Hi", f"spec-{uuid.uuid4()}")
+
+    stats = agent.cache_stats()["speculative_retrieval"]
+    assert (stats["started"], stats["unused"], stats["wasted_rate"]) == (1, 1, 1.0)
+
+    monkeypatch.setattr(agent, "get_settings", lambda: Settings(retrieval_speculative=False))
+    agent.query_agent("Hi", f"spec-{uuid.uuid4()}")
+    assert agent.cache_stats()["speculative_retrieval"]["started"] == 1
+
+
+def test_retrieve_documents_fuses_bm25_hits(monkeypatch):
+    store = FakeVectorStore()
+    # id-3 has no vector hit; only BM25 finds it.
+    store.rows["id-3"] = ("GES101 is compulsory.", {"document_name": "Courses.pdf"})
+
+    class FakeLexicalIndex:
+        def search(self, query, k):
+            return [("id-3", 7.5), ("id-2", 1.0)]
+
+    monkeypatch.setattr(agent, "get_vectorstore", lambda: store)
+    monkeypatch.setattr(agent, "get_embeddings", lambda: FakeEmbeddings())
+    monkeypatch.setattr(agent, "_lexical_index", lambda: FakeLexicalIndex())
+    monkeypatch.setattr(agent, "_retrieval_cache", lambda cache=LRUCache(8): cache)
+    monkeypatch.setattr(agent, "_query_embedding_cache", lambda cache=LRUCache(8): cache)
+
+    documents = agent._retrieve_documents("GES101")
+
+    # id-2 is in both rankings, so it rises above the vector-only and BM25-only hits.
+    assert [doc.id for doc in documents] == ["id-2", "id-1", "id-3"]
+    assert documents[2].page_content == "GES101 is compulsory."
+
+
+def test_retrieve_documents_trims_to_k_without_fusion(monkeypatch):
+    store = FakeVectorStore()
+    for number in range(3, 10):
+        store.rows[f"id-{number}"] = (f"Chunk {number}", {"document_name": "Other.pdf"})
+        store.vectors[f"id-{number}"] = [1.0, float(number)]
+
+    monkeypatch.setattr(agent, "get_vectorstore", lambda: store)
+    monkeypatch.setattr(agent, "get_embeddings", lambda: FakeEmbeddings())
+    monkeypatch.setattr(agent, "_lexical_index", lambda: None)
+    monkeypatch.setattr(agent, "_retrieval_cache", lambda cache=LRUCache(8): cache)
+    monkeypatch.setattr(agent, "_query_embedding_cache", lambda cache=LRUCache(8): cache)
+
+    documents = agent._retrieve_documents("GES101")
+
+    assert len(documents) == agent.RETRIEVAL_K
+    assert all(doc.id for doc in documents)
+
+
+def test_numpy_backend_runs_mmr_without_chroma_search(monkeypatch, tmp_path):
+    store = FakeVectorStore()
+    dense = DenseIndex.from_rows([("id-1", [0.0, 1.0]), ("id-2", [1.0, 0.1])])
+    settings = Settings(chroma_db_dir=str(tmp_path), retrieval_backend="numpy")
+    monkeypatch.setattr(agent, "get_settings", lambda: settings)
+    monkeypatch.setattr(agent, "get_vectorstore", lambda: store)
+    monkeypatch.setattr(agent, "get_embeddings", lambda: FakeEmbeddings())
+    monkeypatch.setattr(agent, "_index_version", lambda: "v1")
+    monkeypatch.setattr(agent, "_lexical_index", lambda: None)
+    monkeypatch.setattr(agent, "_dense_index_from_chroma", lambda version: dense)
+    monkeypatch.setattr(agent, "_retrieval_cache", lambda cache=LRUCache(8): cache)
+    monkeypatch.setattr(agent, "_query_embedding_cache", lambda cache=LRUCache(8): cache)
+
+    documents = agent._retrieve_documents("What are the fees?")
+
+    assert store.searches == 0
+    assert [doc.id for doc in documents] == ["id-2", "id-1"]
+    assert documents[0].page_content == "Post-UTME screening is required."
+
+    # The readiness probe searches the matrix too; FakeVectorStore has no similarity search.
+    monkeypatch.setattr(agent, "get_available_documents", lambda: ["Admissions.pdf"])
+    status = agent.test_vector_store()
+    assert status["status"] == "connected"
+    assert status["retrieval_backend"] == "numpy"
+    assert status["sample_query_results"] == 2
+
+
+def test_retrieve_documents_memoizes_embeddings_and_results(monkeypatch):
+    store = FakeVectorStore()
+    embed_calls = []
+
+    class CountingEmbeddings:
+        def embed_query(self, text):
+            embed_calls.append(text)
+            return [0.1, 0.2]
+
+    version = {"value": "v1"}
+    monkeypatch.setattr(agent, "get_vectorstore", lambda: store)
+    monkeypatch.setattr(agent, "get_embeddings", lambda: CountingEmbeddings())
+    monkeypatch.setattr(agent, "_index_version", lambda: version["value"])
+    monkeypatch.setattr(agent, "_query_embedding_cache", lambda cache=LRUCache(8): cache)
+    monkeypatch.setattr(agent, "_retrieval_cache", lambda cache=LRUCache(8): cache)
+
+    first = agent._retrieve_documents("Admission requirements")
+    again = agent._retrieve_documents("  admission   REQUIREMENTS ")
+
+    # The fake store drops IDs from its MMR Documents like langchain-chroma 0.1.4, so
+    # this only hits the cache because the search keeps the collection's IDs.
+    assert store.searches == 1
+    assert agent._retrieval_cache().stats()["entries"] == 1
+    assert embed_calls == ["Admission requirements"]
+    assert [doc.id for doc in again] == [doc.id for doc in first] == ["id-1", "id-2"]
+    assert again[0].page_content == "Admission needs five credits."
+    assert agent.cache_stats()["retrieval"]["hits"] == 1
+
+    version["value"] = "v2"
+    agent._retrieve_documents("Admission requirements")
+    assert store.searches == 2
+    assert len(embed_calls) == 2
+
+
+def test_cache_stats_does_not_build_singletons(monkeypatch):
+    def unbuilt(name):
+        @lru_cache(maxsize=1)
+        def factory():
+            raise AssertionError(f"metrics built {name}")
+
+        return factory
+
+    for name in ("get_llm", "get_embeddings", "get_checkpointer", "get_answer_cache"):
+        monkeypatch.setattr(agent, name, unbuilt(name))
+
+    stats = agent.cache_stats()
+
+    assert stats["llm_router"] is None
+    assert stats["embedding_store"] is None
+    assert stats["conversations"] is None
+    assert stats["answer_cache"] is None
+
+
+def test_warm_up_builds_singletons_and_reports_failures(monkeypatch):
+    _use_fakes(monkeypatch, [])
+    searched = _count_retrievals(monkeypatch)
+
+    def missing_store():
+        raise RuntimeError("no chroma")
+
+    monkeypatch.setattr(agent, "get_vectorstore", missing_store)
+
+    report = agent.warm_up()
+
+    assert searched == [agent.WARM_UP_QUERY]
+    assert set(report["seconds"]) == {
+        "embeddings",
+        "vector_store",
+        "llm",
+        "agent",
+        "embed_query",
+        "search",
+    }
+    assert report["errors"] == {"vector_store": "no chroma"}
+    assert agent.get_agent.cache_info().currsize == 1
+
+
+def test_available_documents_come_from_manifest(monkeypatch):
+    manifest = {"version": "abc", "documents": {"Calendar.pdf": {}, "Handbook.pdf": {}}}
+    monkeypatch.setattr(agent, "load_index_manifest", lambda: manifest)
+
+    def fail():
+        raise AssertionError("the vector store should not be scanned")
+
+    monkeypatch.setattr(agent, "get_vectorstore", fail)
+
+    assert agent.get_available_documents() == ["Calendar.pdf", "Handbook.pdf"]
+    assert agent._index_version() == "abc"
+
+
+class RecordingChatModel(FakeToolChatModel):
+    prompts: List[List[BaseMessage]] = []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(list(messages))
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def test_long_chats_fold_old_turns_into_a_summary(monkeypatch):
+    settings = Settings(history_keep_turns=2, history_tool_chars=20, history_summary_batch=2)
+    monkeypatch.setattr(agent, "get_settings", lambda: settings)
+    responses = []
+    for turn in range(1, 7):
+        responses += [_tool_call(f"topic {turn}"), AIMessage(content=f"Answer {turn}.")]
+        if turn in (4, 6):
+            responses.append(AIMessage(content=f"Summary after turn {turn}."))
+    model = RecordingChatModel(responses=responses)
+    _use_fakes(monkeypatch, [])
+    monkeypatch.setattr(agent, "get_llm", lambda: model)
+    thread_id = f"long-{uuid.uuid4()}"
+
+    answers = [agent.query_agent(f"Question {turn}?", thread_id)["answer"] for turn in range(1, 7)]
+
+    assert answers == [f"Answer {turn}." for turn in range(1, 7)]
+    state = agent.get_agent().get_state(agent._thread_config(thread_id)).values
+    assert state["summary"] == "Summary after turn 6."
+    assert [m.content for m in state["messages"] if isinstance(m, HumanMessage)] == [
+        "Question 5?",
+        "Question 6?",
+    ]
+
+    first_calls = [prompt for prompt in model.prompts if prompt[-1].content.startswith("Question")]
+    sizes = [len(prompt) for prompt in first_calls]
+    assert max(sizes[3:]) <= sizes[3] + 1
+    assert "Summary after turn 4." in first_calls[5][1].content
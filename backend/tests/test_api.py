@@ -1,6 +1,10 @@
+import asyncio
+import json
 import sys
+import threading
 from pathlib import Path
 
+import pytest
 from fastapi.testclient import TestClient
 
 BACKEND_DIR = Path(__file__).resolve().parents[1]
@@ -8,6 +12,7 @@ if str(BACKEND_DIR) not in sys.path:
     sys.path.insert(0, str(BACKEND_DIR))
 
 import main  # noqa: E402
+from bench_import import HEAVY_PACKAGES, import_profile  # noqa: E402
 
 
 def test_health_endpoint():
@@ -22,6 +27,7 @@ def test_root_endpoint(monkeypatch):
         return {"status": "connected", "documents_count": 0}
 
     monkeypatch.setattr(main, "test_vector_store", fake_vector_status)
+    asyncio.run(main.readiness.refresh())
     client = TestClient(main.app)
     response = client.get("/")
     assert response.status_code == 200
@@ -30,6 +36,126 @@ def test_root_endpoint(monkeypatch):
     assert payload["vector_store"]["status"] == "connected"
 
 
+def test_root_reads_cached_snapshot_without_probing(monkeypatch):
+    calls = []
+
+    def fake_vector_status():
+        calls.append(1)
+        return {"status": "connected", "documents_count": 2}
+
+    monkeypatch.setattr(main, "test_vector_store", fake_vector_status)
+    asyncio.run(main.readiness.refresh())
+    client = TestClient(main.app)
+    for _ in range(3):
+        assert client.get("/").json()["vector_store"]["documents_count"] == 2
+    assert client.get("/ready").status_code == 200
+
+    assert calls == [1]
+
+
+def test_ready_reports_unavailable_vector_store(monkeypatch):
+    monkeypatch.setattr(main, "test_vector_store", lambda: {"status": "error", "message": "boom"})
+    asyncio.run(main.readiness.refresh())
+    client = TestClient(main.app)
+
+    ready = client.get("/ready")
+    assert ready.status_code == 503
+    assert ready.json()["ready"] is False
+    assert ready.json()["vector_store"]["message"] == "boom"
+    assert client.get("/live").json() == {"status": "alive"}
+
+
+def test_readiness_waits_for_warm_up():
+    order = []
+
+    def slow_warm_up():
+        order.append("warm_up")
+        return {"seconds": {"agent": 0.5}, "total_seconds": 0.5, "errors": {}}
+
+    def check():
+        order.append("check")
+        return {"status": "connected"}
+
+    async def run():
+        probe = main.ReadinessProbe(check, warm_up=slow_warm_up)
+        probe.start()
+        await asyncio.sleep(0)
+        assert probe.snapshot()["status"] == "warming_up"
+        assert probe.ready is False
+        while not probe.ready:
+            await asyncio.sleep(0.01)
+        snapshot = probe.snapshot()
+        await probe.stop()
+        return snapshot
+
+    snapshot = asyncio.run(run())
+
+    assert order == ["warm_up", "check"]
+    assert snapshot["warm_up"]["seconds"] == {"agent": 0.5}
+
+
+def test_importing_main_defers_agent_and_speech_stacks():
+    loaded = {name.split(".")[0] for name, _, _ in import_profile("main")}
+
+    assert "main" in loaded
+    assert loaded.isdisjoint(HEAVY_PACKAGES)
+    assert loaded.isdisjoint({"agent", "speech"})
+
+
+def test_lazy_backend_reports_missing_dependencies(monkeypatch):
+    imports = []
+
+    def failing_import(name):
+        imports.append(name)
+        raise ImportError(f"No module named {name!r}")
+
+    monkeypatch.setattr(main, "_import_backend", failing_import)
+    monkeypatch.setattr(main, "_backends", {})
+    missing = main._lazy("no_such_backend_module", "query")
+    amissing = main._lazy("no_such_backend_module", "aquery", "async")
+
+    with pytest.raises(RuntimeError, match="Backend dependencies are missing"):
+        missing("hello")
+    with pytest.raises(RuntimeError, match="Backend dependencies are missing"):
+        asyncio.run(amissing("hello"))
+    # The failed import is remembered instead of being retried on every request.
+    assert imports == ["no_such_backend_module"]
+
+
+def test_lazy_async_backend_imports_off_the_event_loop(monkeypatch):
+    importing_threads = []
+
+    class Backend:
+        @staticmethod
+        async def aquery(message):
+            return f"answer to {message}"
+
+        @staticmethod
+        async def astream(message):
+            for word in message.split():
+                yield word
+
+    def fake_import(name):
+        importing_threads.append(threading.get_ident())
+        return Backend
+
+    monkeypatch.setattr(main, "_import_backend", fake_import)
+    monkeypatch.setattr(main, "_backends", {})
+    aquery = main._lazy("fake_backend", "aquery", "async")
+    astream = main._lazy("fake_backend", "astream", "stream")
+
+    async def scenario():
+        answer = await aquery("hi")
+        words = [word async for word in astream("a b")]
+        return threading.get_ident(), answer, words
+
+    loop_thread, answer, words = asyncio.run(scenario())
+
+    assert (answer, words) == ("answer to hi", ["a", "b"])
+    assert len(importing_threads) == 1
+    assert importing_threads[0] != loop_thread
+
+
 def test_root_serves_frontend_when_dist_present(monkeypatch, tmp_path):
     dist_dir = tmp_path / "dist"
     dist_dir.mkdir()
@@ -54,7 +180,7 @@ def test_root_serves_frontend_when_dist_present(monkeypatch, tmp_path):
 
 
 def test_chat_success(monkeypatch):
-    def fake_query_agent(message, thread_id):
+    async def fake_query_agent(message, thread_id, first_turn=None):
         return {
             "answer": "Hello from UI Guide",
             "used_retriever": False,
@@ -62,7 +188,7 @@ def test_chat_success(monkeypatch):
             "sources": [],
         }
 
-    monkeypatch.setattr(main, "query_agent", fake_query_agent)
+    monkeypatch.setattr(main, "aquery_agent", fake_query_agent)
     client = TestClient(main.app)
     response = client.post("/chat", json={"message": "Hello"})
     assert response.status_code == 200
@@ -73,10 +199,10 @@ def test_chat_success(monkeypatch):
 
 
 def test_chat_missing_key(monkeypatch):
-    def fake_query_agent(message, thread_id):
+    async def fake_query_agent(message, thread_id, first_turn=None):
         raise RuntimeError("OPENAI_API_KEY is not configured")
 
-    monkeypatch.setattr(main, "query_agent", fake_query_agent)
+    monkeypatch.setattr(main, "aquery_agent", fake_query_agent)
     client = TestClient(main.app)
     response = client.post("/chat", json={"message": "Hello"})
     assert response.status_code == 503
@@ -84,6 +210,122 @@ def test_chat_missing_key(monkeypatch):
     assert payload["error"]["message"] == "OPENAI_API_KEY is not configured"
 
 
+def test_chat_stream_emits_server_sent_events(monkeypatch):
+    async def fake_stream_agent(message, thread_id):
+        yield {"event": "tool_start", "data": {"tool": "doc_retriever", "query": message}}
+        yield {"event": "token", "data": {"text": "Fees are "}}
+        yield {"event": "token", "data": {"text": "listed."}}
+        yield {
+            "event": "final",
+            "data": {
+                "answer": "Fees are listed.",
+                "used_retriever": True,
+                "thread_id": thread_id,
+                "sources": [{"content": "Fees", "document": "Fees.pdf", "page": "2"}],
+            },
+        }
+
+    monkeypatch.setattr(main, "astream_agent", fake_stream_agent)
+    client = TestClient(main.app)
+    response = client.post("/chat/stream", json={"message": "School fees", "thread_id": "t1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block]
+    events = [block.split("\n")[0].removeprefix("event: ") for block in blocks]
+    assert events == ["tool_start", "token", "token", "final"]
+    final = json.loads(blocks[-1].split("\n")[1].removeprefix("data: "))
+    assert final["thread_id"] == "t1"
+    assert final["sources"][0]["document"] == "Fees.pdf"
+    assert final["sources"][0]["date"] is None
+
+
+def test_chat_stream_reports_errors_as_events(monkeypatch):
+    async def fake_stream_agent(message, thread_id):
+        raise RuntimeError("OPENAI_API_KEY is not configured")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(main, "astream_agent", fake_stream_agent)
+    client = TestClient(main.app)
+    response = client.post("/chat/stream", json={"message": "Hello"})
+
+    assert response.status_code == 200
+    assert response.text.startswith("event: error\n")
+    assert "OPENAI_API_KEY is not configured" in response.text
+
+
+def test_metrics_reports_cache_stats(monkeypatch):
+    monkeypatch.setattr(main, "cache_stats", lambda: {"retrieval": {"hits": 3, "misses": 1}})
+    client = TestClient(main.app)
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["caches"] == {"retrieval": {"hits": 3, "misses": 1}}
+    assert payload["coalescing"]["coalesced"] == 0
+
+
+def test_chat_coalesces_identical_first_turn_requests(monkeypatch):
+    runs, recorded, checked = [], [], []
+
+    async def fake_query_agent(message, thread_id, first_turn=None):
+        runs.append((message, thread_id, first_turn))
+        await asyncio.sleep(0.05)
+        return {
+            "answer": f"Answer to {message}",
+            "used_retriever": False,
+            "thread_id": thread_id,
+            "sources": [],
+        }
+
+    def fake_is_first_turn(thread_id):
+        checked.append(thread_id)
+        # "user1" already has history; the frontend's fresh `chat_<timestamp>` threads do not.
+        return thread_id != "user1"
+
+    monkeypatch.setattr(main, "aquery_agent", fake_query_agent)
+    monkeypatch.setattr(main, "record_exchange", lambda *args: recorded.append(args))
+    monkeypatch.setattr(main, "is_first_turn", fake_is_first_turn)
+    monkeypatch.setattr(main, "chat_flights", main.SingleFlight())
+
+    async def scenario():
+        requests = [
+            main.QueryRequest(message="What is the fee?", thread_id="chat_1"),
+            main.QueryRequest(message="  what is the FEE? ", thread_id="chat_2"),
+            main.QueryRequest(message="What is the fee?"),
+            main.QueryRequest(message="What is the fee?", thread_id="chat_1"),
+            main.QueryRequest(message="What is the fee?", thread_id="chat_2"),
+            main.QueryRequest(message="What is the fee?", thread_id="chat_3", verbosity="detailed"),
+            main.QueryRequest(message="What is the fee?", thread_id="user1"),
+        ]
+        return await asyncio.gather(*(main.chat(request) for request in requests))
+
+    responses = asyncio.run(scenario())
+
+    # New threads share one run; another verbosity and an ongoing thread do not.
+    ran = {thread_id for _, thread_id, _ in runs}
+    shared = [response.thread_id for response in responses[:5]]
+    assert len(runs) == 3
+    assert {"chat_3", "user1"} <= ran
+    assert shared[:2] == ["chat_1", "chat_2"] and shared[3:] == ["chat_1", "chat_2"]
+    assert shared[2] not in {"chat_1", "chat_2", "chat_3", "user1"}
+    assert {response.answer for response in responses[:5]} == {"Answer to What is the fee?"}
+    # Each thread waiting on the shared run gets the exchange exactly once.
+    written = [thread_id for _, thread_id, _ in runs if thread_id in set(shared)]
+    written += [thread_id for thread_id, _, _ in recorded]
+    assert sorted(written) == sorted(set(shared))
+    # History is read once per request that names a thread, and handed to the agent.
+    assert sorted(checked) == ["chat_1", "chat_1", "chat_2", "chat_2", "chat_3", "user1"]
+    assert {
+        (thread_id, first_turn) for _, thread_id, first_turn in runs if thread_id == "user1"
+    } == {("user1", False)}
+    assert all(first_turn for _, thread_id, first_turn in runs if thread_id != "user1")
+    stats = main.chat_flights.stats()
+    assert stats["leaders"] == 2
+    assert stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+
 def test_speech_transcribe(monkeypatch):
     def fake_transcribe(audio_bytes, filename, language, prompt):
         assert audio_bytes == b"audio-bytes"
@@ -0,0 +1,327 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+import fitz
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import build_index  # noqa: E402
+from bench_import import import_profile  # noqa: E402
+from lexical import load_lexical_index  # noqa: E402
+from manifest import load_manifest  # noqa: E402
+from settings import Settings  # noqa: E402
+from vector_index import load_dense_index  # noqa: E402
+
+
+def _write_pdf(path: Path, pages):
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+    doc.save(path)
+    doc.close()
+
+
+@pytest.fixture
+def index_env(monkeypatch, tmp_path):
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    settings = Settings(
+        docs_dir=str(docs_dir),
+        chroma_db_dir=str(tmp_path / "chroma_db"),
+        embeddings_cache_dir=str(tmp_path / "embeddings_cache"),
+    )
+    monkeypatch.setattr(build_index, "get_settings", lambda: settings)
+    monkeypatch.setattr(
+        build_index,
+        "_init_embeddings",
+        lambda: (DeterministicFakeEmbedding(size=16), "fake"),
+    )
+    monkeypatch.setattr(build_index, "WORKERS", 1)
+    monkeypatch.setenv("ANONYMIZED_TELEMETRY", "false")
+    return settings
+
+
+def test_build_writes_document_manifest(index_env, monkeypatch):
+    monkeypatch.setattr(build_index, "DENSE_EXPORT", True)
+    docs_dir = index_env.docs_path()
+    _write_pdf(docs_dir / "Handbook.pdf", ["Hostel rules apply to all students.", "Fees."])
+    _write_pdf(docs_dir / "Calendar.pdf", ["The first semester begins in October."])
+
+    build_index.build_vector_store()
+
+    manifest = load_manifest(index_env.chroma_db_path())
+    assert list(manifest["documents"]) == ["Calendar.pdf", "Handbook.pdf"]
+    lexical = load_lexical_index(index_env.chroma_db_path())
+    assert lexical.documents == sum(entry["chunks"] for entry in manifest["documents"].values())
+    hit_id = lexical.search("first semester October", k=1)[0][0]
+    assert hit_id in manifest["documents"]["Calendar.pdf"]["chunk_ids"]
+    dense = load_dense_index(index_env.chroma_db_path())
+    chunk_ids = [i for entry in manifest["documents"].values() for i in entry["chunk_ids"]]
+    assert sorted(dense.ids) == sorted(chunk_ids)
+    assert dense.vectors.shape == (len(dense), 16)
+    handbook = manifest["documents"]["Handbook.pdf"]
+    assert handbook["pages_total"] == 2
+    assert handbook["pages_kept"] == 1
+    assert handbook["pages_short"] == 1
+    assert handbook["chunks"] == 1
+    assert len(handbook["content_hash"]) == 64
+    assert manifest["config"]["chunk_size"] == build_index.CHUNK_SIZE
+    on_disk = json.loads((index_env.chroma_db_path() / "index_manifest.json").read_text())
+    assert on_disk["version"] == manifest["version"]
+
+
+def test_incremental_build_only_reindexes_changed_files(index_env, monkeypatch):
+    docs_dir = index_env.docs_path()
+    _write_pdf(docs_dir / "Handbook.pdf", ["Hostel rules apply to all students."])
+    _write_pdf(docs_dir / "Calendar.pdf", ["The first semester begins in October."])
+    _write_pdf(docs_dir / "Old Memo.pdf", ["This memo has been withdrawn by the senate."])
+    build_index.build_vector_store(incremental=True)
+
+    loaded = []
+    original_loader = build_index.load_pdf_with_metadata
+
+    def counting_loader(file_path, document_name, *args, **kwargs):
+        loaded.append(document_name)
+        return original_loader(file_path, document_name, *args, **kwargs)
+
+    monkeypatch.setattr(build_index, "load_pdf_with_metadata", counting_loader)
+    _write_pdf(docs_dir / "Calendar.pdf", ["The first semester now begins in November."])
+    (docs_dir / "Old Memo.pdf").unlink()
+
+    build_index.build_vector_store(incremental=True)
+
+    assert loaded == ["Calendar.pdf"]
+    manifest = load_manifest(index_env.chroma_db_path())
+    assert list(manifest["documents"]) == ["Calendar.pdf", "Handbook.pdf"]
+    lexical = load_lexical_index(index_env.chroma_db_path())
+    assert lexical.documents == sum(entry["chunks"] for entry in manifest["documents"].values())
+    hit_id = lexical.search("first semester October", k=1)[0][0]
+    assert hit_id in manifest["documents"]["Calendar.pdf"]["chunk_ids"]
+    store = build_index.Chroma(
+        collection_name="UI_Policies",
+        persist_directory=str(index_env.chroma_db_path()),
+    )
+    stored = store.get()
+    assert sorted(stored["ids"]) == sorted(
+        chunk_id for entry in manifest["documents"].values() for chunk_id in entry["chunk_ids"]
+    )
+    assert any("November" in text for text in stored["documents"])
+    assert not any("October" in text or "withdrawn" in text for text in stored["documents"])
+
+
+def test_parallel_extraction_matches_sequential_order(monkeypatch, tmp_path):
+    handbook = tmp_path / "Handbook.pdf"
+    calendar = tmp_path / "Calendar.pdf"
+    _write_pdf(handbook, [f"Handbook section {number} covers hostel rules." for number in range(7)])
+    _write_pdf(calendar, ["Short", "The first semester begins in October."])
+    monkeypatch.setattr(build_index, "PAGES_PER_TASK", 2)
+
+    sequential = list(build_index.extract_pdfs([handbook, calendar], workers=1))
+    parallel = list(build_index.extract_pdfs([handbook, calendar], workers=3))
+
+    assert [stats for _, stats, _, _ in parallel] == [stats for _, stats, _, _ in sequential]
+    assert [[page.metadata["page_no"] for page in pages] for pages, *_ in parallel] == [
+        list(range(1, 8)),
+        [2],
+    ]
+    assert [[build_index.add_chunk_id(page) for page in pages] for pages, *_ in parallel] == [
+        [build_index.add_chunk_id(page) for page in pages] for pages, *_ in sequential
+    ]
+
+
+def test_ocr_results_are_cached_per_page(monkeypatch, tmp_path):
+    scanned = tmp_path / "Senate Minutes.pdf"
+    doc = fitz.open()
+    doc.new_page()
+    doc.new_page().draw_rect(fitz.Rect(50, 50, 200, 200), fill=(0, 0, 0))
+    doc.save(scanned)
+    doc.close()
+
+    calls = []
+
+    class FakeTesseract:
+        @staticmethod
+        def image_to_string(image, lang):
+            calls.append((image.size, lang))
+            return f"Senate resolution recorded on scanned page {len(calls)}"
+
+    monkeypatch.setattr(build_index, "pytesseract", FakeTesseract)
+    monkeypatch.setattr(build_index, "OCR_ENABLED", True)
+    monkeypatch.setattr(build_index, "OCR_CACHE_DIR", str(tmp_path / "ocr_cache"))
+
+    first_pages, first_stats = build_index.load_pdf_with_metadata(str(scanned), scanned.name)
+    second_pages, second_stats = build_index.load_pdf_with_metadata(str(scanned), scanned.name)
+
+    assert len(calls) == 2
+    assert first_stats["ocr_cache_misses"] == 2
+    assert first_stats["pages_ocr"] == 2
+    assert second_stats["ocr_cache_hits"] == 2
+    assert second_stats["ocr_cache_misses"] == 0
+    assert second_stats["ocr_seconds_saved"] == pytest.approx(first_stats["ocr_seconds"])
+    assert [page.page_content for page in second_pages] == [
+        page.page_content for page in first_pages
+    ]
+    assert all(page.metadata["ocr_used"] for page in second_pages)
+
+
+def test_prefetch_stays_a_bounded_distance_ahead():
+    produced = []
+
+    def items():
+        for number in range(10):
+            produced.append(number)
+            yield number
+
+    consumed = []
+    for item in build_index._prefetch(items(), maxsize=2):
+        time.sleep(0.01)
+        # One item in hand, two buffered, one blocked on put: never further ahead.
+        assert len(produced) - len(consumed) <= 4
+        consumed.append(item)
+
+    assert consumed == list(range(10))
+
+
+def test_streaming_build_with_process_pool(index_env, monkeypatch):
+    docs_dir = index_env.docs_path()
+    for number in range(3):
+        _write_pdf(
+            docs_dir / f"Faculty {number}.pdf",
+            [f"Faculty {number} regulation {page} for registered students." for page in range(3)],
+        )
+    monkeypatch.setattr(build_index, "WORKERS", 2)
+    monkeypatch.setattr(build_index, "PAGES_PER_TASK", 2)
+    monkeypatch.setattr(build_index, "BATCH_SIZE", 4)
+
+    build_index.build_vector_store()
+
+    manifest = load_manifest(index_env.chroma_db_path())
+    assert [entry["chunks"] for entry in manifest["documents"].values()] == [3, 3, 3]
+    store = build_index.Chroma(
+        collection_name="UI_Policies",
+        persist_directory=str(index_env.chroma_db_path()),
+    )
+    assert store._collection.count() == 9
+
+
+def test_rebuild_into_new_store_reuses_cached_embeddings(index_env, monkeypatch, tmp_path):
+    calls = []
+
+    class CountingEmbeddings(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            calls.extend(texts)
+            return super().embed_documents(texts)
+
+    monkeypatch.setattr(
+        build_index, "_init_embeddings", lambda: (CountingEmbeddings(size=16), "fake")
+    )
+    _write_pdf(
+        index_env.docs_path() / "Handbook.pdf",
+        ["Hostel rules apply to all students.", "Fees are due in week one."],
+    )
+    build_index.build_vector_store()
+    assert len(calls) == 2
+
+    index_env.chroma_db_dir = str(tmp_path / "other_chroma")
+    build_index.build_vector_store()
+
+    assert len(calls) == 2
+    manifest = load_manifest(index_env.chroma_db_path())
+    assert manifest["documents"]["Handbook.pdf"]["chunks"] == 2
+
+
+def test_resume_continues_from_last_committed_batch(index_env, monkeypatch):
+    calls = []
+    fail_on_call = {"value": 3}
+
+    class FlakyEmbeddings(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            calls.append(list(texts))
+            if len(calls) == fail_on_call["value"]:
+                raise RuntimeError("provider outage")
+            return super().embed_documents(texts)
+
+    embeddings = FlakyEmbeddings(size=16)
+    monkeypatch.setattr(build_index, "_init_embeddings", lambda: (embeddings, "fake"))
+    monkeypatch.setattr(build_index, "BATCH_SIZE", 1)
+    index_env.embeddings_cache_dir = ""
+    docs_dir = index_env.docs_path()
+    _write_pdf(
+        docs_dir / "Calendar.pdf",
+        ["Semester one begins in October.", "Final exams are held in May."],
+    )
+    _write_pdf(
+        docs_dir / "Handbook.pdf",
+        ["Hostel rules apply to all students.", "Fees are due in week one."],
+    )
+
+    with pytest.raises(RuntimeError, match="provider outage"):
+        build_index.build_vector_store()
+
+    checkpoint_dir = index_env.chroma_db_path() / ".build_checkpoint"
+    committed = (checkpoint_dir / "committed_ids.txt").read_text().split()
+    assert len(committed) == 2
+    assert len(list((checkpoint_dir / "extracted").glob("*.json"))) == 2
+
+    def no_extraction(*_args, **_kwargs):
+        raise AssertionError("resumed build re-extracted a checkpointed file")
+
+    monkeypatch.setattr(build_index, "extract_pdfs", no_extraction)
+    fail_on_call["value"] = 0
+    calls.clear()
+    build_index.build_vector_store(resume=True)
+
+    assert len(calls) == 2
+    manifest = load_manifest(index_env.chroma_db_path())
+    assert sum(entry["chunks"] for entry in manifest["documents"].values()) == 4
+    assert not checkpoint_dir.exists()
+    vectorstore = build_index.Chroma(
+        collection_name="UI_Policies", persist_directory=str(index_env.chroma_db_path())
+    )
+    assert vectorstore._collection.count() == 4
+
+
+def test_benchmark_compares_chroma_with_numpy_mmr(index_env, monkeypatch, capsys):
+    import bench_retrieval
+
+    docs_dir = index_env.docs_path()
+    _write_pdf(docs_dir / "Handbook.pdf", ["Hostel rules apply to all students."])
+    _write_pdf(docs_dir / "Calendar.pdf", ["The first semester begins in October."])
+    monkeypatch.setattr(build_index, "DENSE_EXPORT", True)
+    monkeypatch.setattr(build_index, "DENSE_DTYPE", "int8")
+    build_index.build_vector_store()
+    monkeypatch.setattr(bench_retrieval, "get_settings", lambda: index_env)
+
+    bench_retrieval.run_benchmark(queries=5, k=2, fetch_k=2)
+
+    output = capsys.readouterr().out
+    assert "exported matrix (memory-mapped) (int8)" in output
+    assert "Result overlap with Chroma: 100%" in output
+    assert "int8" in output and "rescored=100.0%" in output
+
+
+def test_disabled_dense_export_removes_a_stale_matrix(index_env, monkeypatch):
+    _write_pdf(index_env.docs_path() / "Handbook.pdf", ["Hostel rules apply to all students."])
+    monkeypatch.setattr(build_index, "DENSE_EXPORT", True)
+    build_index.build_vector_store()
+    assert load_dense_index(index_env.chroma_db_path()) is not None
+
+    monkeypatch.setattr(build_index, "DENSE_EXPORT", False)
+    build_index.build_vector_store()
+
+    assert load_dense_index(index_env.chroma_db_path()) is None
+    assert not list(index_env.chroma_db_path().glob("dense-*"))
+
+
+def test_importing_build_index_defers_the_local_encoder():
+    loaded = {name.split(".")[0] for name, _, _ in import_profile("build_index")}
+
+    assert "build_index" in loaded
+    assert loaded.isdisjoint({"local_encoder", "sentence_transformers", "torch"})
@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from cache import LRUCache, SemanticAnswerCache  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_answer_cache_matches_similar_questions():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store([1.0, 0.0, 0.0], {"answer": "Fees are N50,000."}, "v1")
+
+    assert cache.lookup([0.98, 0.1, 0.0], "v1") == {"answer": "Fees are N50,000."}
+    assert cache.lookup([0.0, 1.0, 0.0], "v1") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_answer_cache_expires_entries():
+    clock = FakeClock()
+    cache = SemanticAnswerCache(ttl_seconds=60, clock=clock)
+    cache.store([1.0, 0.0], {"answer": "cached"}, "v1")
+
+    clock.now = 59
+    assert cache.lookup([1.0, 0.0], "v1") is not None
+    clock.now = 61
+    assert cache.lookup([1.0, 0.0], "v1") is None
+
+
+def test_answer_cache_evicts_least_recently_used():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store([1.0, 0.0, 0.0], {"answer": "a"}, "v1")
+    cache.store([0.0, 1.0, 0.0], {"answer": "b"}, "v1")
+    assert cache.lookup([1.0, 0.0, 0.0], "v1") == {"answer": "a"}
+
+    cache.store([0.0, 0.0, 1.0], {"answer": "c"}, "v1")
+
+    assert cache.lookup([0.0, 1.0, 0.0], "v1") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "v1") == {"answer": "a"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_answer_cache_invalidates_on_index_version_change():
+    cache = SemanticAnswerCache()
+    cache.store([1.0, 0.0], {"answer": "old index"}, "v1")
+
+    assert cache.lookup([1.0, 0.0], "v2") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_cache_counts_hits_and_bounds_size():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {
+        "entries": 2,
+        "max_entries": 2,
+        "hits": 2,
+        "misses": 1,
+        "evictions": 1,
+        "hit_rate": 0.6667,
+    }
@@ -0,0 +1,82 @@
+import asyncio
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.graph import END, START, MessagesState, StateGraph  # noqa: E402
+
+from conversation_store import SQLiteConversationStore  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _echo_graph(store):
+    def echo(state: MessagesState):
+        return {"messages": [AIMessage(content=f"echo: {state['messages'][-1].content}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("echo", echo)
+    builder.add_edge(START, "echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=store)
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_threads_survive_a_new_store_instance(tmp_path):
+    path = tmp_path / "conversations.sqlite3"
+    graph = _echo_graph(SQLiteConversationStore(path))
+    graph.invoke({"messages": [HumanMessage(content="hi")]}, _config("t1"))
+    asyncio.run(graph.ainvoke({"messages": [HumanMessage(content="again")]}, _config("t1")))
+
+    # A second store on the same file stands in for another worker or a restart.
+    reopened = _echo_graph(SQLiteConversationStore(path))
+    messages = reopened.get_state(_config("t1")).values["messages"]
+
+    assert [message.content for message in messages] == ["hi", "echo: hi", "again", "echo: again"]
+    assert reopened.get_state(_config("unknown")).values == {}
+
+
+def test_old_checkpoints_are_compacted(tmp_path):
+    store = SQLiteConversationStore(tmp_path / "c.sqlite3", keep_checkpoints=2)
+    graph = _echo_graph(store)
+    for turn in range(4):
+        graph.invoke({"messages": [HumanMessage(content=f"turn {turn}")]}, _config("t1"))
+
+    assert store.stats()["checkpoints"] == 2
+    assert len(graph.get_state(_config("t1")).values["messages"]) == 8
+
+
+def test_idle_and_excess_threads_are_evicted(tmp_path):
+    clock = FakeClock()
+    store = SQLiteConversationStore(
+        tmp_path / "c.sqlite3",
+        ttl_seconds=100,
+        max_threads=2,
+        sweep_interval_seconds=0,
+        clock=clock,
+    )
+    graph = _echo_graph(store)
+    graph.invoke({"messages": [HumanMessage(content="old")]}, _config("idle"))
+    clock.now += 150
+    for thread_id in ("a", "b", "c"):
+        clock.now += 1
+        graph.invoke({"messages": [HumanMessage(content=thread_id)]}, _config(thread_id))
+
+    assert graph.get_state(_config("idle")).values == {}
+    assert graph.get_state(_config("a")).values == {}
+    assert graph.get_state(_config("c")).values["messages"][-1].content == "echo: c"
+    assert store.stats()["threads"] == 2
+    assert store.stats()["evicted_threads"] == 2
@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+
+from embedding_cache import (  # noqa: E402
+    CachedEmbeddings,
+    EmbeddingStore,
+    content_hash,
+    with_embedding_cache,
+)
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return super().embed_query(text)
+
+
+def test_store_persists_vectors_across_instances(tmp_path):
+    store = EmbeddingStore(tmp_path, "openai", "text-embedding-3-small")
+    store.put_many({"a": [1.0, 2.0, 3.0], "b": [4.0, 5.0, 6.0]})
+    store.put_many({"c": [7.0, 8.0, 9.0]})
+
+    reopened = EmbeddingStore(tmp_path, "openai", "text-embedding-3-small")
+    found = reopened.get_many(["c", "a", "missing"])
+
+    assert sorted(found) == ["a", "c"]
+    assert found["a"].tolist() == [1.0, 2.0, 3.0]
+    assert found["c"].tolist() == [7.0, 8.0, 9.0]
+    assert reopened.stats()["entries"] == 3
+    assert (reopened.hits, reopened.misses) == (2, 1)
+    # Another model gets its own namespace.
+    assert EmbeddingStore(tmp_path, "local", "other-model").get_many(["a"]) == {}
+
+
+def test_cached_embeddings_only_embed_unseen_text(tmp_path):
+    inner = CountingEmbeddings(size=8)
+    inner.calls = []
+    embeddings = CachedEmbeddings(inner, EmbeddingStore(tmp_path, "fake", "m"))
+
+    first = embeddings.embed_documents(["alpha", "beta"])
+    second = embeddings.embed_documents(["beta", "gamma", "alpha", "gamma"])
+
+    assert inner.calls == [["alpha", "beta"], ["gamma"]]
+    assert second[0] == first[1] and second[2] == first[0]
+    assert second[1] == second[3]
+
+    # Queries are not persisted, so the store does not grow with every question.
+    entries = embeddings.store.stats()["entries"]
+    assert embeddings.embed_query("alpha") == embeddings.embed_query("alpha")
+    assert inner.calls[-2:] == [["alpha"], ["alpha"]]
+    assert embeddings.store.stats()["entries"] == entries
+
+
+def test_store_ignores_a_partial_trailing_row(tmp_path):
+    store = EmbeddingStore(tmp_path, "fake", "m")
+    store.put_many({"a": [1.0, 2.0, 3.0]})
+    # Another process is mid-append, or crashed after writing part of a row.
+    with open(store.directory / "vectors.f32", "ab") as handle:
+        handle.write(b"\0" * 4)
+
+    reopened = EmbeddingStore(tmp_path, "fake", "m")
+    assert reopened.get_many(["a"])["a"].tolist() == [1.0, 2.0, 3.0]
+    reopened.put_many({"b": [4.0, 5.0, 6.0]})
+    found = reopened.get_many(["a", "b"])
+    assert found["b"].tolist() == [4.0, 5.0, 6.0]
+    assert found["a"].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_with_embedding_cache_can_be_disabled(tmp_path):
+    inner = DeterministicFakeEmbedding(size=4)
+    assert with_embedding_cache(inner, "fake", "m", None) is inner
+    wrapped = with_embedding_cache(inner, "fake", "m", tmp_path)
+    assert wrapped.inner is inner
+    assert content_hash("x") == content_hash("x") != content_hash("y")
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from langchain_core.messages import (  # noqa: E402
+    AIMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from history import plan_summary, split_turns, window_messages  # noqa: E402
+
+
+def _turn(number, tool_text="x" * 1200):
+    call_id = f"call-{number}"
+    return [
+        HumanMessage(content=f"question {number}"),
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "doc_retriever", "args": {"query": "q"}, "id": call_id}],
+        ),
+        ToolMessage(content=tool_text, tool_call_id=call_id),
+        AIMessage(content=f"answer {number}"),
+    ]
+
+
+def test_window_keeps_recent_turns_and_trims_old_tool_results():
+    messages = _turn(1) + _turn(2) + _turn(3) + [HumanMessage(content="question 4")]
+
+    window = window_messages(messages, summary="Earlier: fees.", keep_turns=3, tool_chars=50)
+
+    assert isinstance(window[0], SystemMessage) and "Earlier: fees." in window[0].content
+    # Turn 1 is outside the window: only its question and answer remain.
+    assert [m.content for m in window[1:3]] == ["question 1", "answer 1"]
+    tool_results = [m for m in window if isinstance(m, ToolMessage)]
+    assert len(tool_results) == 2
+    assert all(len(m.content) <= 56 and m.content.endswith("[...]") for m in tool_results)
+    assert window[-1].content == "question 4"
+    assert len(messages[2].content) == 1200
+
+
+def test_current_turn_tool_results_are_not_trimmed():
+    messages = _turn(1) + _turn(2)[:3]
+
+    window = window_messages(messages, keep_turns=2, tool_chars=50)
+
+    assert window[-1].content == "x" * 1200
+    assert len(window[2].content) <= 56
+
+
+def test_summary_is_planned_once_enough_old_turns_pile_up():
+    messages = _turn(1) + _turn(2) + _turn(3)
+    assert plan_summary(messages, keep_turns=2, batch_turns=2) is None
+
+    messages += _turn(4)
+    folded, prompt = plan_summary(
+        messages, summary="Asked about fees.", keep_turns=2, batch_turns=2
+    )
+
+    assert folded == messages[:8]
+    assert "Asked about fees." in prompt[1].content
+    assert "Student: question 2\nAssistant: answer 2" in prompt[1].content
+    assert "x" * 50 not in prompt[1].content
+    assert len(split_turns(messages[8:])) == 2
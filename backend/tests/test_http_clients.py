@@ -0,0 +1,69 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import agent  # noqa: E402
+import http_clients  # noqa: E402
+import speech  # noqa: E402
+from settings import Settings  # noqa: E402
+
+CACHED = (
+    agent.get_llm,
+    agent.get_embeddings,
+    speech.get_audio_client,
+    http_clients.get_http_client,
+    http_clients.get_async_http_client,
+)
+
+
+@pytest.fixture
+def openai_settings(monkeypatch):
+    settings = Settings(
+        openai_api_key="sk-test",
+        llm_provider="openai",
+        embeddings_provider="openai",
+        embeddings_cache_dir="",
+        http_max_connections=7,
+        http_timeout_seconds=12,
+    )
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    for module in (agent, http_clients, speech):
+        monkeypatch.setattr(module, "get_settings", lambda: settings)
+    for factory in CACHED:
+        factory.cache_clear()
+    yield settings
+    for factory in CACHED:
+        factory.cache_clear()
+
+
+def test_provider_clients_share_one_connection_pool(openai_settings):
+    shared = http_clients.get_http_client()
+    shared_async = http_clients.get_async_http_client()
+
+    llm = agent.get_llm()
+    embeddings = agent.get_embeddings()
+    audio = speech.get_audio_client()
+
+    assert llm.root_client._client is shared
+    assert llm.root_async_client._client is shared_async
+    assert embeddings.client._client._client is shared
+    assert embeddings.async_client._client._client is shared_async
+    assert audio._client is shared
+    assert llm.root_client.timeout.read == audio.timeout.read == 12
+    assert shared.timeout.connect == openai_settings.http_connect_timeout_seconds
+
+
+def test_close_releases_created_pools(openai_settings):
+    sync_client = http_clients.get_http_client()
+    async_client = http_clients.get_async_http_client()
+
+    asyncio.run(http_clients.aclose_http_clients())
+
+    assert sync_client.is_closed and async_client.is_closed
+    assert http_clients.get_http_client() is not sync_client
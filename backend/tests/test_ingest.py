@@ -0,0 +1,181 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import build_index  # noqa: E402
+import ingest  # noqa: E402
+from ingest import AdaptiveLimit, EmbeddingIngestor, embed_with_backoff  # noqa: E402
+from settings import Settings  # noqa: E402
+
+
+class FakeEmbeddingsServer(ThreadingHTTPServer):
+    """OpenAI-compatible /embeddings endpoint that rate limits every third request."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeEmbeddingsHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.active = 0
+        self.peak_active = 0
+
+
+class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *_args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            throttle = server.requests % 3 == 0
+            server.active += 1
+            server.peak_active = max(server.peak_active, server.active)
+        try:
+            time.sleep(0.02)
+            if throttle:
+                with server.lock:
+                    server.rate_limited += 1
+                payload = {"error": {"message": "Rate limit reached", "type": "requests"}}
+                self._reply(429, payload, {"retry-after": "0.01"})
+                return
+            data = [
+                {"object": "embedding", "index": index, "embedding": [float(len(text)), 1.0]}
+                for index, text in enumerate(body["input"])
+            ]
+            self._reply(200, {"object": "list", "data": data, "model": body["model"]})
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _reply(self, status, payload, headers=None):
+        encoded = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(encoded)
+
+
+@pytest.fixture
+def embeddings_server():
+    server = FakeEmbeddingsServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _fake_openai_embeddings(server, monkeypatch):
+    """The client `build_index` ingests with, pointed at the fake server."""
+    host, port = server.server_address
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_API_BASE", f"http://{host}:{port}/v1")
+    settings = Settings(openai_api_key="test-key", embeddings_provider="openai")
+    monkeypatch.setattr(build_index, "get_settings", lambda: settings)
+    embeddings, provider = build_index._init_embeddings()
+    assert provider == "openai"
+    assert isinstance(embeddings, OpenAIEmbeddings)
+    # Token-level length checks would download the tokenizer; the fake needs plain text.
+    return embeddings.model_copy(update={"check_embedding_ctx_length": False})
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.writers = set()
+        self.rows = {}
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.writers.add(threading.get_ident())
+        for row in zip(ids, embeddings, metadatas, documents):
+            self.rows[row[0]] = row[1:]
+
+
+class RecordingStore:
+    def __init__(self):
+        self._collection = RecordingCollection()
+
+
+def test_ingestor_retries_rate_limits_and_writes_from_one_thread(embeddings_server, monkeypatch):
+    store = RecordingStore()
+    written = []
+    ingestor = EmbeddingIngestor(
+        store,
+        _fake_openai_embeddings(embeddings_server, monkeypatch),
+        concurrency=4,
+        max_tokens=10_000,
+        max_items=3,
+        on_write=written.extend,
+    )
+
+    for number in range(30):
+        text = "x" * (number + 1)
+        ingestor.add(Document(page_content=text, metadata={"n": number}), f"id-{number}")
+    ingestor.add(Document(page_content="x", metadata={"n": 0}), "id-0")
+    ingestor.close()
+
+    assert embeddings_server.rate_limited >= 1
+    assert ingestor.throttled == embeddings_server.rate_limited
+    assert embeddings_server.peak_active > 1
+    assert store._collection.writers == {threading.get_ident()}
+    assert written == [f"id-{number}" for number in range(30)]
+    assert store._collection.rows["id-9"][0] == [10.0, 1.0]
+
+
+def test_ingestor_closes_batches_by_token_budget(monkeypatch):
+    class CountingEmbeddings:
+        def __init__(self):
+            self.batches = []
+
+        def embed_documents(self, texts):
+            self.batches.append(len(texts))
+            return [[0.0] for _ in texts]
+
+    monkeypatch.setattr(ingest, "count_tokens", lambda text: len(text.split()))
+    embeddings = CountingEmbeddings()
+    ingestor = EmbeddingIngestor(
+        RecordingStore(), embeddings, concurrency=1, max_tokens=300, max_items=100
+    )
+    for number in range(6):
+        ingestor.add(Document(page_content="word " * 100, metadata={}), f"id-{number}")
+    ingestor.close()
+
+    assert embeddings.batches == [3, 3]
+
+
+def test_backoff_gives_up_on_other_errors():
+    class BrokenEmbeddings:
+        def embed_documents(self, texts):
+            raise ValueError("bad input")
+
+    limit = AdaptiveLimit(2)
+    with pytest.raises(ValueError):
+        embed_with_backoff(BrokenEmbeddings(), ["text"], limit)
+    assert limit.throttled == 0
+
+
+def test_adaptive_limit_halves_and_recovers():
+    limit = AdaptiveLimit(4)
+    limit.acquire()
+    limit.release(throttled=True)
+    assert limit.limit == 2
+
+    for _ in range(2):
+        limit.acquire()
+        limit.release()
+    assert limit.limit == 3
@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import lexical  # noqa: E402
+from lexical import (  # noqa: E402
+    load_lexical_index,
+    reciprocal_rank_fusion,
+    tokenize,
+    write_lexical_index,
+)
+
+CHUNKS = [
+    ("c1", "GES101 Use of English is compulsory for all first-year students."),
+    ("c2", "Section 4.2.1 covers withdrawal from the University."),
+    ("c3", "The Sub-Dean (Postgraduate) office handles transcripts."),
+    ("c4", "Students must register courses before the deadline."),
+]
+
+
+def test_tokenize_keeps_codes_and_splits_mixed_tokens():
+    assert tokenize("What is GES101?") == ["ges101", "ges", "101"]
+    assert tokenize("See section 4.2.1 of the rules") == ["see", "section", "4.2.1", "rules"]
+
+
+def test_bm25_ranks_exact_terms_first(tmp_path):
+    stats = write_lexical_index(tmp_path, CHUNKS)
+    index = load_lexical_index(tmp_path)
+
+    assert stats["documents"] == 4
+    assert index.search("ges 101 requirements", k=3)[0][0] == "c1"
+    assert [doc_id for doc_id, _ in index.search("section 4.2.1", k=3)] == ["c2"]
+    assert index.search("transcripts office", k=2)[0][0] == "c3"
+    assert index.search("nothing matches this", k=2) == []
+
+
+def test_rebuild_swaps_the_index_in_place(tmp_path):
+    write_lexical_index(tmp_path, CHUNKS)
+    first = load_lexical_index(tmp_path)
+    assert load_lexical_index(tmp_path) is first
+
+    write_lexical_index(tmp_path, CHUNKS + [("c5", "Hostel allocation for GES101 tutors")])
+    second = load_lexical_index(tmp_path)
+
+    assert second is not first and second.documents == 5
+    assert len(list(tmp_path.glob("lexical-*"))) == 1
+    assert load_lexical_index(tmp_path / "missing") is None
+
+
+def test_spilled_runs_merge_into_the_same_index(tmp_path, monkeypatch):
+    chunks = CHUNKS * 5 + [("c-empty", "")]
+    write_lexical_index(tmp_path / "memory", chunks)
+    # Spill every few postings and merge in tiny blocks, so terms span runs and blocks.
+    monkeypatch.setattr(lexical, "SPILL_POSTINGS", 7)
+    monkeypatch.setattr(lexical, "MERGE_BLOCK", 3)
+    stats = write_lexical_index(tmp_path / "spilled", chunks)
+
+    expected = next((tmp_path / "memory").glob("lexical-*"))
+    written = next((tmp_path / "spilled").glob("lexical-*"))
+    assert sorted(path.name for path in written.iterdir()) == sorted(
+        path.name for path in expected.iterdir()
+    )
+    for path in expected.iterdir():
+        assert np.array_equal(np.load(path), np.load(written / path.name)), path.name
+    assert stats["documents"] == len(chunks)
+    assert load_lexical_index(tmp_path / "spilled").search("GES101", k=1)[0][0] == "c1"
+
+
+def test_empty_index_has_no_hits(tmp_path):
+    stats = write_lexical_index(tmp_path, [])
+    assert stats == {"documents": 0, "terms": 0, "postings": 0}
+    assert load_lexical_index(tmp_path).search("fees", k=3) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+    assert fused[0] == "c"
+    assert fused[1:] == ["a", "b", "d"]
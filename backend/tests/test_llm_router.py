@@ -0,0 +1,207 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import agent  # noqa: E402
+from llm_router import CircuitBreaker, HedgedChatModel, RouterState  # noqa: E402
+from settings import Settings  # noqa: E402
+
+
+class ProviderModel(BaseChatModel):
+    reply: str
+    delay: float = 0.0
+    fail: bool = False
+    calls: List[dict] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "provider"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[tool.name for tool in tools], **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append(kwargs)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.reply} is down")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.reply} is down")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        for word in (self.reply, " says hi"):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+def _router(primary, secondary, **state_options):
+    state_options.setdefault("default_deadline_seconds", 0.05)
+    state = RouterState(["openai", "groq"], **state_options)
+    return HedgedChatModel(providers=[("openai", primary), ("groq", secondary)], state=state)
+
+
+def test_slow_primary_is_hedged_to_second_provider():
+    router = _router(
+        ProviderModel(reply="openai", delay=0.5, calls=[]), ProviderModel(reply="groq", calls=[])
+    )
+
+    assert router.invoke([HumanMessage(content="hi")]).content == "groq"
+
+    stats = router.stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["failovers"]) == (1, 1, 0)
+    assert stats["providers"]["groq"]["latency"]["invoke"]["samples"] == 1
+
+
+def test_async_hedge_cancels_the_slower_call():
+    primary = ProviderModel(reply="openai", delay=5, calls=[])
+    router = _router(primary, ProviderModel(reply="groq", calls=[]))
+
+    started = time.perf_counter()
+    message = asyncio.run(router.ainvoke([HumanMessage(content="hi")]))
+
+    assert message.content == "groq"
+    assert time.perf_counter() - started < 2
+    # The cancelled call neither counts as an error nor as a latency sample.
+    assert router.stats()["providers"]["openai"]["calls"] == 0
+
+
+def test_errors_fail_over_immediately_and_trip_the_breaker():
+    now = [0.0]
+    primary = ProviderModel(reply="openai", fail=True, calls=[])
+    secondary = ProviderModel(reply="groq", calls=[])
+    router = _router(
+        primary,
+        secondary,
+        default_deadline_seconds=30,
+        breaker_failures=2,
+        breaker_cooldown_seconds=10,
+        clock=lambda: now[0],
+    )
+
+    started = time.perf_counter()
+    for _ in range(3):
+        assert router.invoke([HumanMessage(content="hi")]).content == "groq"
+    assert time.perf_counter() - started < 2
+
+    # The third call skipped the open breaker instead of failing over again.
+    assert len(primary.calls) == 2
+    stats = router.stats()
+    assert stats["failovers"] == 2
+    assert stats["providers"]["openai"]["breaker"] == "open"
+    assert stats["providers"]["openai"]["error_rate"] == 1.0
+
+    now[0] = 11.0
+    primary.fail = False
+    assert router.invoke([HumanMessage(content="hi")]).content == "openai"
+    assert router.stats()["providers"]["openai"]["breaker"] == "closed"
+
+
+def test_deadline_follows_p95_once_warmed_up():
+    state = RouterState(
+        ["openai"], default_deadline_seconds=4, min_deadline_seconds=0.2, min_samples=3
+    )
+    health = state.providers["openai"]
+
+    health.record("invoke", 1.0, ok=True)
+    assert state.deadline("openai", "invoke") == 4
+    for seconds in (1.0, 1.0, 3.0):
+        health.record("invoke", seconds, ok=True)
+    assert state.deadline("openai", "invoke") == pytest.approx(2.7)
+    for _ in range(100):
+        health.record("invoke", 0.01, ok=True)
+    assert state.deadline("openai", "invoke") == 0.2
+
+
+def test_breaker_reopens_when_half_open_call_fails():
+    now = [0.0]
+    breaker = CircuitBreaker(failures=1, cooldown_seconds=5, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 6.0
+    assert breaker.state == "half_open" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.trips == 1
+
+
+def test_stream_hedges_on_first_chunk_and_emits_one_provider():
+    router = _router(
+        ProviderModel(reply="openai", delay=5, calls=[]), ProviderModel(reply="groq", calls=[])
+    )
+
+    async def collect():
+        chunks = router.astream([HumanMessage(content="hi")])
+        return [chunk.content async for chunk in chunks if chunk.content]
+
+    assert asyncio.run(collect()) == ["groq", " says hi"]
+    assert router.stats()["providers"]["groq"]["latency"]["stream"]["samples"] == 1
+
+
+def test_stream_reports_each_token_to_callbacks_once():
+    class Tokens(AsyncCallbackHandler):
+        def __init__(self):
+            self.tokens = []
+
+        async def on_llm_new_token(self, token, **kwargs):
+            self.tokens.append(token)
+
+    handler = Tokens()
+    router = _router(ProviderModel(reply="openai", calls=[]), ProviderModel(reply="groq", calls=[]))
+
+    async def collect():
+        chunks = router.astream([HumanMessage(content="hi")], {"callbacks": [handler]})
+        return [chunk.content async for chunk in chunks if chunk.content]
+
+    assert asyncio.run(collect()) == ["openai", " says hi"]
+    assert [token for token in handler.tokens if token] == ["openai", " says hi"]
+
+
+def test_bind_tools_binds_every_provider_and_shares_health():
+    primary = ProviderModel(reply="openai", calls=[])
+    secondary = ProviderModel(reply="groq", calls=[])
+    router = _router(primary, secondary)
+
+    bound = router.bind_tools([agent.doc_retriever])
+    bound.invoke([HumanMessage(content="hi")])
+
+    assert primary.calls[-1]["tools"] == ["doc_retriever"]
+    assert bound.state is router.state
+    assert router.stats()["providers"]["openai"]["calls"] == 1
+
+
+def test_get_llm_hedges_when_both_providers_have_keys(monkeypatch):
+    settings = Settings(openai_api_key="sk-test", groq_api_key="gsk-test")
+    monkeypatch.setattr(agent, "get_settings", lambda: settings)
+    monkeypatch.setattr(
+        agent, "_provider_llm", lambda provider: ProviderModel(reply=provider, calls=[])
+    )
+    agent.get_llm.cache_clear()
+    try:
+        llm = agent.get_llm()
+        assert [name for name, _ in llm.providers] == ["openai", "groq"]
+        assert llm.state.default_deadline_seconds == settings.llm_hedge_default_seconds
+        assert agent._llm_router_stats()["hedges"] == 0
+
+        settings.llm_hedging = False
+        agent.get_llm.cache_clear()
+        assert agent.get_llm().reply == "openai"
+    finally:
+        agent.get_llm.cache_clear()
@@ -0,0 +1,58 @@
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from local_encoder import LocalEncoderEmbeddings  # noqa: E402
+
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size, show_progress_bar):
+        self.batches.append([len(text) for text in texts])
+        return [
+            [float(len(text)), float(os.getpid()), float(os.environ["OMP_NUM_THREADS"])]
+            for text in texts
+        ]
+
+
+def load_fake_model(_model_name):
+    return FakeModel()
+
+
+def test_encoder_sorts_by_length_and_keeps_caller_order(monkeypatch):
+    monkeypatch.setenv("OMP_NUM_THREADS", "8")
+    encoder = LocalEncoderEmbeddings(
+        "fake", processes=1, threads_per_process=3, loader=load_fake_model
+    )
+    texts = ["ccc", "a", "bbbbb", "dd"]
+
+    vectors = encoder.embed_documents(texts)
+
+    assert [vector[0] for vector in vectors] == [3.0, 1.0, 5.0, 2.0]
+    assert encoder._model.batches == [[1, 2, 3, 5]]
+    assert vectors[0][2] == 3.0
+    assert encoder.embed_query("xy")[0] == 2.0
+    assert encoder.encoded == 5 and encoder.chunks_per_second > 0
+
+
+def test_encoder_spreads_batches_over_processes():
+    encoder = LocalEncoderEmbeddings(
+        "fake", processes=2, threads_per_process=1, batch_size=2, loader=load_fake_model
+    )
+    texts = ["x" * length for length in (7, 1, 5, 3, 8, 2, 6, 4)]
+    try:
+        vectors = encoder.embed_documents(texts)
+    finally:
+        encoder.close()
+
+    assert [vector[0] for vector in vectors] == [7.0, 1.0, 5.0, 3.0, 8.0, 2.0, 6.0, 4.0]
+    # The shortest half is encoded as one slice, the longest half as the other.
+    assert len({vector[1] for vector in vectors if vector[0] <= 4}) == 1
+    assert len({vector[1] for vector in vectors if vector[0] > 4}) == 1
+    assert all(vector[1] != os.getpid() and vector[2] == 1.0 for vector in vectors)
@@ -0,0 +1,156 @@
+import sys
+import tarfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_chroma.vectorstores import maximal_marginal_relevance
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import package_db  # noqa: E402
+import vector_index  # noqa: E402
+from settings import Settings  # noqa: E402
+from vector_index import DenseIndex, load_dense_index, write_dense_index  # noqa: E402
+
+
+def _rows(count=50, dim=12, seed=3):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    return [(f"id-{i}", vector) for i, vector in enumerate(vectors)], rng
+
+
+def test_search_matches_brute_force_for_batched_queries():
+    rows, rng = _rows()
+    index = DenseIndex.from_rows(rows)
+    queries = rng.normal(size=(3, 12)).astype(np.float32)
+
+    results = index.search(queries, k=5)
+
+    matrix = np.stack([vector for _, vector in rows])
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    for query, found in zip(queries, results):
+        expected = np.argsort(-(matrix @ (query / np.linalg.norm(query))))[:5]
+        assert [doc_id for doc_id, _ in found] == [f"id-{i}" for i in expected]
+        assert found[0][1] >= found[-1][1]
+
+
+def test_mmr_matches_langchain_reference():
+    rows, rng = _rows()
+    index = DenseIndex.from_rows(rows)
+    queries = rng.normal(size=(4, 12)).astype(np.float32)
+
+    batched = index.mmr(queries, k=4, fetch_k=50, lambda_mult=0.5)
+
+    matrix = np.stack([vector for _, vector in rows])
+    for query, found in zip(queries, batched):
+        expected = maximal_marginal_relevance(query, list(matrix), lambda_mult=0.5, k=4)
+        assert found == [f"id-{i}" for i in expected]
+    assert index.mmr(queries[0], k=4, fetch_k=50) == batched[:1]
+
+
+def test_exported_matrix_is_memory_mapped(tmp_path):
+    rows, rng = _rows()
+    stats = write_dense_index(tmp_path, rows)
+    index = load_dense_index(tmp_path)
+
+    assert stats == {"count": 50, "dim": 12, "dtype": "float32", "bytes": 50 * 12 * 4}
+    assert isinstance(index.vectors, np.memmap)
+    assert load_dense_index(tmp_path) is index
+    query = rng.normal(size=12)
+    assert index.mmr(query, k=3) == DenseIndex.from_rows(rows).mmr(query, k=3)
+    assert load_dense_index(tmp_path / "missing") is None
+
+
+@pytest.mark.parametrize("dtype, row_bytes", [("float16", 12 * 2), ("int8", 12 + 4)])
+def test_quantized_export_rescores_in_full_precision(tmp_path, dtype, row_bytes):
+    rows, rng = _rows(count=400)
+    exact = DenseIndex.from_rows(rows)
+    queries = rng.normal(size=(20, 12)).astype(np.float32)
+
+    stats = write_dense_index(tmp_path, rows, dtype=dtype)
+    index = load_dense_index(tmp_path)
+
+    assert stats["bytes"] == 400 * row_bytes
+    assert index.dtype == dtype
+    assert isinstance(index.vectors, np.memmap)
+    # No float32 copy is exported, so the export is smaller than float32 on disk.
+    exported = {path.name: path.stat().st_size for path in tmp_path.glob("dense-*/*.npy")}
+    assert "vectors.npy" not in exported
+    assert sum(size for name, size in exported.items() if name != "ids.npy") < 400 * 12 * 4
+    # Rescoring restores the float32 ranking and scores.
+    for hits, exact_hits in zip(index.search(queries, k=5), exact.search(queries, k=5)):
+        assert [i for i, _ in hits] == [i for i, _ in exact_hits]
+        assert np.allclose(
+            [score for _, score in hits], [score for _, score in exact_hits], atol=1e-3
+        )
+    assert index.mmr(queries, k=4) == exact.mmr(queries, k=4)
+
+    approximate = DenseIndex(index.ids, index.vectors, index.scales)
+    found = approximate.search(queries, k=5)
+    for approx_hits, exact_hits in zip(found, exact.search(queries, k=5)):
+        assert {i for i, _ in approx_hits} & {i for i, _ in exact_hits}
+        assert abs(approx_hits[0][1] - exact_hits[0][1]) < 0.05
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_export_is_written_in_row_batches(monkeypatch, tmp_path, dtype):
+    rows, rng = _rows(count=23)
+    monkeypatch.setattr(vector_index, "WRITE_BATCH_ROWS", 4)
+    queries = rng.normal(size=(5, 12)).astype(np.float32)
+
+    stats = write_dense_index(tmp_path, iter(rows), dtype=dtype)
+    index = load_dense_index(tmp_path)
+
+    assert stats["count"] == 23 and stats["dim"] == 12
+    assert list(index.ids) == [chunk_id for chunk_id, _ in rows]
+    expected = DenseIndex.from_rows(rows)
+    for hits, exact_hits in zip(index.search(queries, k=5), expected.search(queries, k=5)):
+        assert [i for i, _ in hits] == [i for i, _ in exact_hits]
+    (directory,) = tmp_path.glob("dense-*")
+    assert all(path.suffix == ".npy" for path in directory.iterdir())
+
+
+def test_empty_export_loads(tmp_path):
+    stats = write_dense_index(tmp_path, [])
+
+    assert stats["count"] == 0
+    assert load_dense_index(tmp_path).search(np.ones(12, dtype=np.float32), k=3) == [[]]
+
+
+def test_unknown_dtype_is_rejected(tmp_path):
+    rows, _ = _rows()
+    with pytest.raises(ValueError):
+        write_dense_index(tmp_path, rows, dtype="int4")
+    assert not list(tmp_path.iterdir())
+
+
+def test_package_ships_only_what_the_api_reads(monkeypatch, tmp_path):
+    chroma_dir = tmp_path / "chroma_db"
+    rows, _ = _rows()
+    write_dense_index(chroma_dir, rows, dtype="int8")
+    (current,) = chroma_dir.glob("dense-*")
+    # Leftovers from older builds: a superseded export and a float32 copy.
+    (chroma_dir / "dense-old").mkdir()
+    (chroma_dir / "dense-old" / "vectors.npy").write_bytes(b"stale")
+    (current / "vectors.npy").write_bytes(b"float32 rows")
+    (chroma_dir / "chroma.sqlite3").write_bytes(b"chroma")
+    # An interrupted build leaves its checkpoint behind.
+    (chroma_dir / ".build_checkpoint").mkdir()
+    (chroma_dir / ".build_checkpoint" / "committed_ids.txt").write_text("id-1\n")
+    settings = Settings(chroma_db_dir=str(chroma_dir))
+    monkeypatch.setattr(package_db, "get_settings", lambda: settings)
+    monkeypatch.setattr(package_db, "BASE_DIR", tmp_path)
+
+    package_db.package_chroma_db()
+
+    with tarfile.open(tmp_path / package_db.ARCHIVE_NAME) as tar:
+        names = set(tar.getnames())
+    assert "chroma_db/chroma.sqlite3" in names
+    assert f"chroma_db/{current.name}/search.npy" in names
+    assert f"chroma_db/{current.name}/rescore.npy" in names
+    assert f"chroma_db/{current.name}/vectors.npy" not in names
+    assert not any(name.startswith("chroma_db/dense-old") for name in names)
+    assert not any(name.startswith("chroma_db/.build_checkpoint") for name in names)
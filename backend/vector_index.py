@@ -0,0 +1,336 @@
+import itertools
+import json
+import os
+import shutil
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DENSE_POINTER = "dense_index.json"
+DENSE_FORMAT = 1
+DENSE_DTYPES = ("float32", "float16", "int8")
+# Indexes with rescoring rows rescore this many times the requested candidates.
+RESCORE_FACTOR = 4
+# int8 exports keep their rescoring rows in float16: half the size of float32, and
+# close enough to restore the ranking. float16 exports are searched as they are.
+RESCORE_DTYPE = np.float16
+# Quantized rows are widened to float32 this many at a time while scoring.
+SCORE_BLOCK_ROWS = 65536
+# Rows normalized, quantized and written at a time by `write_dense_index`.
+WRITE_BATCH_ROWS = 4096
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Return `(search matrix, per-row scales)` for a float32 matrix.
+
+    int8 rows are scaled so their largest component maps to 127; a row is
+    recovered as `codes * scale`. float16 and float32 need no scales.
+    """
+    if dtype == "float32":
+        return np.asarray(matrix, dtype=np.float32), None
+    if dtype == "float16":
+        return np.asarray(matrix, dtype=np.float16), None
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1, initial=0.0) / 127
+        scales = np.where(scales == 0, 1, scales).astype(np.float32)
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unsupported dense index dtype {dtype!r}; use one of {DENSE_DTYPES}.")
+
+
+def _stage_rows(
+    rows: Iterable[Tuple[str, Sequence[float]]], vectors_path: Path, ids_path: Path
+) -> Tuple[int, int]:
+    """Append unit-length float32 rows and their IDs to raw files, a batch at a time."""
+    count, dim = 0, 0
+    with open(vectors_path, "wb") as vectors_file, open(ids_path, "wb") as ids_file:
+        batch: List[Tuple[str, Sequence[float]]] = []
+        for row in itertools.chain(rows, [None]):
+            if row is not None:
+                batch.append(row)
+                if len(batch) < WRITE_BATCH_ROWS:
+                    continue
+            if not batch:
+                break
+            matrix = _normalize_rows(np.asarray([vector for _, vector in batch], dtype=np.float32))
+            dim = matrix.shape[1]
+            vectors_file.write(matrix.tobytes())
+            ids_file.write(np.asarray([chunk_id for chunk_id, _ in batch], dtype="S64").tobytes())
+            count += len(batch)
+            batch = []
+    return count, dim
+
+
+def _open_output(path: Path, dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def write_dense_index(
+    persist_dir: Path,
+    rows: Iterable[Tuple[str, Sequence[float]]],
+    dtype: str = "float32",
+) -> Dict:
+    """Export `(chunk_id, embedding)` pairs as unit-length rows for `DenseIndex`.
+
+    float32 exports store `vectors.npy`. Quantized exports store only the
+    quantized `search.npy`; int8 adds its scales and a float16 copy of the rows
+    for rescoring, of which the API only pages in the rows it rescores. Rows are
+    staged on disk and each output is a preallocated memory map filled
+    `WRITE_BATCH_ROWS` at a time, so build memory does not grow with the corpus.
+    Files go to a fresh directory and the pointer file is swapped last, like the
+    lexical index, so a running API switches over atomically.
+    """
+    if dtype not in DENSE_DTYPES:
+        raise ValueError(f"Unsupported dense index dtype {dtype!r}; use one of {DENSE_DTYPES}.")
+    persist_dir = Path(persist_dir)
+    name = f"dense-{uuid.uuid4().hex[:12]}"
+    directory = persist_dir / name
+    directory.mkdir(parents=True)
+
+    staged_vectors, staged_ids = directory / "staging.f32", directory / "staging.ids"
+    count, dim = _stage_rows(rows, staged_vectors, staged_ids)
+    if count:
+        source = np.memmap(staged_vectors, dtype=np.float32, mode="r", shape=(count, dim))
+        ids = np.memmap(staged_ids, dtype="S64", mode="r", shape=(count,))
+    else:
+        source = np.zeros((0, 0), dtype=np.float32)
+        ids = np.asarray([""], dtype="S64")
+
+    ids_out = _open_output(directory / "ids.npy", "S64", ids.shape)
+    search_name = "vectors.npy" if dtype == "float32" else "search.npy"
+    search = _open_output(
+        directory / search_name, quantize(source[:0], dtype)[0].dtype, source.shape
+    )
+    scales = rescore = None
+    if dtype == "int8":
+        scales = _open_output(directory / "scales.npy", np.float32, (count,))
+        rescore = _open_output(directory / "rescore.npy", RESCORE_DTYPE, source.shape)
+    for start in range(0, max(count, len(ids)), WRITE_BATCH_ROWS):
+        stop = start + WRITE_BATCH_ROWS
+        ids_out[start:stop] = ids[start:stop]
+        block = np.asarray(source[start:stop])
+        codes, block_scales = quantize(block, dtype)
+        search[start:stop] = codes
+        if scales is not None:
+            scales[start:stop] = block_scales
+            rescore[start:stop] = block.astype(RESCORE_DTYPE)
+    nbytes = int(search.nbytes + (0 if scales is None else scales.nbytes))
+    for output in (ids_out, search, scales, rescore):
+        if output is not None:
+            output.flush()
+    del ids_out, search, scales, rescore, source, ids
+    staged_vectors.unlink()
+    staged_ids.unlink()
+
+    meta = {
+        "format": DENSE_FORMAT,
+        "directory": name,
+        "count": count,
+        "dim": dim,
+        "dtype": dtype,
+    }
+    pointer = persist_dir / DENSE_POINTER
+    temp_path = pointer.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(temp_path, pointer)
+
+    for old in persist_dir.glob("dense-*"):
+        if old.name != name:
+            shutil.rmtree(old, ignore_errors=True)
+    return {"count": count, "dim": dim, "dtype": dtype, "bytes": nbytes}
+
+
+def remove_dense_index(persist_dir: Path) -> None:
+    """Delete the exported matrix, pointer first so a running API stops using it."""
+    persist_dir = Path(persist_dir)
+    (persist_dir / DENSE_POINTER).unlink(missing_ok=True)
+    for old in persist_dir.glob("dense-*"):
+        shutil.rmtree(old, ignore_errors=True)
+
+
+class DenseIndex:
+    """Brute-force cosine search and MMR over an in-memory (or mapped) matrix.
+
+    Rows are unit length, so one matrix product scores a whole batch of queries.
+    MMR re-ranks the `fetch_k` best rows of each query with one candidate-by-
+    candidate similarity matrix and a running max, instead of a Python loop over
+    documents.
+
+    `vectors` may be float32, float16 or int8 (with per-row `scales`). When a
+    quantized index also has higher-precision rows in `full` (float16 for int8
+    exports), the best `RESCORE_FACTOR` times the requested candidates are
+    rescored with them, widened to float32, so int8 mostly costs memory bandwidth
+    rather than ranking quality. Without `full`, scores come from the quantized
+    rows alone, as for float16 exports.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        scales: Optional[np.ndarray] = None,
+        full: Optional[np.ndarray] = None,
+        rescore: int = RESCORE_FACTOR,
+    ):
+        self.ids = list(ids)
+        self.vectors = vectors
+        self.scales = scales
+        if full is None and vectors.dtype == np.float32:
+            full = vectors
+        self.full = full
+        self.rescore = max(1, rescore)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, Sequence[float]]]) -> "DenseIndex":
+        ids, vectors = [], []
+        for chunk_id, vector in rows:
+            ids.append(chunk_id)
+            vectors.append(vector)
+        if not ids:
+            return cls([], np.zeros((0, 0), dtype=np.float32))
+        matrix = np.asarray(vectors, dtype=np.float32)
+        return cls(ids, np.ascontiguousarray(_normalize_rows(matrix)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dtype(self) -> str:
+        return self.vectors.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes scanned per query: the search matrix and its scales."""
+        scales = 0 if self.scales is None else self.scales.nbytes
+        return int(self.vectors.nbytes + scales)
+
+    def quantize(self, dtype: str) -> "DenseIndex":
+        """A copy searching a `dtype` matrix, rescoring against this index's best rows."""
+        full = self.full if self.full is not None else self.rows(slice(None))
+        vectors, scales = quantize(np.asarray(full, dtype=np.float32), dtype)
+        return DenseIndex(
+            self.ids,
+            vectors,
+            scales,
+            full=None if dtype == "float32" else full,
+            rescore=self.rescore,
+        )
+
+    def _queries(self, queries) -> np.ndarray:
+        return _normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        if self.vectors.dtype == np.float32:
+            return queries @ self.vectors.T
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start : start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start : start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            scores *= np.asarray(self.scales)
+        return scores
+
+    def rows(self, positions) -> np.ndarray:
+        """Float32 rows at `positions`: from `full` when available, else dequantized."""
+        if self.full is not None:
+            return np.asarray(self.full[positions], dtype=np.float32)
+        rows = np.asarray(self.vectors[positions], dtype=np.float32)
+        if self.scales is not None:
+            rows *= np.asarray(self.scales[positions])[..., None]
+        return rows
+
+    def _candidates(self, queries: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and scores of the best `count` rows per query, best first."""
+        scores = self._scores(queries)
+        rescoring = self.full is not None and self.full is not self.vectors
+        pool = min(len(self), count * self.rescore if rescoring else count)
+        top = np.argpartition(-scores, pool - 1, axis=1)[:, :pool]
+        if rescoring:
+            top_scores = np.einsum("qd,qcd->qc", queries, self.rows(top))
+        else:
+            top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")[:, : min(count, pool)]
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def search(self, queries, k: int) -> List[List[Tuple[str, float]]]:
+        """Top `k` (chunk_id, cosine) pairs for each query row."""
+        if not len(self):
+            return [[] for _ in self._queries(queries)]
+        top, scores = self._candidates(self._queries(queries), k)
+        return [
+            [(self.ids[i], float(score)) for i, score in zip(row, row_scores)]
+            for row, row_scores in zip(top, scores)
+        ]
+
+    def mmr(
+        self, queries, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5
+    ) -> List[List[str]]:
+        """Maximal marginal relevance for each query row, as lists of chunk IDs."""
+        if not len(self):
+            return [[] for _ in self._queries(queries)]
+        candidates, relevances = self._candidates(self._queries(queries), fetch_k)
+
+        results = []
+        for rows, relevance in zip(candidates, relevances):
+            candidate_vectors = self.rows(rows)
+            similarity = candidate_vectors @ candidate_vectors.T
+            redundancy = np.full(len(rows), -np.inf, dtype=np.float32)
+            available = np.ones(len(rows), dtype=bool)
+            picked = []
+            for _ in range(min(k, len(rows))):
+                penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+                score = lambda_mult * relevance - (1 - lambda_mult) * penalty
+                best = int(np.argmax(np.where(available, score, -np.inf)))
+                picked.append(rows[best])
+                available[best] = False
+                redundancy = np.maximum(redundancy, similarity[best])
+            results.append([self.ids[i] for i in picked])
+        return results
+
+
+@lru_cache(maxsize=2)
+def _open_index(persist_dir: str, _stamp: Tuple[int, int]) -> Optional[DenseIndex]:
+    try:
+        meta = json.loads((Path(persist_dir) / DENSE_POINTER).read_text(encoding="utf-8"))
+        if meta.get("format") != DENSE_FORMAT:
+            return None
+        directory = Path(persist_dir) / meta["directory"]
+        ids = np.load(directory / "ids.npy")[: meta["count"]]
+        dtype = meta.get("dtype", "float32")
+        if dtype == "float32":
+            vectors = full = np.load(directory / "vectors.npy", mmap_mode="r")
+        else:
+            vectors = np.load(directory / "search.npy", mmap_mode="r")
+            full = np.load(directory / "rescore.npy", mmap_mode="r") if dtype == "int8" else None
+        scales = np.load(directory / "scales.npy") if dtype == "int8" else None
+    except (OSError, ValueError, KeyError):
+        return None
+    return DenseIndex([item.decode("utf-8") for item in ids], vectors, scales, full=full)
+
+
+def load_dense_index(persist_dir: Path) -> Optional[DenseIndex]:
+    """The exported matrix, memory-mapped and reopened only when a rebuild swaps it."""
+    try:
+        stat = (Path(persist_dir) / DENSE_POINTER).stat()
+    except OSError:
+        return None
+    return _open_index(str(persist_dir), (stat.st_mtime_ns, stat.st_size))
+
+
+def collection_rows(collection, page_size: int = 5000):
+    """Yield `(id, embedding)` for every chunk of a Chroma collection, a page at a time."""
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            return
+        yield from zip(page["ids"], page["embeddings"])
+        offset += len(page["ids"])